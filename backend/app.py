@@ -2,9 +2,10 @@ from fastapi import FastAPI, Depends, HTTPException, status, Body, Response, Fil
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
-from sqlalchemy import create_engine, Column, Integer, String, Boolean, ForeignKey, Float, Table, Text, DateTime, Enum, JSON
+from sqlalchemy import create_engine, Column, Integer, String, Boolean, ForeignKey, Float, Table, Text, DateTime, Enum, JSON, UniqueConstraint, func, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship, Session
+from sqlalchemy.exc import IntegrityError
 from typing import List, Optional, Dict, Any
 from pydantic import BaseModel, Field
 import os
@@ -14,9 +15,20 @@ import io
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 import enum
+import asyncio
+import itertools
+import threading
 from dotenv import load_dotenv
-from question_generator import QuestionGenerator
-import PyPDF2  # For PDF processing
+from question_generator import QuestionGenerator, ContextAnalysis
+from worker_pool import GenerationWorkerPool
+from generation_cache import GenerationCache
+from openai_client import OPENAI_BASE_URL, close_async_client
+from llm_scheduler import llm_scheduler
+from minhash import NearDuplicateIndex, minhash_signature
+from pdf_extraction import extract_pdf_text, shutdown_extraction_pool
+from boilerplate import BoilerplateFilter
+from uploads import UPLOAD_SPOOL_BYTES, UploadSizeLimitMiddleware, spool_upload
+from starlette.formparsers import MultiPartParser
 
 # Load environment variables
 load_dotenv()
@@ -39,13 +51,35 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 # OAuth2 scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
-# Initialize the question generators
+# Model loading: lazy mode defers spaCy/T5 until first use, warm-up loads them in the background after startup
+LAZY_MODELS = os.getenv("EDUQGEN_LAZY_MODELS", "true").lower() in ("1", "true", "yes")
+WARMUP_MODELS = os.getenv("EDUQGEN_WARMUP_MODELS", "true").lower() in ("1", "true", "yes")
+# T5 inference backend for the local ML path: pytorch, quantized (int8) or onnx
+QG_BACKEND = os.getenv("EDUQGEN_QG_BACKEND", "pytorch")
+# Default generation deadline (0 = none) and how long to wait for OpenAI before also starting templates
+# (negative = only on failure). OpenAI usually takes 10-40s, so hedging is off by default; if enabled, set it
+# above the observed p95 latency, or most requests will pay for an OpenAI call and still return templates.
+GENERATION_DEADLINE = float(os.getenv("EDUQGEN_GENERATION_DEADLINE", "0"))
+HEDGE_AFTER = float(os.getenv("EDUQGEN_HEDGE_AFTER", "-1"))
+# Generations ask for this many times the requested questions and cache them all, so a repeat request can be
+# served the cached questions not yet saved to the question bank instead of generating again (1 disables)
+CACHE_OVERSAMPLE = max(1, int(os.getenv("EDUQGEN_CACHE_OVERSAMPLE", "2")))
+
+# Initialize the question generators (both borrow the same spaCy/T5 models from the shared model registry)
 openai_api_key = os.getenv("OPENAI_KEY")
-openai_generator = QuestionGenerator(use_openai=True, openai_api_key=openai_api_key)
-nltk_generator = QuestionGenerator(use_openai=False)
+openai_generator = QuestionGenerator(use_openai=True, openai_api_key=openai_api_key, lazy_models=LAZY_MODELS)
+nltk_generator = QuestionGenerator(use_openai=False, lazy_models=LAZY_MODELS, qg_backend=QG_BACKEND)
+
+# Generation runs off the event loop: in worker processes, or on threads when EDUQGEN_WORKER_PROCESSES=0
+generation_pool = GenerationWorkerPool.from_env(local_generator=nltk_generator)
+
+# Content-addressed cache of generated question sets (memory LRU + SQLite with TTL)
+generation_cache = GenerationCache.from_env()
 
 if not openai_api_key:
     print("Warning: OPENAI_KEY environment variable not set. OpenAI generation may not work properly.")
+if OPENAI_BASE_URL:
+    print(f"Using OpenAI-compatible endpoint at {OPENAI_BASE_URL}")
 
 # Create FastAPI app instance
 app = FastAPI(title="EduQGen API", description="API for generating educational questions")
@@ -59,6 +93,42 @@ app.add_middleware(
     allow_headers=["*"],  # Allows all headers
 )
 
+# Reject oversized uploads before their body is read, and keep at most UPLOAD_SPOOL_BYTES of each in memory
+app.add_middleware(UploadSizeLimitMiddleware)
+MultiPartParser.spool_max_size = UPLOAD_SPOOL_BYTES
+
+@app.on_event("startup")
+async def start_generation_pool():
+    """Start the generation pool and load its models in the background so the port binds immediately."""
+    generation_pool.start()
+    if generation_pool.uses_processes or (LAZY_MODELS and WARMUP_MODELS):
+        # Keep a reference so the task isn't garbage collected while it runs
+        app.state.warmup_task = asyncio.create_task(generation_pool.warm_up())
+
+@app.on_event("shutdown")
+async def stop_generation_pool():
+    generation_pool.shutdown()
+    shutdown_extraction_pool()
+    # Streams use this loop's client; every other OpenAI call goes through the scheduler loop's
+    await close_async_client()
+    await llm_scheduler.run(close_async_client)
+
+@app.get("/healthz", tags=["Health"])
+async def healthz():
+    """Liveness probe: the process is up and serving requests."""
+    return {"status": "ok"}
+
+@app.get("/readyz", tags=["Health"])
+async def readyz(response: Response):
+    """Readiness probe: the generation models are loaded."""
+    if not (generation_pool.ready or nltk_generator.models_ready()):
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+        if generation_pool.warmup_error:
+            # Every warm-up attempt failed; the models now only load on demand
+            return {"status": "failed", "error": generation_pool.warmup_error}
+        return {"status": "loading"}
+    return {"status": "ready"}
+
 # Database dependency
 def get_db():
     db = SessionLocal()
@@ -156,6 +226,7 @@ class Question(Base):
     updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
     is_verified = Column(Boolean, default=False)
     usage_count = Column(Integer, default=0)
+    question_signature = Column(JSON, nullable=True)  # MinHash of the question text, for near-duplicate checks
     
     subject = relationship("Subject", back_populates="questions")
     topic = relationship("Topic", back_populates="questions")
@@ -201,9 +272,230 @@ class QuestionAnalytics(Base):
     
     question = relationship("Question")
 
+class GenerationUsage(Base):
+    __tablename__ = "generation_usage"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    model = Column(String)
+    context_tokens = Column(Integer)  # Counted locally before the request
+    prompt_context_tokens = Column(Integer)  # After compression (equal to context_tokens if none)
+    estimated_prompt_tokens = Column(Integer)
+    max_tokens = Column(Integer)
+    prompt_tokens = Column(Integer, nullable=True)  # As reported by the API
+    completion_tokens = Column(Integer, nullable=True)
+    questions_requested = Column(Integer)
+    questions_returned = Column(Integer)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+class Document(Base):
+    __tablename__ = "documents"
+    # Each user has their own copy of a PDF; copies share extraction work but not access
+    __table_args__ = (UniqueConstraint("sha256", "created_by", name="uq_documents_sha256_created_by"),)
+    
+    id = Column(Integer, primary_key=True, index=True)
+    sha256 = Column(String(64), index=True)  # Of the uploaded file's bytes
+    filename = Column(String)  # As first uploaded by this user
+    size_bytes = Column(Integer)
+    page_count = Column(Integer)
+    text = Column(Text)  # Extracted and filtered text, as sent to generation
+    pages = Column(JSON)  # Filtered text per page
+    analysis = Column(JSON, nullable=True)  # Sentences, entities and concepts of text; None if NLP was unavailable
+    created_by = Column(Integer, ForeignKey("users.id"))
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    last_used_at = Column(DateTime, default=datetime.datetime.utcnow)
+    
+    creator = relationship("User")
+    
+    @property
+    def has_analysis(self) -> bool:
+        return self.analysis is not None
+
 # Create tables
 Base.metadata.create_all(bind=engine)
 
+def add_missing_columns():
+    """create_all doesn't alter existing tables, so add columns introduced since the database was created."""
+    existing_columns = {column["name"] for column in inspect(engine).get_columns("questions")}
+    if "question_signature" not in existing_columns:
+        with engine.begin() as connection:
+            connection.execute(text("ALTER TABLE questions ADD COLUMN question_signature JSON"))
+
+add_missing_columns()
+
+# LSH indexes of stored questions per (subject_id, topic_id), built on first use from the questions table
+question_bank_indexes: Dict[tuple, NearDuplicateIndex] = {}
+question_bank_lock = threading.Lock()
+
+def get_question_bank_index(db: Session, subject_id: int, topic_id: Optional[int]) -> NearDuplicateIndex:
+    """Return the near-duplicate index for a subject/topic, backfilling missing signatures when it is built."""
+    key = (subject_id, topic_id)
+    with question_bank_lock:
+        index = question_bank_indexes.get(key)
+        if index is not None:
+            return index
+        
+        index = NearDuplicateIndex()
+        topic_filter = Question.topic_id == topic_id if topic_id is not None else Question.topic_id.is_(None)
+        rows = db.query(Question.id, Question.content, Question.question_signature).filter(
+            Question.subject_id == subject_id, topic_filter
+        ).all()
+        
+        backfill = []
+        for question_id, content, signature in rows:
+            if signature is None:
+                signature = minhash_signature(content or "")
+                backfill.append({"id": question_id, "question_signature": signature})
+            index.add(question_id, signature=signature)
+        if backfill:
+            db.bulk_update_mappings(Question, backfill)
+            db.commit()
+        
+        question_bank_indexes[key] = index
+        return index
+
+def select_unstored(questions: List[Dict], num_questions: int,
+                    bank_index: Optional[NearDuplicateIndex]) -> Optional[List[Dict]]:
+    """
+    Pick num_questions of the questions (e.g. a cached set) that don't near-duplicate a stored question.
+    
+    The pick takes each (taxonomy, difficulty) bucket's questions in turn, so it stays spread
+    across the levels the set was generated for. Returns None if too few questions are left.
+    """
+    buckets = {}
+    for q in questions:
+        if bank_index is None or bank_index.find(q["question"]) is None:
+            buckets.setdefault((q["taxonomy_level"], q["difficulty"]), []).append(q)
+    selected = []
+    for round_questions in itertools.zip_longest(*buckets.values()):
+        selected.extend(q for q in round_questions if q is not None)
+    return selected[:num_questions] if len(selected) >= num_questions else None
+
+def save_generated_question(db: Session, q: Dict, subject_id: int, topic_id: Optional[int], user_id: int,
+                            bank_index: NearDuplicateIndex) -> Question:
+    """
+    Add a generated question to the session and to the subject/topic's near-duplicate index.
+    
+    Near-duplicates of stored questions are rejected during generation (the index is passed
+    as dedup_index), so every generated question is saved as a new row.
+    """
+    signature = minhash_signature(q['question'])
+    db_question = Question(
+        content=q['question'],
+        answer=q['answer'],
+        bloom_taxonomy_level=q['taxonomy_level'],
+        difficulty_level=q['difficulty'],
+        subject_id=subject_id,
+        topic_id=topic_id,
+        created_by=user_id,
+        is_verified=False,  # Generated questions need verification
+        question_signature=signature
+    )
+    db.add(db_question)
+    # Flush to get the id the index is keyed by
+    db.flush()
+    bank_index.add(db_question.id, signature=signature)
+    return db_question
+
+def record_generation_usage(usage: Dict):
+    """Persist the token usage of one OpenAI request (called by the generator after each response)."""
+    db = SessionLocal()
+    try:
+        db.add(GenerationUsage(**{
+            key: value for key, value in usage.items()
+            if key in GenerationUsage.__table__.columns
+        }))
+        db.commit()
+    finally:
+        db.close()
+
+openai_generator.usage_recorder = record_generation_usage
+
+async def analyze_document_text(text: str) -> Optional[Dict]:
+    """Sentences, entities and concepts of a document's text as JSON, or None if the NLP models can't run."""
+    try:
+        # In the worker pool, whose workers already hold the spaCy model
+        analysis = await generation_pool.analyze_context(text)
+    except Exception as e:
+        print(f"Warning: could not analyze document text, it will be analyzed at generation time: {e}")
+        return None
+    return {"sentences": analysis.sentences, "entities": analysis.entities, "concepts": analysis.concepts}
+
+def document_analysis(db_document: Document) -> Optional[ContextAnalysis]:
+    """The stored analysis of a document as a ContextAnalysis the generators accept."""
+    if not db_document.analysis:
+        return None
+    return ContextAnalysis(context=db_document.text, **db_document.analysis)
+
+async def store_uploaded_document(file: UploadFile, db: Session, user: User) -> Document:
+    """
+    Return the user's stored document for an uploaded PDF, extracting and analyzing it only if its content is new.
+    
+    The upload is hashed while it is spooled, so a known PDF is recognized without being parsed.
+    A PDF another user of the same institution has stored is copied for this user without
+    being extracted again; new PDFs are filtered with the boilerplate patterns of the
+    uploader's institution.
+    
+    Raises:
+        HTTPException: 413 if the upload is too large, 400 if no text could be extracted from it
+    """
+    def find_own():
+        return db.query(Document).filter(Document.sha256 == sha256, Document.created_by == user.id).first()
+    
+    # Copy the upload into a size-bounded spool (memory, then a temporary file) instead of reading it whole
+    with await spool_upload(file) as spooled:
+        sha256, size_bytes = spooled.sha256, spooled.size
+        db_document = find_own()
+        if db_document is not None:
+            print(f"{file.filename}: reusing stored document {db_document.id}")
+            db_document.last_used_at = datetime.datetime.utcnow()
+            db.commit()
+            return db_document
+        
+        # Same boilerplate patterns means the same extracted text
+        same_institution = User.institution == user.institution if user.institution else User.institution.is_(None)
+        source_document = db.query(Document).join(User, Document.created_by == User.id).filter(
+            Document.sha256 == sha256, same_institution
+        ).first()
+        
+        if source_document is None:
+            # Extract and filter text page by page (large PDFs across worker processes), off the event loop;
+            # a spooled file is memory-mapped, and workers open it by path
+            extraction = await asyncio.to_thread(
+                extract_pdf_text, spooled.open(), worker_path=spooled.path,
+                boilerplate_filter=BoilerplateFilter.for_institution(user.institution)
+            )
+    
+    if source_document is not None:
+        print(f"{file.filename}: copying the extraction of stored document {source_document.id}")
+        page_count, context_text, pages = source_document.page_count, source_document.text, source_document.pages
+        analysis = source_document.analysis
+    else:
+        print(f"{file.filename}: {extraction.summary()}")
+        if not extraction.text.strip():
+            raise HTTPException(status_code=400, detail="Could not extract text from the PDF file")
+        page_count, context_text, pages = len(extraction.pages), extraction.text, extraction.pages
+        analysis = await analyze_document_text(extraction.text)
+    
+    db_document = Document(
+        sha256=sha256,
+        filename=file.filename,
+        size_bytes=size_bytes,
+        page_count=page_count,
+        text=context_text,
+        pages=pages,
+        analysis=analysis,
+        created_by=user.id
+    )
+    db.add(db_document)
+    try:
+        db.commit()
+    except IntegrityError:
+        # The same user stored the same PDF in a concurrent upload
+        db.rollback()
+        return find_own()
+    db.refresh(db_document)
+    return db_document
+
 # Pydantic Models for API
 class Token(BaseModel):
     access_token: str
@@ -311,6 +603,37 @@ class QuestionGenRequest(BaseModel):
     difficulty_levels: List[DifficultyLevel]
     num_questions: int = 10
     use_openai: bool = True  # Add this field with default True
+    seed: Optional[int] = None  # Reproducible generation; also part of the cache key
+    bypass_cache: bool = False  # Force a fresh generation even if a cached set exists
+    deadline_seconds: Optional[float] = None  # Give up (504) after this long; defaults to EDUQGEN_GENERATION_DEADLINE
+    hedge_after_seconds: Optional[float] = None  # Start templates alongside a slow OpenAI call (negative = only on failure); defaults to EDUQGEN_HEDGE_AFTER
+
+class QuestionGenDocumentRequest(BaseModel):
+    document_id: int
+    subject_id: int
+    topic_id: Optional[int] = None
+    taxonomy_levels: List[TaxonomyLevel]
+    difficulty_levels: List[DifficultyLevel]
+    num_questions: int = 10
+    use_openai: bool = True
+    seed: Optional[int] = None
+    bypass_cache: bool = False
+    deadline_seconds: Optional[float] = None
+    hedge_after_seconds: Optional[float] = None
+
+class DocumentResponse(BaseModel):
+    id: int
+    sha256: str
+    filename: Optional[str] = None
+    size_bytes: int
+    page_count: int
+    has_analysis: bool
+    created_by: Optional[int] = None
+    created_at: datetime.datetime
+    last_used_at: Optional[datetime.datetime] = None
+    
+    class Config:
+        orm_mode = True
 
 class QuestionGenFileRequest(BaseModel):
     subject_id: int
@@ -319,6 +642,8 @@ class QuestionGenFileRequest(BaseModel):
     difficulty_levels: List[DifficultyLevel]
     num_questions: int = 10
     use_openai: bool = True  # Add this field with default True
+    seed: Optional[int] = None
+    bypass_cache: bool = False
 
 # Authentication functions
 def verify_password(plain_password, hashed_password):
@@ -372,6 +697,65 @@ async def get_current_active_user(current_user: User = Depends(get_current_user)
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
 
+async def generate_question_set_cached(use_openai: bool, bypass_cache: bool = False,
+                                      seed: Optional[int] = None, deadline: Optional[float] = None,
+                                      hedge_after: Optional[float] = None,
+                                      dedup_index: Optional[NearDuplicateIndex] = None, **kwargs) -> List[Dict]:
+    """
+    Serve a question set from the generation cache, or generate it and cache it.
+    
+    OpenAI generation is hedged: if it is slow (hedge_after) or fails, the template path
+    runs in the worker pool and whichever returns first within the deadline is used.
+    Both paths skip near-duplicates of the questions in dedup_index. Generations ask for
+    CACHE_OVERSAMPLE times the questions and cache all of them; a cached set is served only
+    if enough of it is still missing from dedup_index (see select_unstored), otherwise the
+    lookup is a miss and the set is generated afresh.
+    
+    Raises:
+        asyncio.TimeoutError: If no path finished within the deadline
+    """
+    deadline = GENERATION_DEADLINE if deadline is None else deadline
+    hedge_after = HEDGE_AFTER if hedge_after is None else hedge_after
+    
+    def cache_key_for(backend):
+        return GenerationCache.make_key(
+            kwargs["context"], kwargs.get("taxonomy_levels") or [], kwargs.get("difficulty_levels") or [],
+            kwargs["num_questions"], backend, seed
+        )
+    
+    template_backend = f"template:{QG_BACKEND}"
+    backend = "openai" if use_openai else template_backend
+    
+    def select(questions):
+        return select_unstored(questions, kwargs["num_questions"], dedup_index)
+    
+    if not bypass_cache:
+        cached_questions = generation_cache.get(cache_key_for(backend), select=select)
+        if cached_questions is not None:
+            return cached_questions
+    
+    generation_kwargs = {**kwargs, "num_questions": kwargs["num_questions"] * CACHE_OVERSAMPLE}
+    
+    def run_templates():
+        # Template path runs in the worker pool (the index is pickled along with the task)
+        return generation_pool.generate_question_set(seed=seed, dedup_index=dedup_index, **generation_kwargs)
+    
+    if use_openai and openai_generator.use_openai:
+        # LLM-bound work is awaited on the shared pooled client, so it doesn't occupy a worker
+        generated_questions, winner = await openai_generator.agenerate_question_set_hedged(
+            seed=seed, deadline=deadline or None, hedge_after=hedge_after if hedge_after >= 0 else None,
+            template_fallback=run_templates, dedup_index=dedup_index, **generation_kwargs
+        )
+    else:
+        generated_questions = await asyncio.wait_for(run_templates(), deadline or None)
+        winner = "templates"
+    
+    # A template result is cached under the template key, so a later OpenAI request still tries OpenAI
+    if generated_questions:
+        generation_cache.set(cache_key_for("openai" if winner == "openai" else template_backend), generated_questions)
+    # The extra questions stay in the cache for the next request; a short set is returned whole
+    return select(generated_questions) or generated_questions
+
 @app.post("/token", response_model=Token)
 async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
     user = authenticate_user(db, form_data.username, form_data.password)
@@ -427,6 +811,37 @@ async def read_auth_me(current_user: User = Depends(get_current_active_user)):
     """
     return current_user
 
+@app.get("/cache/stats", tags=["Health"])
+async def cache_stats(current_user: User = Depends(get_current_active_user)):
+    """Hit/miss counters for the generation cache (admins only: they cover every user's requests)."""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    return generation_cache.stats()
+
+@app.get("/usage/stats", tags=["Health"])
+async def usage_stats(current_user: User = Depends(get_current_active_user)):
+    """Token totals across recorded OpenAI requests, plus scheduler and hedging counters (admins only)."""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    db = SessionLocal()
+    try:
+        requests, prompt_tokens, completion_tokens, estimated_prompt_tokens = db.query(
+            func.count(GenerationUsage.id),
+            func.coalesce(func.sum(GenerationUsage.prompt_tokens), 0),
+            func.coalesce(func.sum(GenerationUsage.completion_tokens), 0),
+            func.coalesce(func.sum(GenerationUsage.estimated_prompt_tokens), 0)
+        ).one()
+    finally:
+        db.close()
+    return {
+        "requests": requests,
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "estimated_prompt_tokens": estimated_prompt_tokens,
+        "scheduler": llm_scheduler.stats(),
+        "hedging": dict(openai_generator.hedge_stats),
+    }
+
 @app.post("/subjects/", response_model=SubjectResponse)
 async def create_subject(
     subject: SubjectCreate,
@@ -539,11 +954,16 @@ async def create_question(
     db_question = Question(
         **question.dict(),
         created_by=current_user.id,
-        is_verified=current_user.role == "admin"  # Auto-verify if admin
+        is_verified=current_user.role == "admin",  # Auto-verify if admin
+        question_signature=minhash_signature(question.content)
     )
     db.add(db_question)
     db.commit()
     db.refresh(db_question)
+    # Manually written questions are always stored, but later generations are checked against them
+    bank_index = question_bank_indexes.get((db_question.subject_id, db_question.topic_id))
+    if bank_index is not None:
+        bank_index.add(db_question.id, signature=db_question.question_signature)
     return db_question
 
 @app.get("/questions/", response_model=List[QuestionResponse])
@@ -602,42 +1022,140 @@ async def generate_questions(
             raise HTTPException(status_code=404, detail="Topic not found")
         topic_name = db_topic.name
     
-    # Select the appropriate generator based on use_openai parameter
-    generator = openai_generator if request.use_openai else nltk_generator
+    bank_index = get_question_bank_index(db, request.subject_id, request.topic_id)
+    
+    # Generate questions in the worker pool (or serve them from the cache), using the generator selected by use_openai
+    try:
+        generated_questions = await generate_question_set_cached(
+            use_openai=request.use_openai,
+            bypass_cache=request.bypass_cache,
+            seed=request.seed,
+            context=request.context,
+            subject=db_subject.name,
+            topic=topic_name,
+            taxonomy_levels=[level.value for level in request.taxonomy_levels],
+            difficulty_levels=[level.value for level in request.difficulty_levels],
+            num_questions=request.num_questions,
+            deadline=request.deadline_seconds,
+            hedge_after=request.hedge_after_seconds,
+            dedup_index=bank_index
+        )
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Question generation timed out")
+    
+    # Save questions to database
+    db_questions = [
+        save_generated_question(db, q, request.subject_id, request.topic_id, current_user.id, bank_index)
+        for q in generated_questions
+    ]
+    
+    db.commit()
+    
+    # Refresh to get IDs
+    for q in db_questions:
+        db.refresh(q)
+    
+    return db_questions
+
+@app.post("/questions/generate-stream")
+async def generate_questions_stream(
+    request: QuestionGenRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Stream generated questions as NDJSON.
     
-    # Generate questions
-    generated_questions = generator.generate_question_set(
+    Each question is saved as soon as it is produced and emitted as a
+    {"type": "question", "data": {...}} line; the stream ends with
+    {"type": "done", "count": n}.
+    """
+    # Verify subject exists
+    db_subject = db.query(Subject).filter(Subject.id == request.subject_id).first()
+    if not db_subject:
+        raise HTTPException(status_code=404, detail="Subject not found")
+    
+    # Verify topic if provided
+    topic_name = None
+    if request.topic_id:
+        db_topic = db.query(Topic).filter(Topic.id == request.topic_id).first()
+        if not db_topic:
+            raise HTTPException(status_code=404, detail="Topic not found")
+        topic_name = db_topic.name
+    
+    user_id = current_user.id
+    bank_index = get_question_bank_index(db, request.subject_id, request.topic_id)
+    generation_kwargs = dict(
         context=request.context,
         subject=db_subject.name,
         topic=topic_name,
         taxonomy_levels=[level.value for level in request.taxonomy_levels],
         difficulty_levels=[level.value for level in request.difficulty_levels],
-        num_questions=request.num_questions
+        num_questions=request.num_questions,
+        seed=request.seed
     )
     
-    # Save questions to database
-    db_questions = []
-    for q in generated_questions:
-        db_question = Question(
-            content=q['question'],
-            answer=q['answer'],
-            bloom_taxonomy_level=q['taxonomy_level'],
-            difficulty_level=q['difficulty'],
-            subject_id=request.subject_id,
-            topic_id=request.topic_id,
-            created_by=current_user.id,
-            is_verified=False  # Generated questions need verification
+    def cache_key_for(backend):
+        return GenerationCache.make_key(
+            request.context, generation_kwargs["taxonomy_levels"], generation_kwargs["difficulty_levels"],
+            request.num_questions, backend, request.seed
         )
-        db.add(db_question)
-        db_questions.append(db_question)
     
-    db.commit()
+    template_backend = f"template:{QG_BACKEND}"
+    backend = "openai" if request.use_openai else template_backend
     
-    # Refresh to get IDs
-    for q in db_questions:
-        db.refresh(q)
+    async def question_stream():
+        # The request-scoped session is closed before streaming starts, so use a dedicated one
+        stream_db = SessionLocal()
+        produced = []
+        produced_by = backend
+        
+        async def run_templates():
+            # Template path runs in the worker pool, like generate_question_set_cached's fallback
+            nonlocal produced_by
+            produced_by = template_backend
+            return await generation_pool.generate_question_set(dedup_index=bank_index, **generation_kwargs)
+        
+        try:
+            # Streams cache what they produce, without oversampling, so repeats of a saved stream are misses
+            cached_questions = None if request.bypass_cache else generation_cache.get(
+                cache_key_for(backend), select=lambda questions: select_unstored(
+                    questions, request.num_questions, bank_index
+                )
+            )
+            if cached_questions is not None:
+                async def replay():
+                    for q in cached_questions:
+                        yield q
+                source = replay()
+            else:
+                generator = openai_generator if request.use_openai else nltk_generator
+                source = generator.astream_question_set(
+                    **generation_kwargs, dedup_index=bank_index, template_fallback=run_templates
+                )
+            
+            async for q in source:
+                # Persist each question as soon as it is produced
+                db_question = save_generated_question(
+                    stream_db, q, request.subject_id, request.topic_id, user_id, bank_index
+                )
+                stream_db.commit()
+                stream_db.refresh(db_question)
+                produced.append(q)
+                
+                data = QuestionResponse.model_validate(db_question, from_attributes=True).model_dump(mode="json")
+                yield json.dumps({"type": "question", "data": data}) + "\n"
+            
+            # Keyed by the path that produced the questions, so a template fallback isn't served as OpenAI's
+            if produced and cached_questions is None:
+                generation_cache.set(cache_key_for(produced_by), produced)
+            yield json.dumps({"type": "done", "count": len(produced)}) + "\n"
+        except Exception as e:
+            yield json.dumps({"type": "error", "detail": str(e), "count": len(produced)}) + "\n"
+        finally:
+            stream_db.close()
     
-    return db_questions
+    return StreamingResponse(question_stream(), media_type="application/x-ndjson")
 
 @app.post("/questions/generate-from-pdf", response_model=List[QuestionResponse])
 async def generate_questions_from_pdf(
@@ -648,6 +1166,8 @@ async def generate_questions_from_pdf(
     difficulty_levels: str = Form(...),  # JSON string of difficulty levels
     num_questions: int = Form(10),
     use_openai: bool = Form(True),  # Add this parameter with default True
+    seed: Optional[int] = Form(None),
+    bypass_cache: bool = Form(False),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
@@ -673,60 +1193,31 @@ async def generate_questions_from_pdf(
     
     # Process the uploaded PDF file
     try:
-        # Read the uploaded file
-        contents = await file.read()
-        
-        # Create a BytesIO object from the file contents
-        pdf_file = io.BytesIO(contents)
-        
-        # Extract text from PDF
-        pdf_reader = PyPDF2.PdfReader(pdf_file)
-        context_text = ""
-        
-        # Extract text from each page
-        for page_num in range(len(pdf_reader.pages)):
-            page = pdf_reader.pages[page_num]
-            context_text += page.extract_text() + "\n"
-            context_text = "\n".join([
-                line for line in context_text.splitlines()
-                if not line.strip().lower().startswith(("subject code", "savitribai", "mrs.", "publication", "university"))
-                and len(line.strip()) > 30
-        ])
-            
-            
-
-        
-        if not context_text.strip():
-            raise HTTPException(status_code=400, detail="Could not extract text from the PDF file")
+        # A PDF uploaded before is served from the document store without extracting it again
+        db_document = await store_uploaded_document(file, db, current_user)
         
-        # Select the appropriate generator based on use_openai parameter
-        generator = openai_generator if use_openai else nltk_generator
+        bank_index = get_question_bank_index(db, subject_id, topic_id)
         
-        # Generate questions using the extracted text
-        generated_questions = generator.generate_question_set(
-            context=context_text,
+        # Generate questions from the extracted text in the worker pool (or serve them from the cache)
+        generated_questions = await generate_question_set_cached(
+            use_openai=use_openai,
+            bypass_cache=bypass_cache,
+            seed=seed,
+            context=db_document.text,
             subject=db_subject.name,
             topic=topic_name,
             taxonomy_levels=taxonomy_levels_list,
             difficulty_levels=difficulty_levels_list,
-            num_questions=num_questions
+            num_questions=num_questions,
+            dedup_index=bank_index,
+            analysis=document_analysis(db_document)
         )
         
         # Save questions to database
-        db_questions = []
-        for q in generated_questions:
-            db_question = Question(
-                content=q['question'],
-                answer=q['answer'],
-                bloom_taxonomy_level=q['taxonomy_level'],
-                difficulty_level=q['difficulty'],
-                subject_id=subject_id,
-                topic_id=topic_id,
-                created_by=current_user.id,
-                is_verified=False  # Generated questions need verification
-            )
-            db.add(db_question)
-            db_questions.append(db_question)
+        db_questions = [
+            save_generated_question(db, q, subject_id, topic_id, current_user.id, bank_index)
+            for q in generated_questions
+        ]
         
         db.commit()
         
@@ -736,8 +1227,124 @@ async def generate_questions_from_pdf(
         
         return db_questions
         
+    except HTTPException:
+        raise
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Question generation timed out")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error processing PDF file: {str(e)}")
+
+@app.post("/documents/", response_model=DocumentResponse)
+async def upload_document(
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Store a PDF's extracted text and analysis for later generations; a PDF the user stored before is returned as is."""
+    try:
+        return await store_uploaded_document(file, db, current_user)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing PDF file: {str(e)}")
+
+@app.get("/documents/", response_model=List[DocumentResponse])
+async def get_documents(
+    skip: int = 0,
+    limit: int = 100,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    query = db.query(Document)
+    
+    # If not admin, only show own documents
+    if current_user.role != "admin":
+        query = query.filter(Document.created_by == current_user.id)
+    
+    documents = query.order_by(Document.last_used_at.desc()).offset(skip).limit(limit).all()
+    return documents
+
+@app.get("/documents/{document_id}", response_model=DocumentResponse)
+async def get_document(
+    document_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    db_document = db.query(Document).filter(Document.id == document_id).first()
+    if not db_document:
+        raise HTTPException(status_code=404, detail="Document not found")
+    
+    # Check if user has access to this document
+    if current_user.role != "admin" and db_document.created_by != current_user.id:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    return db_document
+
+@app.post("/questions/generate-from-document", response_model=List[QuestionResponse])
+async def generate_questions_from_document(
+    request: QuestionGenDocumentRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Generate questions from a stored document, skipping PDF extraction and text analysis."""
+    db_document = db.query(Document).filter(Document.id == request.document_id).first()
+    if not db_document:
+        raise HTTPException(status_code=404, detail="Document not found")
+    
+    # Check if user has access to this document
+    if current_user.role != "admin" and db_document.created_by != current_user.id:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    
+    # Verify subject exists
+    db_subject = db.query(Subject).filter(Subject.id == request.subject_id).first()
+    if not db_subject:
+        raise HTTPException(status_code=404, detail="Subject not found")
+    
+    # Verify topic if provided
+    topic_name = None
+    if request.topic_id:
+        db_topic = db.query(Topic).filter(Topic.id == request.topic_id).first()
+        if not db_topic:
+            raise HTTPException(status_code=404, detail="Topic not found")
+        topic_name = db_topic.name
+    
+    db_document.last_used_at = datetime.datetime.utcnow()
+    bank_index = get_question_bank_index(db, request.subject_id, request.topic_id)
+    
+    # Generate from the stored text with its stored analysis (or serve the set from the cache)
+    try:
+        generated_questions = await generate_question_set_cached(
+            use_openai=request.use_openai,
+            bypass_cache=request.bypass_cache,
+            seed=request.seed,
+            context=db_document.text,
+            subject=db_subject.name,
+            topic=topic_name,
+            taxonomy_levels=[level.value for level in request.taxonomy_levels],
+            difficulty_levels=[level.value for level in request.difficulty_levels],
+            num_questions=request.num_questions,
+            deadline=request.deadline_seconds,
+            hedge_after=request.hedge_after_seconds,
+            dedup_index=bank_index,
+            analysis=document_analysis(db_document)
+        )
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Question generation timed out")
+    
+    # Save questions to database
+    db_questions = [
+        save_generated_question(db, q, request.subject_id, request.topic_id, current_user.id, bank_index)
+        for q in generated_questions
+    ]
+    
+    db.commit()
+    
+    # Refresh to get IDs
+    for q in db_questions:
+        db.refresh(q)
+    
+    return db_questions
+
+
 @app.post("/question-sets/", response_model=QuestionSetResponse)
 async def create_question_set(
     question_set: QuestionSetCreate,
@@ -0,0 +1,167 @@
+import json
+import math
+import os
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Optional, Pattern, Set, Tuple
+
+# A line (after normalization) on at least this fraction of a PDF's pages, and on at least
+# BOILERPLATE_MIN_PAGES of them, is a running header/footer
+BOILERPLATE_MIN_PAGE_FRACTION = float(os.getenv("EDUQGEN_BOILERPLATE_MIN_PAGE_FRACTION", "0.5"))
+BOILERPLATE_MIN_PAGES = int(os.getenv("EDUQGEN_BOILERPLATE_MIN_PAGES", "3"))
+# Only this many non-empty lines at the top and bottom of each page can be headers/footers (0 = any line)
+BOILERPLATE_EDGE_LINES = int(os.getenv("EDUQGEN_BOILERPLATE_EDGE_LINES", "4"))
+# JSON file mapping institution names to lists of regular expressions matching their boilerplate lines;
+# patterns under "*" apply to every institution
+BOILERPLATE_PATTERNS_FILE = os.getenv("EDUQGEN_BOILERPLATE_PATTERNS")
+
+# Header/footer lines of the SPPU syllabus PDFs, previously dropped by prefix for every upload
+DEFAULT_INSTITUTION_PATTERNS = {
+    "savitribai phule pune university": [
+        r"^subject code", r"^savitribai", r"^mrs\.", r"^publication", r"^university",
+    ],
+}
+
+_DIGITS_RE = re.compile(r"\d+")
+_WHITESPACE_RE = re.compile(r"\s+")
+# Any letter, in any script
+_LETTER_RE = re.compile(r"[^\W\d_]")
+
+
+def normalize_line(line: str) -> str:
+    """
+    Key under which a line is counted across pages: lowercased, whitespace collapsed and
+    digit runs replaced, so "Page 3 of 40" and "Page 4 of 40" are the same line.
+    """
+    return _DIGITS_RE.sub("#", _WHITESPACE_RE.sub(" ", line.strip().lower()))
+
+
+@lru_cache(maxsize=None)
+def institution_patterns(path: Optional[str] = BOILERPLATE_PATTERNS_FILE) -> Dict[str, Tuple[Pattern, ...]]:
+    """
+    Compiled boilerplate patterns per lowercased institution name, loaded once.
+
+    The defaults are extended (not replaced) by the JSON file at path; invalid
+    patterns are reported and skipped.
+    """
+    config = {name: list(patterns) for name, patterns in DEFAULT_INSTITUTION_PATTERNS.items()}
+    if path:
+        try:
+            with open(path, encoding="utf-8") as f:
+                for name, patterns in json.load(f).items():
+                    config.setdefault(name.strip().lower(), []).extend(patterns)
+        except (OSError, ValueError, AttributeError) as e:
+            print(f"Warning: could not load boilerplate patterns from {path}: {e}")
+
+    compiled = {}
+    for name, patterns in config.items():
+        compiled[name] = []
+        for pattern in patterns:
+            try:
+                compiled[name].append(re.compile(pattern, re.IGNORECASE))
+            except re.error as e:
+                print(f"Warning: skipping invalid boilerplate pattern {pattern!r} for {name}: {e}")
+        compiled[name] = tuple(compiled[name])
+    return compiled
+
+
+@dataclass
+class BoilerplateReport:
+    removed_chars: Counter = field(default_factory=Counter)  # By reason: "repeated", "pattern", "no_text"
+    repeated_lines: List[str] = field(default_factory=list)  # Normalized lines detected as headers/footers
+
+    @property
+    def total_removed(self) -> int:
+        return sum(self.removed_chars.values())
+
+    def summary(self) -> str:
+        reasons = ", ".join(f"{count} {reason}" for reason, count in self.removed_chars.most_common())
+        return f"removed {self.total_removed} boilerplate characters" + (f" ({reasons})" if reasons else "")
+
+
+class BoilerplateFilter:
+    """
+    Drops running headers/footers, page numbers and institution-specific boilerplate from PDF pages.
+
+    Headers and footers are learned per document: a line near the top or bottom
+    of a page whose normalized form appears there on enough of the pages is
+    boilerplate. Lines with no letters (page numbers, rules, table fragments)
+    and lines matching the configured patterns are dropped too; short lines of
+    real text are kept.
+    """
+
+    def __init__(self, patterns: Iterable[Pattern] = (), min_page_fraction: float = BOILERPLATE_MIN_PAGE_FRACTION,
+                 min_pages: int = BOILERPLATE_MIN_PAGES, edge_lines: int = BOILERPLATE_EDGE_LINES):
+        """
+        Args:
+            patterns (Iterable[Pattern]): Compiled patterns; a line matching any of them (re.search) is dropped
+            min_page_fraction (float): Fraction of pages a line must appear on to count as a header/footer
+            min_pages (int): Fewest pages a line must appear on; documents with fewer pages skip detection
+            edge_lines (int): Non-empty lines at each end of a page considered for headers/footers (0 = all)
+        """
+        self.patterns = tuple(patterns)
+        self.min_page_fraction = min_page_fraction
+        self.min_pages = min_pages
+        self.edge_lines = edge_lines
+
+    @classmethod
+    def for_institution(cls, institution: Optional[str] = None) -> "BoilerplateFilter":
+        """A filter with the "*" patterns plus those configured for the institution (matched case-insensitively)."""
+        configured = institution_patterns()
+        patterns = list(configured.get("*", ()))
+        if institution:
+            patterns.extend(configured.get(institution.strip().lower(), ()))
+        return cls(patterns)
+
+    def _is_edge(self, position: int, line_count: int) -> bool:
+        """Whether the position-th of a page's line_count non-empty lines is near its top or bottom."""
+        return not self.edge_lines or position < self.edge_lines or position >= line_count - self.edge_lines
+
+    def _edge_lines(self, page: str) -> Iterator[str]:
+        lines = [line for line in page.splitlines() if line.strip()]
+        return (line for position, line in enumerate(lines) if self._is_edge(position, len(lines)))
+
+    def detect_repeated_lines(self, pages: List[str]) -> Set[str]:
+        """Normalized lines occurring near the top or bottom of enough pages to be running headers/footers."""
+        if len(pages) < self.min_pages:
+            return set()
+        # Each line is counted once per page, so repetition within a page doesn't count
+        page_counts = Counter()
+        for page in pages:
+            page_counts.update({normalize_line(line) for line in self._edge_lines(page)})
+        threshold = max(self.min_pages, math.ceil(self.min_page_fraction * len(pages)))
+        return {line for line, count in page_counts.items() if count >= threshold}
+
+    def filter_page(self, text: str, repeated_lines: Set[str], report: BoilerplateReport) -> str:
+        """Drop boilerplate lines from one page, adding the removed characters to report."""
+        lines = [line for line in text.splitlines() if line.strip()]
+        kept = []
+        for position, line in enumerate(lines):
+            stripped = line.strip()
+            if not _LETTER_RE.search(stripped):
+                reason = "no_text"
+            elif self._is_edge(position, len(lines)) and normalize_line(stripped) in repeated_lines:
+                reason = "repeated"
+            elif any(pattern.search(stripped) for pattern in self.patterns):
+                reason = "pattern"
+            else:
+                kept.append(line)
+                continue
+            report.removed_chars[reason] += len(stripped)
+        return "\n".join(kept)
+
+    def filter_pages(self, pages: List[str]) -> Tuple[List[str], BoilerplateReport]:
+        """
+        Learn a document's headers/footers from all of its pages, then filter each page.
+
+        Args:
+            pages (List[str]): Raw text of every page, in page order
+
+        Returns:
+            Tuple[List[str], BoilerplateReport]: Filtered text per page, and what was removed
+        """
+        repeated_lines = self.detect_repeated_lines(pages)
+        report = BoilerplateReport(repeated_lines=sorted(repeated_lines))
+        return [self.filter_page(page, repeated_lines, report) for page in pages], report
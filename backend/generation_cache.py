@@ -0,0 +1,157 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+
+class GenerationCache:
+    """
+    Content-addressed cache of generated question sets.
+
+    A bounded in-memory LRU sits in front of a SQLite table; entries in both
+    tiers expire ttl_seconds after they were generated, and expired rows are
+    pruned on every write. Keys are hashes of the normalized generation
+    inputs, so regenerating from the same chapter text is a lookup.
+    """
+
+    def __init__(self, max_entries: int = 256, db_path: Optional[str] = None,
+                 ttl_seconds: Optional[float] = 7 * 24 * 3600):
+        """
+        Args:
+            max_entries (int): Entries kept in the in-memory LRU tier
+            db_path (str, optional): SQLite file for the disk tier (None disables it)
+            ttl_seconds (float, optional): Lifetime of entries (None keeps them forever)
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "rejected": 0}
+
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS generation_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS ix_generation_cache_created_at ON generation_cache (created_at)"
+            )
+            self._db.commit()
+
+    @classmethod
+    def from_env(cls):
+        """Create a cache configured from EDUQGEN_CACHE_* environment variables."""
+        ttl = float(os.getenv("EDUQGEN_CACHE_TTL", str(7 * 24 * 3600)))
+        return cls(
+            max_entries=int(os.getenv("EDUQGEN_CACHE_SIZE", "256")),
+            db_path=os.getenv("EDUQGEN_CACHE_DB", "./generation_cache.db") or None,
+            ttl_seconds=ttl if ttl > 0 else None,
+        )
+
+    @staticmethod
+    def make_key(context: str, taxonomy_levels: List[str], difficulty_levels: List[str],
+                 num_questions: int, backend: str, seed: Optional[int] = None) -> str:
+        """Hash the generation inputs; whitespace and level ordering don't change the key."""
+        payload = {
+            "context": re.sub(r"\s+", " ", context).strip(),
+            "taxonomy_levels": sorted(taxonomy_levels),
+            "difficulty_levels": sorted(difficulty_levels),
+            "num_questions": num_questions,
+            "backend": backend,
+            "seed": seed,
+        }
+        encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")
+        return hashlib.sha256(encoded).hexdigest()
+
+    def _expired(self, created_at: float) -> bool:
+        return self.ttl_seconds is not None and time.time() - created_at > self.ttl_seconds
+
+    def get(self, key: str, select: Optional[Callable[[List[Dict]], Optional[List[Dict]]]] = None
+            ) -> Optional[List[Dict]]:
+        """
+        Look a key up in memory, then on disk; disk hits are promoted to memory.
+
+        Args:
+            key (str): Key from make_key
+            select (Callable, optional): Picks what to serve from the cached set; if it returns None
+                the lookup counts as a miss (and a rejection), though the entry is kept
+
+        Returns:
+            Optional[List[Dict]]: The served questions, or None on a miss
+        """
+        with self._lock:
+            questions, tier = None, None
+            if key in self._memory:
+                cached, created_at = self._memory[key]
+                if not self._expired(created_at):
+                    self._memory.move_to_end(key)
+                    questions, tier = cached, "memory_hits"
+                else:
+                    del self._memory[key]
+
+            if questions is None and self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, created_at FROM generation_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    value, created_at = row
+                    if not self._expired(created_at):
+                        questions, tier = json.loads(value), "disk_hits"
+                        # Promoted entries keep their original age
+                        self._remember(key, questions, created_at)
+                    else:
+                        # Expired entries are dropped on read
+                        self._db.execute("DELETE FROM generation_cache WHERE key = ?", (key,))
+                        self._db.commit()
+
+            if questions is not None and select is not None:
+                questions = select(questions)
+                if questions is None:
+                    self._counters["rejected"] += 1
+
+            if questions is None:
+                self._counters["misses"] += 1
+                return None
+            self._counters[tier] += 1
+            return questions
+
+    def set(self, key: str, questions: List[Dict]):
+        """Store a generated question set in both tiers, pruning expired disk entries."""
+        created_at = time.time()
+        with self._lock:
+            self._remember(key, questions, created_at)
+            if self._db is not None:
+                if self.ttl_seconds is not None:
+                    self._db.execute(
+                        "DELETE FROM generation_cache WHERE created_at < ?", (created_at - self.ttl_seconds,)
+                    )
+                self._db.execute(
+                    "INSERT OR REPLACE INTO generation_cache (key, value, created_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(questions, ensure_ascii=False), created_at)
+                )
+                self._db.commit()
+
+    def _remember(self, key: str, questions: List[Dict], created_at: float):
+        self._memory[key] = (questions, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def stats(self) -> Dict:
+        """Hit/miss counters (rejected lookups count as misses) and current memory tier size."""
+        with self._lock:
+            hits = self._counters["memory_hits"] + self._counters["disk_hits"]
+            lookups = hits + self._counters["misses"]
+            return {
+                **self._counters,
+                "hits": hits,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+            }
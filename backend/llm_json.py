@@ -0,0 +1,144 @@
+import json
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+# Opening markdown code fence, optionally tagged json
+_FENCE_RE = re.compile(r"```[a-zA-Z]*")
+
+
+class QuestionStreamParser:
+    """
+    Incrementally extracts complete objects from the "questions" array of a JSON
+    response while it is still being streamed.
+
+    feed() can be called with arbitrary fragments; each call returns the question
+    objects that were completed by that fragment.
+    """
+
+    def __init__(self, array_key: Optional[str] = "questions"):
+        # With no key, objects are read from the first array in the text
+        self._key = f'"{array_key}"' if array_key else ""
+        self._buffer = ""
+        self._pos = 0
+        self._in_array = False
+        self._done = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._start = None
+
+    def feed(self, text: str) -> List[Dict]:
+        self._buffer += text
+        completed = []
+        buffer = self._buffer
+
+        while self._pos < len(buffer) and not self._done:
+            if not self._in_array:
+                # Wait until the array key and its opening bracket have arrived
+                key_index = buffer.find(self._key, self._pos)
+                if key_index == -1:
+                    self._pos = max(self._pos, len(buffer) - len(self._key))
+                    break
+                bracket_index = buffer.find("[", key_index + len(self._key))
+                if bracket_index == -1:
+                    self._pos = key_index
+                    break
+                self._in_array = True
+                self._pos = bracket_index + 1
+                continue
+
+            char = buffer[self._pos]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                if self._depth == 0:
+                    self._start = self._pos
+                self._depth += 1
+            elif char == "}":
+                self._depth -= 1
+                if self._depth == 0 and self._start is not None:
+                    try:
+                        item = json.loads(buffer[self._start:self._pos + 1])
+                        if isinstance(item, dict):
+                            completed.append(item)
+                    except json.JSONDecodeError:
+                        pass
+                    self._start = None
+            elif char == "]" and self._depth == 0:
+                self._done = True
+            self._pos += 1
+
+        return completed
+
+
+@dataclass
+class ParsedResponse:
+    """Question objects recovered from an LLM response."""
+    items: List[Dict]
+    complete: bool  # True if the response was a well-formed JSON document
+    salvaged: int  # Items recovered from a malformed or truncated response (0 when complete)
+
+
+def after_opening_fence(content: str) -> Optional[str]:
+    """
+    The content after the first markdown code fence, or None if it has none.
+
+    The closing fence is left in place: it can't be told apart from a fence inside
+    a JSON string without parsing, and decoding stops before it anyway.
+    """
+    match = _FENCE_RE.search(content)
+    return content[match.end():] if match else None
+
+
+def _decode_document(text: str, array_key: str) -> Optional[List[Dict]]:
+    """Question objects of the well-formed JSON document starting at the first bracket, or None."""
+    start = min((i for i in (text.find("{"), text.find("[")) if i != -1), default=-1)
+    if start == -1:
+        return None
+    try:
+        # raw_decode ignores whatever follows the document, such as a closing fence or prose
+        result, _ = json.JSONDecoder().raw_decode(text, start)
+    except json.JSONDecodeError:
+        return None
+    items = result.get(array_key, []) if isinstance(result, dict) else result
+    if not isinstance(items, list):
+        return None
+    return [item for item in items if isinstance(item, dict)]
+
+
+def parse_question_response(content: str, array_key: str = "questions") -> ParsedResponse:
+    """
+    Parse an LLM JSON response, recovering what it can when the JSON is damaged.
+
+    Markdown fences and any text around the JSON document are ignored. If the
+    document is truncated (e.g. the completion hit max_tokens) or otherwise
+    invalid, every complete object in the array is still returned.
+
+    Raises:
+        json.JSONDecodeError: If no question objects could be recovered at all
+    """
+    text = content.strip()
+
+    # The document is decoded where it starts, so a surrounding fence or prose doesn't need stripping
+    # first; fences inside answers (e.g. code samples) stay part of their strings. Only if that
+    # fails is decoding retried after the first fence, for prose with braces before the fence.
+    for candidate in (text, after_opening_fence(text)):
+        items = _decode_document(candidate, array_key) if candidate else None
+        if items is not None:
+            return ParsedResponse(items, True, 0)
+
+    # Damaged document: keep every object that closed before the damage; the parser
+    # skips string contents, so fences and brackets inside answers don't confuse it
+    parser = QuestionStreamParser(array_key if f'"{array_key}"' in text else None)
+    items = parser.feed(text)
+    if not items:
+        raise json.JSONDecodeError("No complete question objects in response", text, 0)
+    return ParsedResponse(items, False, len(items))
@@ -0,0 +1,252 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict, Optional
+
+
+def _is_retryable(error: Exception) -> bool:
+    """Rate limits, timeouts, dropped connections and 5xx responses are worth retrying."""
+    if isinstance(error, asyncio.TimeoutError):
+        return True
+    try:
+        import openai
+    except ImportError:
+        return False
+    return isinstance(error, (
+        openai.RateLimitError,
+        openai.APITimeoutError,
+        openai.APIConnectionError,
+        openai.InternalServerError,
+    ))
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Seconds the server asked us to wait, if it sent a Retry-After header."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class LLMScheduler:
+    """
+    Admission control for upstream LLM calls.
+
+    Every call waits for a share of a tokens-per-minute budget and a global
+    concurrency slot, retryable failures are retried with exponential backoff
+    and full jitter, and calls submitted with the same key while one is
+    already in flight share that call's result instead of going upstream again.
+    A shared call is cancelled once every caller waiting on it has been
+    cancelled (e.g. the losing side of a hedged generation); tokens the server
+    had already generated by then are still billed.
+
+    The budget, the slots and the in-flight calls live on the scheduler's own
+    event loop, run on a daemon thread, so the limits hold across every loop in
+    the process (the application's, and those the synchronous wrappers start
+    with asyncio.run); callers on other loops hand their work to it.
+    """
+
+    def __init__(self, max_concurrency: int = 8, tokens_per_minute: int = 90000, max_retries: int = 4,
+                 base_delay: float = 1.0, max_delay: float = 30.0):
+        """
+        Args:
+            max_concurrency (int): Upstream calls allowed in flight at once
+            tokens_per_minute (int): Token budget refilled continuously (0 disables the budget)
+            max_retries (int): Retries after the first attempt for retryable errors
+            base_delay (float): Backoff before the first retry, doubled for each further retry
+            max_delay (float): Upper bound on a single backoff
+        """
+        self.max_concurrency = max_concurrency
+        self.tokens_per_minute = tokens_per_minute
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self._tokens = float(tokens_per_minute)
+        self._refilled_at = time.monotonic()
+        self._inflight = {}
+        self._waiters = {}
+        self._counters = {"calls": 0, "coalesced": 0, "retries": 0, "failures": 0, "abandoned": 0}
+        # retry runs on the caller's loop, so counters can be updated from several threads
+        self._counters_lock = threading.Lock()
+
+        # Only ever used on the scheduler loop, which starts on first use
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._budget_lock = asyncio.Lock()
+        self._loop = None
+        self._start_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """Create a scheduler configured from OPENAI_* environment variables."""
+        return cls(
+            max_concurrency=int(os.getenv("OPENAI_MAX_CONCURRENCY", "8")),
+            tokens_per_minute=int(os.getenv("OPENAI_TOKENS_PER_MINUTE", "90000")),
+            max_retries=int(os.getenv("OPENAI_MAX_RETRIES", "4")),
+            base_delay=float(os.getenv("OPENAI_RETRY_BASE_DELAY", "1.0")),
+            max_delay=float(os.getenv("OPENAI_RETRY_MAX_DELAY", "30")),
+        )
+
+    @staticmethod
+    def request_key(request: Dict) -> str:
+        """Hash of a request's parameters; identical requests coalesce onto one call."""
+        encoded = json.dumps(request, sort_keys=True, default=str, ensure_ascii=False).encode("utf-8")
+        return hashlib.sha256(encoded).hexdigest()
+
+    def _count(self, counter: str):
+        with self._counters_lock:
+            self._counters[counter] += 1
+
+    def _scheduler_loop(self) -> asyncio.AbstractEventLoop:
+        """The loop all scheduler state lives on, started on a daemon thread the first time it is needed."""
+        with self._start_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="llm-scheduler", daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+    async def _run_on_scheduler_loop(self, coroutine):
+        """Await a coroutine on the scheduler loop from any loop; cancelling the caller cancels it there too."""
+        loop = self._scheduler_loop()
+        if asyncio.get_running_loop() is loop:
+            return await coroutine
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coroutine, loop))
+
+    async def _acquire_tokens(self, tokens: int):
+        """Wait until the token bucket holds enough tokens, then take them."""
+        if self.tokens_per_minute <= 0:
+            return
+        # A single request larger than the whole budget only has to wait for a full bucket
+        tokens = min(tokens, self.tokens_per_minute)
+        rate = self.tokens_per_minute / 60.0
+
+        # Waiters queue on the lock, so a large request is not starved by smaller ones
+        async with self._budget_lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.tokens_per_minute, self._tokens + (now - self._refilled_at) * rate)
+                self._refilled_at = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self._tokens) / rate)
+
+    async def _acquire_slot(self, tokens: int):
+        await self._acquire_tokens(tokens)
+        await self._semaphore.acquire()
+        self._count("calls")
+
+    @asynccontextmanager
+    async def limit(self, tokens: int = 0):
+        """Hold a concurrency slot (after reserving tokens) for the duration of the block, on any loop."""
+        loop = self._scheduler_loop()
+        if asyncio.get_running_loop() is loop:
+            await self._acquire_slot(tokens)
+        else:
+            acquired = asyncio.run_coroutine_threadsafe(self._acquire_slot(tokens), loop)
+            try:
+                await asyncio.wrap_future(acquired)
+            except asyncio.CancelledError:
+                # The slot may have been taken just before the cancellation reached the scheduler loop
+                acquired.add_done_callback(
+                    lambda done: done.cancelled() or done.exception() or loop.call_soon_threadsafe(
+                        self._semaphore.release
+                    )
+                )
+                raise
+        try:
+            yield
+        finally:
+            loop.call_soon_threadsafe(self._semaphore.release)
+
+    async def retry(self, call: Callable[[], Awaitable]):
+        """Await call(), retrying retryable errors with exponential backoff and full jitter."""
+        attempt = 0
+        while True:
+            try:
+                return await call()
+            except Exception as e:
+                if attempt >= self.max_retries or not _is_retryable(e):
+                    self._count("failures")
+                    raise
+                # Full jitter spreads retries from simultaneous failures apart
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                retry_after = _retry_after(e)
+                if retry_after is not None:
+                    delay = max(delay, min(retry_after, self.max_delay))
+                attempt += 1
+                self._count("retries")
+                print(f"LLM call failed ({type(e).__name__}), retry {attempt}/{self.max_retries} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    async def submit(self, call: Callable[[], Awaitable], tokens: int = 0, key: Optional[str] = None):
+        """
+        Run an upstream call under the scheduler's limits.
+
+        Args:
+            call (Callable): Zero-argument function returning the awaitable to run; it is called on the
+                scheduler loop, so it must not use objects bound to the caller's loop
+            tokens (int): Estimated prompt plus completion tokens, charged to the per-minute budget
+            key (str, optional): Coalescing key (see request_key); None always makes a new call
+
+        Returns:
+            The call's result, shared with every concurrent submission of the same key
+        """
+        return await self._run_on_scheduler_loop(self._submit(call, tokens, key))
+
+    async def _submit(self, call: Callable[[], Awaitable], tokens: int, key: Optional[str]):
+        if key is not None and key in self._inflight:
+            self._count("coalesced")
+            return await self._await_shared(self._inflight[key])
+
+        async def run():
+            async with self.limit(tokens):
+                return await self.retry(call)
+
+        if key is None:
+            return await run()
+
+        task = asyncio.ensure_future(run())
+        self._inflight[key] = task
+
+        def forget(done):
+            if self._inflight.get(key) is done:
+                del self._inflight[key]
+
+        task.add_done_callback(forget)
+        return await self._await_shared(task)
+
+    async def _await_shared(self, task: asyncio.Future):
+        """Wait for a shared call; the last of its callers to be cancelled cancels the call too."""
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            # Shield so one caller being cancelled doesn't cancel the call for the others
+            return await asyncio.shield(task)
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+                if not task.done():
+                    self._count("abandoned")
+                    task.cancel()
+
+    async def run(self, coroutine_function: Callable[[], Awaitable]):
+        """Await coroutine_function() on the scheduler loop, e.g. to close the client it uses on shutdown."""
+        return await self._run_on_scheduler_loop(coroutine_function())
+
+    def stats(self) -> Dict:
+        """Call, coalescing, retry, failure and abandoned-call counters."""
+        with self._counters_lock:
+            return {**self._counters, "in_flight": len(self._inflight)}
+
+
+# Shared by every generator in the process so the limits are global
+llm_scheduler = LLMScheduler.from_env()
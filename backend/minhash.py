@@ -0,0 +1,131 @@
+import threading
+import zlib
+from collections import defaultdict
+from typing import Hashable, List, Optional
+
+import numpy as np
+
+# Mersenne prime modulus for the universal hash family
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+NUM_PERM = 64
+NUM_BANDS = 16
+
+
+class MinHasher:
+    """
+    MinHash signatures over a text's lowercased word set.
+
+    The word set matches QuestionGenerator._text_similarity, so the fraction of
+    equal signature slots estimates that function's Jaccard similarity.
+    """
+
+    def __init__(self, num_perm: int = NUM_PERM, seed: int = 1):
+        rng = np.random.RandomState(seed)
+        # a, b < 2**32 keep a * hash + b below 2**64, so uint64 arithmetic never wraps
+        self.a = rng.randint(1, _MAX_HASH, size=num_perm, dtype=np.uint64)
+        self.b = rng.randint(0, _MAX_HASH, size=num_perm, dtype=np.uint64)
+        self.num_perm = num_perm
+
+    def signature(self, text: str) -> List[int]:
+        tokens = set(text.lower().split())
+        if not tokens:
+            return [_MAX_HASH] * self.num_perm
+        hashes = np.fromiter((zlib.crc32(token.encode("utf-8")) for token in tokens),
+                             dtype=np.uint64, count=len(tokens))
+        permuted = (hashes[:, None] * self.a + self.b) % np.uint64(_PRIME) & np.uint64(_MAX_HASH)
+        return permuted.min(axis=0).tolist()
+
+
+# Signatures are only comparable when made with the same hasher; this one is also what gets persisted
+default_hasher = MinHasher()
+
+
+def minhash_signature(text: str) -> List[int]:
+    """Signature of a text with the shared hasher."""
+    return default_hasher.signature(text)
+
+
+def estimated_similarity(signature1: List[int], signature2: List[int]) -> float:
+    """Estimated Jaccard similarity of the texts behind two signatures."""
+    return sum(x == y for x, y in zip(signature1, signature2)) / len(signature1)
+
+
+class NearDuplicateIndex:
+    """
+    LSH index of MinHash signatures for near-constant-time near-duplicate checks.
+
+    Signatures are split into bands; texts sharing any band are candidates and
+    are confirmed by their estimated similarity. With 16 bands of 4 rows, a pair
+    at similarity 0.8 becomes a candidate with probability above 0.999.
+
+    An index can be layered on a base index (e.g. the stored question bank):
+    lookups search both, additions only go to the layer. Indexes can be pickled,
+    e.g. to send the bank to a worker process.
+    """
+
+    def __init__(self, threshold: float = 0.8, base: "NearDuplicateIndex" = None,
+                 num_bands: int = NUM_BANDS, hasher: MinHasher = None):
+        """
+        Args:
+            threshold (float): Estimated similarity above which two texts are near-duplicates
+            base (NearDuplicateIndex, optional): Read-only index also searched by find()
+            num_bands (int): LSH bands; must divide the hasher's num_perm
+            hasher (MinHasher, optional): Defaults to the shared hasher
+        """
+        self.hasher = hasher or default_hasher
+        if self.hasher.num_perm % num_bands:
+            raise ValueError("num_bands must divide num_perm")
+        self.threshold = threshold
+        self.base = base
+        self.rows = self.hasher.num_perm // num_bands
+        self._bands = [defaultdict(list) for _ in range(num_bands)]
+        self._signatures = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._signatures)
+
+    def __getstate__(self):
+        with self._lock:
+            state = self.__dict__.copy()
+            state["_bands"] = [dict(band) for band in self._bands]
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        state["_bands"] = [defaultdict(list, band) for band in state["_bands"]]
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _band_keys(self, signature: List[int]):
+        for band in range(len(self._bands)):
+            yield band, tuple(signature[band * self.rows:(band + 1) * self.rows])
+
+    def add(self, key: Hashable, text: str = None, signature: List[int] = None) -> List[int]:
+        """Index a text (or a precomputed signature) under key; returns the signature."""
+        if signature is None:
+            signature = self.hasher.signature(text)
+        with self._lock:
+            self._signatures[key] = signature
+            for band, band_key in self._band_keys(signature):
+                self._bands[band][band_key].append(key)
+        return signature
+
+    def find(self, text: str = None, signature: List[int] = None) -> Optional[Hashable]:
+        """Key of an indexed near-duplicate of the text, or None."""
+        if signature is None:
+            signature = self.hasher.signature(text)
+        with self._lock:
+            checked = set()
+            for band, band_key in self._band_keys(signature):
+                for key in self._bands[band].get(band_key, ()):
+                    if key in checked:
+                        continue
+                    checked.add(key)
+                    if estimated_similarity(signature, self._signatures[key]) > self.threshold:
+                        return key
+        if self.base is not None:
+            return self.base.find(signature=signature)
+        return None
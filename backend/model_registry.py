@@ -0,0 +1,70 @@
+import threading
+from typing import Any, Callable, Dict
+
+
+class ModelRegistry:
+    """
+    Process-wide registry for heavy NLP models (spaCy, transformers pipelines).
+
+    The registry is the single owner of every model it loads. Generators borrow
+    a model with acquire() and hand it back with release(); the model is loaded
+    once per process on first acquire and dropped when the last borrower
+    releases it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loaders: Dict[str, Callable[[], Any]] = {}
+        self._models: Dict[str, Any] = {}
+        self._refcounts: Dict[str, int] = {}
+        self._load_locks: Dict[str, threading.Lock] = {}
+
+    def register(self, name: str, loader: Callable[[], Any]):
+        """
+        Register a loader for a model name.
+
+        Args:
+            name (str): Key the model is borrowed under
+            loader (Callable): Zero-argument callable that builds the model
+        """
+        with self._lock:
+            # Keep the first loader so an already-loaded model is never replaced
+            if name not in self._loaders:
+                self._loaders[name] = loader
+                self._load_locks[name] = threading.Lock()
+
+    def acquire(self, name: str) -> Any:
+        """Borrow a model, loading it if this is the first borrower in the process."""
+        if name not in self._loaders:
+            raise KeyError(f"No loader registered for model '{name}'")
+
+        # Load under a per-model lock so slow loads don't block other models
+        with self._load_locks[name]:
+            if name not in self._models:
+                self._models[name] = self._loaders[name]()
+            with self._lock:
+                self._refcounts[name] = self._refcounts.get(name, 0) + 1
+            return self._models[name]
+
+    def release(self, name: str):
+        """Return a borrowed model; the last release unloads it."""
+        with self._load_locks[name]:
+            with self._lock:
+                count = self._refcounts.get(name, 0) - 1
+                if count > 0:
+                    self._refcounts[name] = count
+                    return
+                self._refcounts.pop(name, None)
+            self._models.pop(name, None)
+
+    def is_loaded(self, name: str) -> bool:
+        """Check whether a model is currently held by the registry."""
+        return name in self._models
+
+    def refcount(self, name: str) -> int:
+        """Number of outstanding borrows for a model."""
+        return self._refcounts.get(name, 0)
+
+
+# Shared registry used by every QuestionGenerator in this process
+model_registry = ModelRegistry()
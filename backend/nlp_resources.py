@@ -0,0 +1,162 @@
+"""
+NLP resource manifest and offline bootstrap.
+
+Run once on a machine with network access (or while building the image):
+
+    python nlp_resources.py prepare-resources [--dir DIR]
+
+This vendors the NLTK data, the spaCy model and the T5 question generation
+model into EDUQGEN_RESOURCES_DIR. At runtime only local existence checks are
+made; nothing here downloads anything unless prepare-resources is run.
+"""
+import argparse
+import json
+import os
+import sys
+from typing import Dict, List
+
+# Directory the resources are vendored into
+RESOURCES_DIR = os.getenv(
+    "EDUQGEN_RESOURCES_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "nlp_data")
+)
+
+# Everything the generators need, keyed by resource type
+RESOURCE_MANIFEST = {
+    # NLTK package id -> path checked with nltk.data.find()
+    "nltk": {
+        "punkt": "tokenizers/punkt",
+        "punkt_tab": "tokenizers/punkt_tab",
+        "averaged_perceptron_tagger": "taggers/averaged_perceptron_tagger",
+        "averaged_perceptron_tagger_eng": "taggers/averaged_perceptron_tagger_eng",
+        "stopwords": "corpora/stopwords",
+    },
+    "spacy": ["en_core_web_sm"],
+    "transformers": ["valhalla/t5-base-qg-hl"],
+}
+
+MANIFEST_FILENAME = "manifest.json"
+
+
+def nltk_data_dir(base_dir: str = None) -> str:
+    return os.path.join(base_dir or RESOURCES_DIR, "nltk")
+
+
+def spacy_model_dir(name: str, base_dir: str = None) -> str:
+    return os.path.join(base_dir or RESOURCES_DIR, "spacy", name)
+
+
+def transformers_model_dir(name: str, base_dir: str = None) -> str:
+    # Hub ids contain a slash; keep one flat directory per model
+    return os.path.join(base_dir or RESOURCES_DIR, "transformers", name.replace("/", "__"))
+
+
+def configure_nltk(base_dir: str = None) -> List[str]:
+    """
+    Point NLTK at the vendored data directory and report missing packages.
+
+    Only the local filesystem is checked.
+
+    Returns:
+        List[str]: NLTK package ids that could not be found
+    """
+    import nltk
+
+    data_dir = nltk_data_dir(base_dir)
+    if data_dir not in nltk.data.path:
+        nltk.data.path.insert(0, data_dir)
+
+    missing = []
+    for package, resource_path in RESOURCE_MANIFEST["nltk"].items():
+        try:
+            nltk.data.find(resource_path)
+        except LookupError:
+            missing.append(package)
+    return missing
+
+
+def resolve_spacy_model(name: str, base_dir: str = None) -> str:
+    """Return the vendored spaCy model directory if present, otherwise the installed package name."""
+    path = spacy_model_dir(name, base_dir)
+    return path if os.path.isdir(path) else name
+
+
+def resolve_transformers_model(name: str, base_dir: str = None) -> str:
+    """Return the vendored model directory if present, otherwise the hub id (resolved from the local HF cache)."""
+    path = transformers_model_dir(name, base_dir)
+    return path if os.path.isdir(path) else name
+
+
+def check_resources(base_dir: str = None) -> Dict[str, List[str]]:
+    """Report which manifest entries are missing locally, without touching the network."""
+    missing = {"nltk": configure_nltk(base_dir), "spacy": [], "transformers": []}
+
+    for name in RESOURCE_MANIFEST["spacy"]:
+        if not os.path.isdir(spacy_model_dir(name, base_dir)):
+            missing["spacy"].append(name)
+
+    for name in RESOURCE_MANIFEST["transformers"]:
+        if not os.path.isdir(transformers_model_dir(name, base_dir)):
+            missing["transformers"].append(name)
+
+    return missing
+
+
+def prepare_resources(base_dir: str = None):
+    """Download every manifest entry into the resources directory (requires network access)."""
+    import nltk
+
+    base_dir = base_dir or RESOURCES_DIR
+    os.makedirs(base_dir, exist_ok=True)
+
+    # NLTK data
+    for package in RESOURCE_MANIFEST["nltk"]:
+        print(f"Fetching NLTK package '{package}'...")
+        if not nltk.download(package, download_dir=nltk_data_dir(base_dir), quiet=True):
+            raise RuntimeError(f"Failed to download NLTK package '{package}'")
+
+    # spaCy models are serialized to disk so they load by path
+    import spacy
+    for name in RESOURCE_MANIFEST["spacy"]:
+        print(f"Vendoring spaCy model '{name}'...")
+        try:
+            nlp = spacy.load(name)
+        except OSError:
+            from spacy.cli import download
+            download(name)
+            nlp = spacy.load(name)
+        nlp.to_disk(spacy_model_dir(name, base_dir))
+
+    # Transformers models are saved with their tokenizer
+    from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+    for name in RESOURCE_MANIFEST["transformers"]:
+        print(f"Vendoring transformers model '{name}'...")
+        target = transformers_model_dir(name, base_dir)
+        AutoTokenizer.from_pretrained(name).save_pretrained(target)
+        AutoModelForSeq2SeqLM.from_pretrained(name).save_pretrained(target)
+
+    with open(os.path.join(base_dir, MANIFEST_FILENAME), "w", encoding="utf-8") as f:
+        json.dump(RESOURCE_MANIFEST, f, indent=2)
+
+    print(f"NLP resources prepared in {base_dir}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the NLP resources used by EduQGen")
+    parser.add_argument("command", choices=["prepare-resources", "check-resources"])
+    parser.add_argument("--dir", default=None, help=f"Resources directory (default: {RESOURCES_DIR})")
+    args = parser.parse_args(argv)
+
+    if args.command == "prepare-resources":
+        prepare_resources(args.dir)
+        return 0
+
+    missing = check_resources(args.dir)
+    for kind, names in missing.items():
+        for name in names:
+            print(f"Missing {kind} resource: {name}")
+    return 1 if any(missing.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
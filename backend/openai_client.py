@@ -0,0 +1,90 @@
+import asyncio
+import os
+import weakref
+from typing import Optional
+
+# Chat model used for question generation
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
+
+# Alternative API endpoint, e.g. the local stub in openai_stub.py (unset uses the OpenAI API)
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+
+# Connection pool and timeout settings for the shared async client
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "20"))
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "60"))
+OPENAI_CONNECT_TIMEOUT = float(os.getenv("OPENAI_CONNECT_TIMEOUT", "10"))
+
+# Contexts longer than this are split into chunks that are generated concurrently
+OPENAI_CHUNK_TOKENS = int(os.getenv("OPENAI_CHUNK_TOKENS", "3000"))
+OPENAI_CHUNK_CONCURRENCY = int(os.getenv("OPENAI_CHUNK_CONCURRENCY", "4"))
+
+# Completion budget: sized from the number of questions requested, capped at the old fixed limit
+OPENAI_TOKENS_PER_QUESTION = int(os.getenv("OPENAI_TOKENS_PER_QUESTION", "250"))
+OPENAI_MAX_COMPLETION_TOKENS = int(os.getenv("OPENAI_MAX_COMPLETION_TOKENS", "4000"))
+
+# Contexts above this many tokens are extractively compressed before prompting (0 disables)
+OPENAI_CONTEXT_TOKEN_BUDGET = int(os.getenv("OPENAI_CONTEXT_TOKEN_BUDGET", "0"))
+
+# Follow-up requests allowed per question set to fill buckets left short by deduplication (0 disables)
+OPENAI_TOP_UP_ROUNDS = int(os.getenv("OPENAI_TOP_UP_ROUNDS", "2"))
+
+# One client per event loop: an httpx connection pool can't be shared between loops
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_client(api_key: Optional[str] = None):
+    """
+    Return the running event loop's AsyncOpenAI client, creating it on first use.
+
+    Every request on the loop shares one pooled httpx connection pool, so concurrent
+    generations reuse keep-alive connections instead of opening new ones.
+    Non-streamed requests all run on llm_scheduler's loop, so they share its
+    client whichever loop (the application's, or run_sync's) they came from;
+    streams use the client of the loop consuming them.
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        import httpx
+        import openai
+
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=OPENAI_MAX_CONNECTIONS,
+                max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS
+            ),
+            timeout=httpx.Timeout(OPENAI_TIMEOUT, connect=OPENAI_CONNECT_TIMEOUT)
+        )
+        client = openai.AsyncOpenAI(
+            # Same key priority as QuestionGenerator: explicit key > module key > environment
+            api_key=api_key or openai.api_key or os.environ.get("OPENAI_KEY"),
+            base_url=OPENAI_BASE_URL,
+            http_client=http_client,
+            # Retries are handled by llm_scheduler, which also respects the shared rate budget
+            max_retries=0
+        )
+        _async_clients[loop] = client
+    return client
+
+
+async def close_async_client():
+    """Close the running loop's client and its connection pool (call on application shutdown)."""
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.close()
+
+
+def run_sync(coroutine_function, *args, **kwargs):
+    """
+    Run an async OpenAI call from synchronous code, on a new event loop whose client is closed afterwards.
+
+    Must not be called from a thread that is already running an event loop.
+    """
+    async def run():
+        try:
+            return await coroutine_function(*args, **kwargs)
+        finally:
+            await close_async_client()
+
+    return asyncio.run(run())
@@ -0,0 +1,240 @@
+"""
+Local stand-in for the OpenAI chat completions API, for offline load and latency testing.
+
+Point the backend at it with OPENAI_BASE_URL (any OPENAI_KEY value works):
+
+    python openai_stub.py --port 8100 --latency-ms 800 --jitter-ms 400 --rate-limit-rate 0.1
+    OPENAI_BASE_URL=http://127.0.0.1:8100/v1 OPENAI_KEY=stub uvicorn app:app
+
+Responses follow the question set JSON schema requested by QuestionGenerator,
+with counts, taxonomy levels and difficulties read from the prompt.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Dict, List
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# "- 3 questions with:\n - Taxonomy Level: remember\n - Difficulty: easy" blocks in the prompt
+_SPEC_RE = re.compile(
+    r"-\s*(\d+)\s+questions? with:\s*-\s*Taxonomy Level:\s*(\w+)\s*-\s*Difficulty:\s*(\w+)", re.IGNORECASE
+)
+_CONTEXT_RE = re.compile(r"Context:\s*(.*?)\s*Generate questions with", re.DOTALL)
+
+
+@dataclass
+class StubConfig:
+    latency_ms: float = 500.0  # Median latency before the response (or first chunk)
+    jitter_ms: float = 200.0  # Spread of the latency distribution
+    distribution: str = "lognormal"  # "fixed", "uniform" or "lognormal"
+    error_rate: float = 0.0  # Fraction of requests answered with a 500
+    rate_limit_rate: float = 0.0  # Fraction of requests answered with a 429
+    retry_after: float = 1.0  # Retry-After header sent with injected 429s
+    truncate_rate: float = 0.0  # Fraction of responses cut off mid-JSON (finish_reason "length")
+    chunk_chars: int = 24  # Characters per streamed delta
+    seed: int = None
+
+    @classmethod
+    def from_env(cls):
+        """Read settings from OPENAI_STUB_* environment variables."""
+        seed = os.getenv("OPENAI_STUB_SEED")
+        return cls(
+            latency_ms=float(os.getenv("OPENAI_STUB_LATENCY_MS", "500")),
+            jitter_ms=float(os.getenv("OPENAI_STUB_JITTER_MS", "200")),
+            distribution=os.getenv("OPENAI_STUB_DISTRIBUTION", "lognormal"),
+            error_rate=float(os.getenv("OPENAI_STUB_ERROR_RATE", "0")),
+            rate_limit_rate=float(os.getenv("OPENAI_STUB_RATE_LIMIT_RATE", "0")),
+            retry_after=float(os.getenv("OPENAI_STUB_RETRY_AFTER", "1")),
+            truncate_rate=float(os.getenv("OPENAI_STUB_TRUNCATE_RATE", "0")),
+            chunk_chars=int(os.getenv("OPENAI_STUB_CHUNK_CHARS", "24")),
+            seed=int(seed) if seed else None,
+        )
+
+
+def create_stub_app(config: StubConfig = None) -> FastAPI:
+    """Build the stub app; counters are served at GET /stats."""
+    config = config or StubConfig.from_env()
+    rng = random.Random(config.seed)
+    counters = {"requests": 0, "errors": 0, "rate_limited": 0, "truncated": 0}
+    stub = FastAPI(title="EduQGen OpenAI stub")
+
+    def sample_latency() -> float:
+        if config.distribution == "fixed" or config.jitter_ms <= 0:
+            latency = config.latency_ms
+        elif config.distribution == "uniform":
+            latency = rng.uniform(config.latency_ms - config.jitter_ms, config.latency_ms + config.jitter_ms)
+        else:
+            # Median latency_ms with a long right tail, like real API latencies
+            sigma = config.jitter_ms / max(config.latency_ms, 1.0)
+            latency = config.latency_ms * rng.lognormvariate(0.0, sigma)
+        return max(latency, 0.0) / 1000
+
+    def error_response(status_code: int, message: str, error_type: str, headers: Dict = None):
+        return JSONResponse(
+            status_code=status_code,
+            content={"error": {"message": message, "type": error_type, "code": None}},
+            headers=headers
+        )
+
+    @stub.get("/v1/models")
+    async def list_models():
+        return {"object": "list", "data": [{"id": "stub", "object": "model", "owned_by": "eduqgen"}]}
+
+    @stub.get("/stats")
+    async def stats():
+        return counters
+
+    @stub.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        counters["requests"] += 1
+        await asyncio.sleep(sample_latency())
+
+        roll = rng.random()
+        if roll < config.rate_limit_rate:
+            counters["rate_limited"] += 1
+            return error_response(429, "Rate limit reached (injected by stub)", "rate_limit_exceeded",
+                                  headers={"retry-after": str(config.retry_after)})
+        if roll < config.rate_limit_rate + config.error_rate:
+            counters["errors"] += 1
+            return error_response(500, "Internal error (injected by stub)", "server_error")
+
+        prompt = "\n".join(str(message.get("content", "")) for message in body.get("messages", []))
+        content = json.dumps(_build_questions(prompt, rng), indent=2)
+        finish_reason = "stop"
+        if rng.random() < config.truncate_rate:
+            counters["truncated"] += 1
+            content = content[:rng.randint(len(content) // 4, len(content) * 3 // 4)]
+            finish_reason = "length"
+
+        model = body.get("model", "stub")
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        usage = {
+            "prompt_tokens": (len(prompt) + 3) // 4,
+            "completion_tokens": (len(content) + 3) // 4,
+            "total_tokens": (len(prompt) + 3) // 4 + (len(content) + 3) // 4,
+        }
+
+        if not body.get("stream"):
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": finish_reason,
+                }],
+                "usage": usage,
+            }
+
+        include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+
+        async def events():
+            def event(choices, **extra):
+                chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                         "model": model, "choices": choices, **extra}
+                return f"data: {json.dumps(chunk)}\n\n"
+
+            yield event([{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}])
+            for start in range(0, len(content), config.chunk_chars):
+                # Spread roughly another latency_ms over the deltas, like token-by-token decoding
+                await asyncio.sleep(config.latency_ms / 1000 / max(len(content) / config.chunk_chars, 1))
+                piece = content[start:start + config.chunk_chars]
+                yield event([{"index": 0, "delta": {"content": piece}, "finish_reason": None}])
+            yield event([{"index": 0, "delta": {}, "finish_reason": finish_reason}])
+            if include_usage:
+                yield event([], usage=usage)
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return stub
+
+
+# Question wordings, rotated each time the sentences run out
+_QUESTION_STEMS = (
+    "What does the text say about {}?",
+    "Explain how the passage describes {}.",
+    "Why might an author mention {}?",
+    "Summarize any details given on {}.",
+)
+
+
+def _topic(sentence: str) -> str:
+    return " ".join(sentence.split()[:6]).rstrip(".,;:")
+
+
+def _build_questions(prompt: str, rng: random.Random) -> Dict:
+    """Schema-valid question set for the specs in a QuestionGenerator prompt."""
+    specs = [(int(count), taxonomy, difficulty) for count, taxonomy, difficulty in _SPEC_RE.findall(prompt)]
+    if not specs:
+        specs = [(3, "understand", "medium")]
+
+    match = _CONTEXT_RE.search(prompt)
+    context = match.group(1) if match else prompt
+    sentences = [s.strip() for s in re.split(r"(?<=[.!?])\s+", context) if len(s.split()) >= 4] or [context.strip()]
+
+    # Near-duplicate filtering compares word sets, so questions differing only in their bucket prefix would be
+    # dropped: every sentence is used once before any is reused, and a reused sentence is paired with a different
+    # second one and asked about in a different wording. Contexts with very few sentences still produce repeats.
+    order = rng.sample(range(len(sentences)), len(sentences))
+    questions: List[Dict] = []
+    for count, taxonomy, difficulty in specs:
+        for _ in range(count):
+            reuse, position = divmod(len(questions), len(order))
+            sentence = sentences[order[position]]
+            topic, answer = _topic(sentence), sentence
+            if reuse:
+                partner = sentences[order[(position + reuse) % len(order)]]
+                topic, answer = f"{topic} and {_topic(partner)}", f"{sentence} {partner}"
+            stem = _QUESTION_STEMS[reuse % len(_QUESTION_STEMS)]
+            questions.append({
+                "question": f"[{taxonomy}/{difficulty}] " + stem.format(topic),
+                "answer": answer,
+                "taxonomy_level": taxonomy,
+                "difficulty": difficulty,
+            })
+    return {"questions": questions}
+
+
+app = create_stub_app()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local OpenAI-compatible stub for load testing.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency-ms", type=float)
+    parser.add_argument("--jitter-ms", type=float)
+    parser.add_argument("--distribution", choices=("fixed", "uniform", "lognormal"))
+    parser.add_argument("--error-rate", type=float)
+    parser.add_argument("--rate-limit-rate", type=float)
+    parser.add_argument("--retry-after", type=float)
+    parser.add_argument("--truncate-rate", type=float)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    # Command-line flags override OPENAI_STUB_* environment settings
+    config = StubConfig.from_env()
+    for field in ("latency_ms", "jitter_ms", "distribution", "error_rate", "rate_limit_rate",
+                  "retry_after", "truncate_rate", "seed"):
+        value = getattr(args, field)
+        if value is not None:
+            setattr(config, field, value)
+
+    import uvicorn
+    uvicorn.run(create_stub_app(config), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
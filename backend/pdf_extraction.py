@@ -0,0 +1,152 @@
+import io
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import BinaryIO, Iterator, List, Optional, Tuple, Union
+
+import PyPDF2
+
+from boilerplate import BoilerplateFilter, BoilerplateReport
+
+# Worker processes for page extraction, and the page count below which one process is faster
+PDF_EXTRACT_PROCESSES = int(os.getenv("EDUQGEN_PDF_PROCESSES", str(min(4, os.cpu_count() or 1))))
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("EDUQGEN_PDF_PARALLEL_MIN_PAGES", "40"))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+@dataclass
+class PageStats:
+    page_number: int  # 1-based
+    extract_seconds: float
+    raw_chars: int
+    kept_chars: int
+
+
+@dataclass
+class ExtractionResult:
+    text: str
+    pages: List[str] = field(default_factory=list)  # Filtered text per page, in page order
+    page_stats: List[PageStats] = field(default_factory=list)
+    boilerplate: BoilerplateReport = field(default_factory=BoilerplateReport)
+
+    @property
+    def extract_seconds(self) -> float:
+        return sum(stats.extract_seconds for stats in self.page_stats)
+
+    @property
+    def raw_chars(self) -> int:
+        return sum(stats.raw_chars for stats in self.page_stats)
+
+    @property
+    def kept_chars(self) -> int:
+        return sum(stats.kept_chars for stats in self.page_stats)
+
+    def summary(self) -> str:
+        return (f"Extracted {len(self.pages)} pages in {self.extract_seconds:.2f}s: "
+                f"kept {self.kept_chars} of {self.raw_chars} characters, {self.boilerplate.summary()}")
+
+
+def iter_page_text(reader: PyPDF2.PdfReader, start: int = 0,
+                   stop: Optional[int] = None) -> Iterator[Tuple[int, str, float]]:
+    """Yield (page number, raw text, extraction seconds) one page at a time for pages[start:stop]."""
+    stop = len(reader.pages) if stop is None else stop
+    for index in range(start, stop):
+        started = time.perf_counter()
+        text = reader.pages[index].extract_text() or ""
+        yield index + 1, text, time.perf_counter() - started
+
+
+def _extract_page_range(source: Union[str, bytes], start: int, stop: int) -> List[Tuple[int, str, float]]:
+    """Task body executed in a worker process: open the PDF independently and extract one page range."""
+    reader = PyPDF2.PdfReader(io.BytesIO(source) if isinstance(source, bytes) else source)
+    return list(iter_page_text(reader, start, stop))
+
+
+def _get_executor(processes: int) -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn, like the generation pool, so workers don't inherit the server's threads and models
+            _executor = ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn"))
+        return _executor
+
+
+def shutdown_extraction_pool():
+    """Stop the extraction worker processes (call on application shutdown)."""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(cancel_futures=True)
+            _executor = None
+
+
+def _source_for_workers(source: Union[str, bytes, BinaryIO]) -> Union[str, bytes]:
+    """Something a worker can open itself: a path if there is one on disk, otherwise the bytes."""
+    if isinstance(source, (str, bytes)):
+        return source
+    name = getattr(source, "name", None)
+    if isinstance(name, str) and os.path.isfile(name):
+        return name
+    source.seek(0)
+    return source.read()
+
+
+def extract_pdf_text(source: Union[str, bytes, BinaryIO], processes: Optional[int] = None,
+                     min_parallel_pages: Optional[int] = None, worker_path: Optional[str] = None,
+                     boilerplate_filter: Optional[BoilerplateFilter] = None) -> ExtractionResult:
+    """
+    Extract filtered text from a PDF in time linear in its length.
+
+    PDFs with at least min_parallel_pages pages are split into contiguous page
+    ranges extracted concurrently in worker processes, each opening the PDF
+    itself; results are reassembled in page order. Smaller PDFs, or
+    processes <= 1, use the single-process path. Boilerplate is filtered once
+    all pages are extracted, since headers and footers are learned from the
+    whole document.
+
+    Args:
+        source: Path, raw bytes or binary file object of the PDF
+        processes (int, optional): Worker processes (defaults to EDUQGEN_PDF_PROCESSES)
+        min_parallel_pages (int, optional): Page count that enables workers (defaults to EDUQGEN_PDF_PARALLEL_MIN_PAGES)
+        worker_path (str, optional): File path of the same PDF for workers to open, e.g. when source is
+            a memory map; without one, workers are sent the PDF's bytes
+        boilerplate_filter (BoilerplateFilter, optional): Defaults to one with only the "*" patterns
+
+    Returns:
+        ExtractionResult: Joined text, per-page text, per-page timings and character counts, and what
+        was removed as boilerplate
+    """
+    processes = PDF_EXTRACT_PROCESSES if processes is None else processes
+    min_parallel_pages = PDF_PARALLEL_MIN_PAGES if min_parallel_pages is None else min_parallel_pages
+
+    reader = PyPDF2.PdfReader(io.BytesIO(source) if isinstance(source, bytes) else source)
+    page_count = len(reader.pages)
+
+    if processes > 1 and page_count >= min_parallel_pages:
+        # One contiguous range per worker, so the PDF is shipped to and parsed by each worker only once
+        worker_source = worker_path or _source_for_workers(source)
+        bounds = [page_count * i // processes for i in range(processes + 1)]
+        starts, stops = bounds[:-1], bounds[1:]
+        # map() yields results in submission order, which keeps pages in document order
+        range_results = _get_executor(processes).map(
+            _extract_page_range, [worker_source] * processes, starts, stops
+        )
+        raw_pages = [page for range_pages in range_results for page in range_pages]
+    else:
+        raw_pages = list(iter_page_text(reader))
+
+    boilerplate_filter = boilerplate_filter or BoilerplateFilter.for_institution()
+    kept_pages, report = boilerplate_filter.filter_pages([raw_text for _, raw_text, _ in raw_pages])
+
+    result = ExtractionResult(text="", pages=kept_pages, boilerplate=report)
+    for (page_number, raw_text, seconds), kept_text in zip(raw_pages, kept_pages):
+        result.page_stats.append(PageStats(page_number, seconds, len(raw_text), len(kept_text)))
+
+    # Joined once at the end, skipping pages with nothing left after filtering
+    result.text = "\n".join(page for page in result.pages if page)
+    return result
@@ -0,0 +1,139 @@
+"""
+Inference backends for the valhalla/t5-base-qg-hl question generation model.
+
+    pytorch    eager fp32 transformers pipeline (default)
+    quantized  dynamic int8 quantization of the Linear layers, cached with torch.save
+    onnx       ONNX Runtime export via optimum, cached with save_pretrained
+
+Optimized artifacts are built once and cached under EDUQGEN_RESOURCES_DIR/artifacts.
+Build them ahead of time and compare against fp32 with:
+
+    python qg_backends.py export --backend onnx
+    python qg_backends.py parity --backend onnx
+"""
+import argparse
+import os
+import sys
+
+from nlp_resources import RESOURCES_DIR, resolve_transformers_model
+
+QG_MODEL_NAME = "valhalla/t5-base-qg-hl"
+QG_BACKENDS = ("pytorch", "quantized", "onnx")
+
+# Passages used by the parity check when none are supplied
+PARITY_SAMPLE_PASSAGES = [
+    "Artificial Intelligence (AI) is a branch of computer science that aims to create intelligent machines.",
+    "Machine learning is a subset of AI that enables computers to learn from experience without being explicitly programmed.",
+    "Deep learning uses neural networks with multiple layers to learn from large amounts of data.",
+    "Photosynthesis converts light energy into chemical energy stored in glucose.",
+    "The French Revolution began in 1789 and led to the end of the monarchy in France.",
+]
+
+# Directory for exported/quantized model artifacts
+ARTIFACTS_DIR = os.getenv("EDUQGEN_ARTIFACTS_DIR", os.path.join(RESOURCES_DIR, "artifacts"))
+
+
+def qg_model_key(backend: str) -> str:
+    """Model registry key for a backend; the fp32 pipeline keeps the plain model key."""
+    key = f"transformers:{QG_MODEL_NAME}"
+    return key if backend == "pytorch" else f"{key}:{backend}"
+
+
+def artifact_path(backend: str) -> str:
+    name = QG_MODEL_NAME.replace("/", "__")
+    if backend == "quantized":
+        return os.path.join(ARTIFACTS_DIR, f"{name}-int8.pt")
+    return os.path.join(ARTIFACTS_DIR, f"{name}-onnx")
+
+
+def _load_fp32_model(model_source):
+    from transformers import AutoModelForSeq2SeqLM
+
+    # local_files_only keeps the hub from being contacted at runtime
+    return AutoModelForSeq2SeqLM.from_pretrained(model_source, local_files_only=True)
+
+
+def _load_quantized_model(model_source):
+    import torch
+
+    path = artifact_path("quantized")
+    if os.path.exists(path):
+        # The artifact is a pickled module we wrote ourselves
+        return torch.load(path, weights_only=False)
+
+    model = _load_fp32_model(model_source)
+    quantized = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    torch.save(quantized, path)
+    return quantized
+
+
+def _load_onnx_model(model_source):
+    # optimum[onnxruntime] is an optional dependency
+    from optimum.onnxruntime import ORTModelForSeq2SeqLM
+
+    path = artifact_path("onnx")
+    if os.path.isdir(path):
+        return ORTModelForSeq2SeqLM.from_pretrained(path)
+
+    exported = ORTModelForSeq2SeqLM.from_pretrained(model_source, export=True, local_files_only=True)
+    exported.save_pretrained(path)
+    return exported
+
+
+def load_qg_model(backend: str = "pytorch"):
+    """
+    Load the question generation pipeline for a backend.
+
+    Returns:
+        The text2text-generation pipeline, or None if the backend could not be loaded
+    """
+    try:
+        # Imported here so torch/transformers are only pulled in when the model is needed
+        from transformers import pipeline, AutoTokenizer
+
+        model_source = resolve_transformers_model(QG_MODEL_NAME)
+        tokenizer = AutoTokenizer.from_pretrained(model_source, local_files_only=True)
+        if backend == "pytorch":
+            model = _load_fp32_model(model_source)
+        elif backend == "quantized":
+            model = _load_quantized_model(model_source)
+        elif backend == "onnx":
+            model = _load_onnx_model(model_source)
+        else:
+            raise ValueError(f"Unknown question generation backend '{backend}'")
+
+        return pipeline("text2text-generation", model=model, tokenizer=tokenizer)
+    except Exception as err:
+        print(err)
+        print(f"Question generation model not available for backend '{backend}'.")
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build and check question generation model backends")
+    parser.add_argument("command", choices=["export", "parity"])
+    parser.add_argument("--backend", choices=[b for b in QG_BACKENDS if b != "pytorch"], required=True)
+    parser.add_argument("--passages", help="Text file with one passage per line (parity only)")
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        return 0 if load_qg_model(args.backend) is not None else 1
+
+    from question_generator import QuestionGenerator
+
+    passages = None
+    if args.passages:
+        with open(args.passages, encoding="utf-8") as f:
+            passages = [line.strip() for line in f if line.strip()]
+
+    generator = QuestionGenerator(lazy_models=True, qg_backend=args.backend)
+    report = generator.check_backend_parity(passages)
+    print(f"Exact match: {report['exact_match_rate']:.2%}, mean similarity: {report['mean_similarity']:.2f}")
+    for row in report["mismatches"]:
+        print(f"- baseline:  {row['baseline']}\n  candidate: {row['candidate']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
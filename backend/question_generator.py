@@ -1,25 +1,61 @@
 import openai
 import random
 import json
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Set, Optional, AsyncIterator, Iterator, Callable, Awaitable
 from dataclasses import dataclass
 from enum import Enum
 import re
-import nltk
 from nltk.tokenize import sent_tokenize, word_tokenize
 from nltk.corpus import stopwords
 from nltk.tag import pos_tag
-import spacy
-from transformers import pipeline, AutoTokenizer, AutoModelForSeq2SeqLM
-import torch
 import os
-# Download required NLTK data
-try:
-    nltk.download('punkt', quiet=True)
-    nltk.download('averaged_perceptron_tagger', quiet=True)
-    nltk.download('stopwords', quiet=True)
-except:
-    print("NLTK downloads failed. Some features may not work.")
+import threading
+import time
+import asyncio
+from collections import Counter
+from functools import partial
+from model_registry import model_registry
+from llm_json import QuestionStreamParser, parse_question_response
+from llm_scheduler import llm_scheduler
+from minhash import NearDuplicateIndex
+from openai_client import (
+    OPENAI_MODEL, OPENAI_CHUNK_TOKENS, OPENAI_CHUNK_CONCURRENCY, OPENAI_TOKENS_PER_QUESTION,
+    OPENAI_MAX_COMPLETION_TOKENS, OPENAI_CONTEXT_TOKEN_BUDGET, OPENAI_TOP_UP_ROUNDS, get_async_client,
+    run_sync
+)
+from text_chunking import estimate_tokens, chunk_text, compress_text, allocate_counts
+from nlp_resources import configure_nltk, resolve_spacy_model
+from sentence_index import SentenceIndex
+from qg_backends import QG_BACKENDS, PARITY_SAMPLE_PASSAGES, load_qg_model, qg_model_key
+# Point NLTK at the vendored data (local check only; run `python nlp_resources.py prepare-resources` once)
+missing_nltk_data = configure_nltk()
+if missing_nltk_data:
+    print(f"NLTK data missing: {', '.join(missing_nltk_data)}. Some features may not work.")
+
+# Registry keys for the models shared by every QuestionGenerator in the process
+SPACY_MODEL_KEY = "spacy:en_core_web_sm"
+QG_MODEL_KEY = qg_model_key("pytorch")
+
+# spaCy components needed for sentences, tags, noun chunks and entities; the rest are disabled in batch analysis
+SPACY_ANALYSIS_COMPONENTS = {"tok2vec", "tagger", "attribute_ruler", "parser", "ner"}
+# Template draws allowed per question when redrawing near-duplicates of stored questions
+TEMPLATE_MAX_DRAWS = 5
+
+def _load_spacy_model():
+    """Load the spaCy model used for entity and noun-chunk extraction."""
+    # Imported here so the module stays cheap to import until a model is needed
+    import spacy
+    try:
+        return spacy.load(resolve_spacy_model("en_core_web_sm"))
+    except OSError as err:
+        raise OSError(
+            "spaCy model 'en_core_web_sm' not found locally. "
+            "Run `python nlp_resources.py prepare-resources` first."
+        ) from err
+
+model_registry.register(SPACY_MODEL_KEY, _load_spacy_model)
+for _backend in QG_BACKENDS:
+    model_registry.register(qg_model_key(_backend), partial(load_qg_model, _backend))
 
 class TaxonomyLevel(Enum):
     REMEMBER = "remember"
@@ -43,16 +79,53 @@ class Question:
     question_type: str
     context_snippet: str
 
+@dataclass
+class ContextAnalysis:
+    """Single NLP pass over a context, shared by every step of the template pipeline."""
+    context: str
+    sentences: List[str]
+    entities: List[str]
+    concepts: List[str]
+    sentence_index: Optional[SentenceIndex] = None  # Built on first use by rank_sentences()
+
+@dataclass
+class MLGenerationResult:
+    """Output of batched T5 question generation."""
+    questions: List[List[str]]  # Generated questions per input passage, in input order
+    batch_timings: List[Dict]  # batch_size, input_tokens and seconds for each forward pass
+
+# Marks a model attribute that has not been borrowed from the registry yet
+_NOT_LOADED = object()
+
 class QuestionGenerator:
-    def __init__(self, use_openai=False, openai_api_key=None):
+    def __init__(self, use_openai=False, openai_api_key=None, lazy_models=False, qg_backend="pytorch",
+                 context_token_budget=None):
         """
         Initialize the question generator.
         
         Args:
             use_openai (bool): Whether to use OpenAI API for question generation
             openai_api_key (str): OpenAI API key if using OpenAI
+            lazy_models (bool): Defer loading spaCy/T5 until the first request that needs them
+            qg_backend (str): T5 inference backend: "pytorch", "quantized" (int8) or "onnx"
+            context_token_budget (int, optional): Compress OpenAI prompt contexts to this many tokens
+                (defaults to OPENAI_CONTEXT_TOKEN_BUDGET; 0 disables compression)
         """
+        if qg_backend not in QG_BACKENDS:
+            raise ValueError(f"qg_backend must be one of {QG_BACKENDS}")
+        
         self.use_openai = use_openai
+        self.lazy_models = lazy_models
+        self.qg_backend = qg_backend
+        self._nlp = _NOT_LOADED
+        self._qg_model = _NOT_LOADED
+        self._borrowed_models = []
+        self._models_lock = threading.Lock()
+        self.context_token_budget = OPENAI_CONTEXT_TOKEN_BUDGET if context_token_budget is None else context_token_budget
+        # Optional callable that receives one token usage dict per OpenAI request
+        self.usage_recorder = None
+        # Which path won hedged generations (see agenerate_question_set_hedged)
+        self.hedge_stats = Counter()
         
         # Set OpenAI API key with priority: parameter > environment variable
         if use_openai:
@@ -69,17 +142,9 @@ class QuestionGenerator:
                     print("Set OPENAI_KEY environment variable or pass openai_api_key parameter.")
                     self.use_openai = False
         
-        # Check for deprecated OpenAI API usage
-        try:
-            import warnings
-            warnings.filterwarnings("ignore", category=DeprecationWarning)
-            # Set API type to avoid some warnings
-            openai.api_type = "open_ai"
-        except Exception as e:
-            print(f"Note: Could not configure OpenAI warnings: {e}")
-        
         # Initialize transformers models for local ML-based generation
-        self.init_models()
+        if not lazy_models:
+            self.init_models()
         
         # Taxonomy-specific question templates and patterns
         self.taxonomy_templates = {
@@ -145,32 +210,61 @@ class QuestionGenerator:
             }
         }
     
+    def _borrow_model(self, key):
+        """Borrow a model from the registry and remember to release it on close()."""
+        model = model_registry.acquire(key)
+        self._borrowed_models.append(key)
+        return model
+    
+    @property
+    def nlp(self):
+        """spaCy pipeline, loaded on first use in lazy mode."""
+        if self._nlp is _NOT_LOADED:
+            with self._models_lock:
+                if self._nlp is _NOT_LOADED:
+                    self._nlp = self._borrow_model(SPACY_MODEL_KEY)
+        return self._nlp
+    
+    @property
+    def qg_model(self):
+        """T5 question generation pipeline (None if unavailable), loaded on first use in lazy mode."""
+        if self._qg_model is _NOT_LOADED:
+            with self._models_lock:
+                if self._qg_model is _NOT_LOADED:
+                    self._qg_model = self._borrow_model(qg_model_key(self.qg_backend))
+                    # Fall back to the fp32 pipeline if the optimized backend can't be built
+                    if self._qg_model is None and self.qg_backend != "pytorch":
+                        print("Falling back to the pytorch question generation backend.")
+                        self._qg_model = self._borrow_model(QG_MODEL_KEY)
+        return self._qg_model
+    
     def init_models(self):
-        """Initialize ML models for question generation."""
-        try:
-            # Load spaCy model for NLP processing
-            self.nlp = spacy.load("en_core_web_sm")
-        except:
-            print("spaCy model not found. Installing...")
-            import subprocess
-            subprocess.run(["python", "-m", "spacy", "download", "en_core_web_sm"])
-            self.nlp = spacy.load("en_core_web_sm")
+        """Borrow the shared ML models for question generation from the model registry."""
+        # Load spaCy model for NLP processing
+        _ = self.nlp
         
         # Initialize question generation pipeline
-        try:
-            self.qg_model = pipeline(
-                "text2text-generation",
-                model="valhalla/t5-base-qg-hl",
-                tokenizer="valhalla/t5-base-qg-hl"
-            )
-        except Exception as err:
-            print(err)
-            print("Question generation model not available. Using template-based generation.")
-            self.qg_model = None
+        _ = self.qg_model
+    
+    def models_ready(self) -> bool:
+        """Check whether the spaCy and T5 models have been loaded."""
+        return self._nlp is not _NOT_LOADED and self._qg_model is not _NOT_LOADED
+    
+    def close(self):
+        """Release the models borrowed from the model registry."""
+        with self._models_lock:
+            for key in self._borrowed_models:
+                model_registry.release(key)
+            self._borrowed_models = []
+            self._nlp = _NOT_LOADED
+            self._qg_model = _NOT_LOADED
     
     def extract_key_entities(self, text: str) -> List[str]:
         """Extract key entities and concepts from text."""
-        doc = self.nlp(text)
+        return self._entities_from_doc(self.nlp(text))
+    
+    def _entities_from_doc(self, doc) -> List[str]:
+        """Collect named entities and short noun phrases from a parsed spaCy doc."""
         entities = []
         
         # Extract named entities
@@ -199,44 +293,243 @@ class QuestionGenerator:
                     concepts.append(word)
         
         # Return most frequent concepts
-        from collections import Counter
         concept_freq = Counter(concepts)
         return [concept for concept, _ in concept_freq.most_common(10)]
     
+    def _concepts_from_doc(self, doc, stop_words: Set[str]) -> List[str]:
+        """Extract key concepts from the tags spaCy already assigned, instead of a second NLTK tagging pass."""
+        concepts = []
+        for token in doc:
+            # spaCy's fine-grained tags use the same Penn Treebank set as NLTK
+            if token.tag_.startswith('NN') or token.tag_.startswith('JJ'):
+                word = token.lower_
+                if word not in stop_words and len(word) > 2:
+                    concepts.append(word)
+        
+        concept_freq = Counter(concepts)
+        return [concept for concept, _ in concept_freq.most_common(10)]
+    
+    def analyze_contexts(self, texts: List[str], batch_size: int = 32, n_process: int = 1) -> List[ContextAnalysis]:
+        """
+        Analyze many texts in one streamed spaCy pass.
+        
+        Sentences, entities and concepts all come from the same parsed
+        doc, and only the pipeline components they need are run.
+        
+        Args:
+            texts (List[str]): Contexts to analyze (e.g. topics or PDF chunks)
+            batch_size (int): Number of texts spaCy buffers per batch
+            n_process (int): Number of processes spaCy uses for parsing
+            
+        Returns:
+            List[ContextAnalysis]: One analysis per text, in input order
+        """
+        # Entities need ner; noun chunks, sentences and tags need the tagger and parser
+        disabled = [name for name in self.nlp.pipe_names if name not in SPACY_ANALYSIS_COMPONENTS]
+        stop_words = set(stopwords.words('english'))
+        
+        analyses = []
+        for text, doc in zip(texts, self.nlp.pipe(texts, batch_size=batch_size, n_process=n_process, disable=disabled)):
+            sentences = [sent.text.strip() for sent in doc.sents if sent.text.strip()]
+            
+            analyses.append(ContextAnalysis(
+                context=text,
+                sentences=sentences,
+                entities=self._entities_from_doc(doc),
+                concepts=self._concepts_from_doc(doc, stop_words)
+            ))
+        
+        return analyses
+    
+    def analyze_context(self, context: str, extract_terms: bool = True) -> ContextAnalysis:
+        """
+        Run sentence splitting and term extraction once for a context.
+        
+        Args:
+            context (str): The source text/context
+            extract_terms (bool): Also extract entities and concepts (needs spaCy); snippet-only callers can skip this
+            
+        Returns:
+            ContextAnalysis: Sentences, entities and concepts
+        """
+        if extract_terms:
+            return self.analyze_contexts([context])[0]
+        
+        # Snippet-only analysis stays on NLTK so the spaCy model isn't loaded for it
+        return ContextAnalysis(
+            context=context,
+            sentences=sent_tokenize(context),
+            entities=[],
+            concepts=[]
+        )
+    
+    def rank_sentences(self, analysis: ContextAnalysis, questions: List[str], k: int = 2) -> List[List[Tuple[int, float]]]:
+        """
+        Score a batch of questions against the context's sentences in one sparse product.
+        
+        Returns:
+            List[List[Tuple[int, float]]]: Top-k (sentence index, score) pairs per question
+        """
+        if analysis.sentence_index is None:
+            analysis.sentence_index = SentenceIndex(analysis.sentences)
+        return analysis.sentence_index.top_k(questions, k=k)
+    
     def generate_ml_questions(self, context: str, num_questions: int = 3) -> List[str]:
         """Generate questions using ML model."""
-        if not self.qg_model:
-            return []
+        result = self.generate_ml_questions_batch([context], num_questions=num_questions)
+        return result.questions[0] if result.questions else []
+    
+    def _format_qg_input(self, passage) -> str:
+        """Build a t5-base-qg-hl prompt from a passage or a (passage, answer) pair."""
+        if isinstance(passage, str):
+            return f"generate question: {passage}"
+        
+        # Highlight the answer span so the model asks about it
+        context, answer = passage
+        start = context.find(answer)
+        if start == -1:
+            return f"generate question: {context}"
+        end = start + len(answer)
+        return f"generate question: {context[:start]}<hl> {answer} <hl>{context[end:]}"
+    
+    def generate_ml_questions_batch(self, passages: List, num_questions: int = 1, batch_size: int = 8,
+                                    max_input_length: int = 512, max_length: int = 100) -> MLGenerationResult:
+        """
+        Generate questions for many passages with batched T5 inference.
+        
+        Inputs are sorted by token length and packed into batches so each batch pads
+        to a similar length, and generation runs under torch.inference_mode().
+        
+        Args:
+            passages (List): Passages (str) or (passage, answer) pairs to highlight the answer span
+            num_questions (int): Questions to generate per passage
+            batch_size (int): Passages per forward pass
+            max_input_length (int): Inputs longer than this many tokens are truncated
+            max_length (int): Maximum length of each generated question in tokens
+            
+        Returns:
+            MLGenerationResult: Questions per passage in input order, plus per-batch timings
+        """
+        result = MLGenerationResult(questions=[[] for _ in passages], batch_timings=[])
+        if not self.qg_model or not passages:
+            return result
         
         try:
-            # Prepare input for the model
-            input_text = f"generate question: {context}"
+            import torch
             
-            # Generate questions
-            results = self.qg_model(
-                input_text,
-                max_length=100,
-                num_return_sequences=num_questions,
-                temperature=0.7
-            )
+            tokenizer = self.qg_model.tokenizer
+            model = self.qg_model.model
+            input_texts = [self._format_qg_input(passage) for passage in passages]
+            
+            # Bucket by tokenized length so padding stays small within each batch
+            lengths = [
+                len(ids) for ids in tokenizer(input_texts, truncation=True, max_length=max_input_length)["input_ids"]
+            ]
+            order = sorted(range(len(input_texts)), key=lambda i: lengths[i])
             
-            questions = [result['generated_text'] for result in results]
-            return questions
+            # Sampling is needed to get several distinct questions per passage
+            generate_kwargs = {"max_length": max_length, "num_return_sequences": num_questions}
+            if num_questions > 1:
+                generate_kwargs.update(do_sample=True, temperature=0.7)
+            
+            for batch_start in range(0, len(order), batch_size):
+                batch_indices = order[batch_start:batch_start + batch_size]
+                batch_texts = [input_texts[i] for i in batch_indices]
+                started = time.perf_counter()
+                
+                encoded = tokenizer(
+                    batch_texts,
+                    padding=True,
+                    truncation=True,
+                    max_length=max_input_length,
+                    return_tensors="pt"
+                ).to(model.device)
+                with torch.inference_mode():
+                    outputs = model.generate(**encoded, **generate_kwargs)
+                decoded = tokenizer.batch_decode(outputs, skip_special_tokens=True)
+                
+                # generate() returns num_questions sequences per input, grouped by input
+                for position, index in enumerate(batch_indices):
+                    group = decoded[position * num_questions:(position + 1) * num_questions]
+                    result.questions[index] = [question.strip() for question in group]
+                
+                result.batch_timings.append({
+                    "batch_size": len(batch_indices),
+                    "input_tokens": encoded["input_ids"].shape[1],
+                    "seconds": time.perf_counter() - started
+                })
         except Exception as e:
             print(f"ML question generation failed: {e}")
-            return []
+        
+        return result
+    
+    def check_backend_parity(self, passages: List[str] = None) -> Dict:
+        """
+        Compare this generator's T5 backend against the fp32 pytorch baseline.
+        
+        Both run greedy decoding on the same passages, so any difference comes from the backend.
+        
+        Args:
+            passages (List[str], optional): Passages to compare on (defaults to built-in samples)
+            
+        Returns:
+            Dict: exact_match_rate, mean_similarity and the mismatching question pairs
+        """
+        passages = passages or PARITY_SAMPLE_PASSAGES
+        baseline_generator = QuestionGenerator(lazy_models=True, qg_backend="pytorch")
+        try:
+            baseline = baseline_generator.generate_ml_questions_batch(passages).questions
+        finally:
+            baseline_generator.close()
+        candidate = self.generate_ml_questions_batch(passages).questions
+        
+        matches = 0
+        similarities = []
+        mismatches = []
+        for base_questions, cand_questions in zip(baseline, candidate):
+            base_text = base_questions[0] if base_questions else ""
+            cand_text = cand_questions[0] if cand_questions else ""
+            similarities.append(self._text_similarity(base_text, cand_text))
+            if base_text == cand_text:
+                matches += 1
+            else:
+                mismatches.append({"baseline": base_text, "candidate": cand_text})
+        
+        return {
+            "backend": self.qg_backend,
+            "exact_match_rate": matches / len(passages),
+            "mean_similarity": sum(similarities) / len(similarities),
+            "mismatches": mismatches
+        }
     
     def generate_template_questions(self, context: str, taxonomy_level: TaxonomyLevel, 
-                                  difficulty: DifficultyLevel, num_questions: int = 2) -> List[Dict]:
-        """Generate questions using templates based on taxonomy level."""
-        entities = self.extract_key_entities(context)
-        concepts = self.extract_key_concepts(context)
+                                  difficulty: DifficultyLevel, num_questions: int = 2,
+                                  analysis: Optional[ContextAnalysis] = None, rng=None,
+                                  dedup_index: Optional[NearDuplicateIndex] = None) -> List[Dict]:
+        """
+        Generate questions using templates based on taxonomy level.
+        
+        With a dedup_index, questions that near-duplicate a stored question are redrawn
+        (up to TEMPLATE_MAX_DRAWS draws per question), so fewer may be returned.
+        """
+        # A seeded random.Random makes template choices reproducible; default to the module RNG
+        rng = rng or random
+
+        # Reuse the caller's analysis so the context is only parsed once per question set
+        if analysis is None:
+            analysis = self.analyze_context(context)
+        entities = analysis.entities
+        concepts = analysis.concepts
         
         templates = self.taxonomy_templates[taxonomy_level]["templates"]
-        questions = []
+        question_texts = []
         
-        for _ in range(num_questions):
-            template = random.choice(templates)
+        # Without an index exactly num_questions draws are made, so seeded output is unchanged
+        max_draws = num_questions * (TEMPLATE_MAX_DRAWS if dedup_index is not None else 1)
+        for _ in range(max_draws):
+            if len(question_texts) == num_questions:
+                break
+            template = rng.choice(templates)
             
             # Fill template with extracted entities/concepts
             if "{}" in template:
@@ -246,10 +539,10 @@ class QuestionGenerator:
                 if placeholder_count == 1:
                     # Single placeholder template
                     if entities:
-                        entity = random.choice(entities)
+                        entity = rng.choice(entities)
                         question_text = template.format(entity)
                     elif concepts:
-                        concept = random.choice(concepts)
+                        concept = rng.choice(concepts)
                         question_text = template.format(concept)
                     else:
                         # Fallback to generic question
@@ -258,17 +551,17 @@ class QuestionGenerator:
                     # Multiple placeholder template
                     if len(entities) >= placeholder_count:
                         # Use different entities for each placeholder
-                        selected_entities = random.sample(entities, placeholder_count)
+                        selected_entities = rng.sample(entities, placeholder_count)
                         question_text = template.format(*selected_entities)
                     elif len(concepts) >= placeholder_count:
                         # Use different concepts for each placeholder
-                        selected_concepts = random.sample(concepts, placeholder_count)
+                        selected_concepts = rng.sample(concepts, placeholder_count)
                         question_text = template.format(*selected_concepts)
                     else:
                         # Not enough entities or concepts, use a simpler template
                         simpler_templates = [t for t in templates if t.count('{}') <= 1]
                         if simpler_templates:
-                            template = random.choice(simpler_templates)
+                            template = rng.choice(simpler_templates)
                             if "{}" in template:
                                 question_text = template.format("the main concept")
                             else:
@@ -279,8 +572,19 @@ class QuestionGenerator:
             else:
                 question_text = template
             
+            # Skip questions already in the bank; another draw may pick a different template or term
+            if dedup_index is not None and dedup_index.find(question_text) is not None:
+                continue
+            
+            question_texts.append(question_text)
+        
+        # Score every question against the sentence index at once
+        rankings = self.rank_sentences(analysis, question_texts)
+        
+        questions = []
+        for question_text, ranked in zip(question_texts, rankings):
             # Generate answer based on context and question
-            answer = self.generate_answer(context, question_text, taxonomy_level)
+            answer = self.generate_answer(context, question_text, taxonomy_level, analysis=analysis, ranked=ranked)
             
             questions.append({
                 "question": question_text,
@@ -288,30 +592,29 @@ class QuestionGenerator:
                 "taxonomy_level": taxonomy_level,
                 "difficulty": difficulty,
                 "question_type": self.get_question_type(question_text),
-                "context_snippet": self.get_relevant_context(context, question_text)
+                "context_snippet": self.get_relevant_context(context, question_text, analysis=analysis, ranked=ranked)
             })
         
         return questions
     
-    def generate_answer(self, context: str, question: str, taxonomy_level: TaxonomyLevel) -> str:
+    def generate_answer(self, context: str, question: str, taxonomy_level: TaxonomyLevel,
+                        analysis: Optional[ContextAnalysis] = None,
+                        ranked: Optional[List[Tuple[int, float]]] = None) -> str:
         """Generate answer based on context and question type."""
+        if analysis is None:
+            analysis = self.analyze_context(context, extract_terms=False)
+        
         # Simple answer generation based on taxonomy level
-        sentences = sent_tokenize(context)
+        sentences = analysis.sentences
         
         if taxonomy_level == TaxonomyLevel.REMEMBER:
             # For factual questions, find the most relevant sentence
-            question_words = set(word_tokenize(question.lower()))
-            best_sentence = ""
-            max_overlap = 0
-            
-            for sentence in sentences:
-                sentence_words = set(word_tokenize(sentence.lower()))
-                overlap = len(question_words.intersection(sentence_words))
-                if overlap > max_overlap:
-                    max_overlap = overlap
-                    best_sentence = sentence
+            if ranked is None:
+                ranked = self.rank_sentences(analysis, [question], k=1)[0]
             
-            return best_sentence if best_sentence else sentences[0]
+            if ranked and ranked[0][1] > 0:
+                return sentences[ranked[0][0]]
+            return sentences[0]
         
         elif taxonomy_level == TaxonomyLevel.UNDERSTAND:
             # For understanding questions, provide explanation
@@ -341,21 +644,17 @@ class QuestionGenerator:
         else:
             return "General"
     
-    def get_relevant_context(self, context: str, question: str, max_length: int = 200) -> str:
+    def get_relevant_context(self, context: str, question: str, max_length: int = 200,
+                             analysis: Optional[ContextAnalysis] = None,
+                             ranked: Optional[List[Tuple[int, float]]] = None) -> str:
         """Extract most relevant context snippet for the question."""
-        sentences = sent_tokenize(context)
-        question_words = set(word_tokenize(question.lower()))
+        if analysis is None:
+            analysis = self.analyze_context(context, extract_terms=False)
         
-        # Find most relevant sentences
-        sentence_scores = []
-        for sentence in sentences:
-            sentence_words = set(word_tokenize(sentence.lower()))
-            overlap = len(question_words.intersection(sentence_words))
-            sentence_scores.append((sentence, overlap))
-        
-        # Sort by relevance and take top sentences
-        sentence_scores.sort(key=lambda x: x[1], reverse=True)
-        relevant_text = " ".join([s[0] for s in sentence_scores[:2]])
+        # Find most relevant sentences (callers scoring a batch pass their ranking in)
+        if ranked is None:
+            ranked = self.rank_sentences(analysis, [question], k=2)[0]
+        relevant_text = " ".join(analysis.sentences[index] for index, _ in ranked[:2])
         
         # Truncate if too long
         if len(relevant_text) > max_length:
@@ -363,96 +662,11 @@ class QuestionGenerator:
         
         return relevant_text
     
-    def generate_openai_questions(self, context: str, taxonomy_level: TaxonomyLevel, 
-                                difficulty: DifficultyLevel, num_questions: int = 2) -> List[Dict]:
-        """Generate questions using OpenAI API."""
-        if not self.use_openai:
-            return []
-        
-        prompt = f"""
-        Generate {num_questions} questions based on the following context. 
-        
-        Requirements:
-        - Taxonomy Level: {taxonomy_level.value}
-        - Difficulty: {difficulty.value}
-        - Include both question and detailed answer
-        - Make questions specific to the context
-        - IMPORTANT: Each question and answer must be unique and different from others
-        - Vary the question formats and answer structures
-        
-        Context: {context}
-        
-        Format your response as JSON with the following structure:
-        {{
-            "questions": [
-                {{
-                    "question": "Question text here",
-                    "answer": "Detailed answer here"
-                }}
-            ]
-        }}
-        """
-        try:
-            # Use higher temperature for more diversity
-            response = openai.ChatCompletion.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.9,  # Increased for more diversity
-                max_tokens=1500,  # Increased to allow for more detailed answers
-                presence_penalty=0.6,  # Encourages model to introduce new concepts
-                frequency_penalty=0.6  # Discourages repetition
-            )
-            
-            # Parse the response
-            try:
-                result = json.loads(response.choices[0].message.content)
-                questions = []
-                # Track answers to ensure diversity
-                seen_answers = set()
-                seen_questions = set()
-                
-                for q in result.get("questions", []):
-                    question_text = q.get("question", "").strip()
-                    answer_text = q.get("answer", "").strip()
-                    
-                    # Skip empty or duplicate questions/answers
-                    if not question_text or not answer_text:
-                        continue
-                    
-                    # Check for near-duplicates (simplified check)
-                    if question_text in seen_questions:
-                        continue
-                    
-                    # Check if answer is too similar to previous ones
-                    if any(self._text_similarity(answer_text, prev) > 0.8 for prev in seen_answers):
-                        continue
-                    
-                    # Add to tracking sets
-                    seen_questions.add(question_text)
-                    seen_answers.add(answer_text)
-                    
-                    questions.append({
-                        "question": question_text,
-                        "answer": answer_text,
-                        "taxonomy_level": taxonomy_level,
-                        "difficulty": difficulty,
-                        "question_type": self.get_question_type(question_text),
-                        "context_snippet": self.get_relevant_context(context, question_text)
-                    })
-                
-                # If we didn't get enough diverse questions, log a warning
-                if len(questions) < num_questions:
-                    print(f"Warning: Only generated {len(questions)} diverse questions out of {num_questions} requested")
-                
-                return questions
-            except json.JSONDecodeError as json_err:
-                print(f"Error parsing OpenAI response: {json_err}")
-                print(f"Raw response: {response.choices[0].message.content}")
-                return []
-        
-        except Exception as e:
-            print(f"OpenAI API error: {e}")
-            return []
+    def _attach_context_snippets(self, context: str, questions: List[Dict], analysis: ContextAnalysis):
+        """Fill context_snippet for a batch of questions with one sentence-index lookup."""
+        rankings = self.rank_sentences(analysis, [q["question"] for q in questions])
+        for q, ranked in zip(questions, rankings):
+            q["context_snippet"] = self.get_relevant_context(context, q["question"], analysis=analysis, ranked=ranked)
     
     def _text_similarity(self, text1: str, text2: str) -> float:
         """Simple text similarity measure to detect near-duplicate answers."""
@@ -470,14 +684,33 @@ class QuestionGenerator:
         return intersection / union if union > 0 else 0.0
     
     def generate_openai_question_set(self, context: str, taxonomy_difficulty_counts: List[Dict], 
-                                   subject: str, topic: str = None) -> List[Dict]:
+                                   subject: str, topic: str = None, seed: Optional[int] = None,
+                                   top_up_rounds: int = OPENAI_TOP_UP_ROUNDS,
+                                   dedup_index: Optional[NearDuplicateIndex] = None) -> List[Dict]:
+        """Synchronous version of agenerate_openai_question_set, run on its own event loop."""
+        return run_sync(
+            self.agenerate_openai_question_set, context, taxonomy_difficulty_counts, subject, topic,
+            seed=seed, top_up_rounds=top_up_rounds, dedup_index=dedup_index
+        )
+    
+    async def agenerate_openai_question_set(self, context: str, taxonomy_difficulty_counts: List[Dict], 
+                                          subject: str, topic: str = None, seed: Optional[int] = None,
+                                          top_up_rounds: int = OPENAI_TOP_UP_ROUNDS,
+                                          dedup_index: Optional[NearDuplicateIndex] = None) -> List[Dict]:
         """Generate multiple questions with different taxonomy and difficulty levels in a single OpenAI API call.
         
+        The request is sent on the shared, pooled AsyncOpenAI client. If deduplication leaves some
+        (taxonomy, difficulty) buckets short, up to top_up_rounds follow-up requests ask for just the
+        missing questions (see _atop_up_question_set). No bucket gets more questions than requested.
+        
         Args:
             context (str): The source text/context
             taxonomy_difficulty_counts (List[Dict]): List of dictionaries with taxonomy_level, difficulty, and count
             subject (str): The subject name
             topic (str, optional): The topic name
+            seed (int, optional): Passed to the API for best-effort reproducible sampling
+            top_up_rounds (int): Maximum number of follow-up requests for shortfalls
+            dedup_index (NearDuplicateIndex, optional): Stored questions (e.g. the question bank) to reject near-duplicates of
             
         Returns:
             List[Dict]: List of generated questions with their details
@@ -485,6 +718,257 @@ class QuestionGenerator:
         if not self.use_openai:
             return []
         
+        seen_questions = NearDuplicateIndex(base=dedup_index)
+        seen_answers = NearDuplicateIndex()
+        questions = self._limit_to_shortfall(taxonomy_difficulty_counts, await self._arequest_question_set(
+            context, taxonomy_difficulty_counts, subject, topic, seed, [], seen_questions, seen_answers
+        ))
+        async for _ in self._atop_up_question_set(
+            context, taxonomy_difficulty_counts, subject, topic, seed, questions, seen_questions, seen_answers,
+            top_up_rounds
+        ):
+            pass
+        return questions
+    
+    async def _atop_up_question_set(self, context: str, taxonomy_difficulty_counts: List[Dict], subject: str,
+                                    topic: str, seed: Optional[int], questions: List[Dict],
+                                    seen_questions: NearDuplicateIndex, seen_answers: NearDuplicateIndex,
+                                    top_up_rounds: int) -> AsyncIterator[List[Dict]]:
+        """
+        Fill the buckets the first request left short, with up to top_up_rounds follow-up requests.
+        
+        Each follow-up asks for just the missing questions, excluding those already accepted, and
+        its batch is trimmed to the missing counts before being appended to questions and yielded.
+        Nothing is topped up if the first request produced nothing: it failed outright, and the
+        caller's fallback handles that.
+        """
+        for round_number in range(top_up_rounds):
+            request_counts = self._question_shortfall(taxonomy_difficulty_counts, questions)
+            if not questions or not request_counts:
+                break
+            print(f"Topping up {sum(spec['count'] for spec in request_counts)} missing question(s), "
+                  f"round {round_number + 1}/{top_up_rounds}")
+            batch = self._limit_to_shortfall(request_counts, await self._arequest_question_set(
+                context, request_counts, subject, topic, seed,
+                [q["question"] for q in questions], seen_questions, seen_answers
+            ))
+            # Stop when a round adds nothing (another is unlikely to do better)
+            if not batch:
+                break
+            questions.extend(batch)
+            yield batch
+        
+        self._warn_shortfall(taxonomy_difficulty_counts, questions)
+    
+    async def _arequest_question_set(self, context: str, taxonomy_difficulty_counts: List[Dict], subject: str,
+                                     topic: str, seed: Optional[int], exclude_questions: List[str],
+                                     seen_questions: NearDuplicateIndex, seen_answers: NearDuplicateIndex) -> List[Dict]:
+        """One OpenAI question set request; returns the accepted questions (empty on error)."""
+        # Compression and token counting are CPU work, so keep them off the event loop too
+        prompt, usage = await asyncio.to_thread(
+            self._prepare_question_set_prompt, context, taxonomy_difficulty_counts, exclude_questions
+        )
+        
+        try:
+            request = {
+                "model": OPENAI_MODEL,
+                "messages": [{"role": "user", "content": prompt}],
+                **self._question_set_request_options(seed, usage["questions_requested"])
+            }
+            # Identical in-flight requests (e.g. a class generating from the same chapter) share one call
+            response = await llm_scheduler.submit(
+                lambda: get_async_client().chat.completions.create(**request),
+                tokens=usage["estimated_prompt_tokens"] + usage["max_tokens"],
+                key=llm_scheduler.request_key(request)
+            )
+            
+            # Parse the response off the event loop; snippet ranking is CPU work
+            content = response.choices[0].message.content
+            try:
+                questions = await asyncio.to_thread(
+                    self._parse_question_set_response,
+                    content, context, taxonomy_difficulty_counts, subject, topic, seen_questions, seen_answers
+                )
+                self._record_usage(usage, response.usage, len(questions))
+                return questions
+            except json.JSONDecodeError as json_err:
+                print(f"Error parsing OpenAI response: {json_err}")
+                print(f"Raw response: {content}")
+                return []
+        
+        except Exception as e:
+            print(f"OpenAI API error: {e}")
+            return []
+    
+    async def agenerate_openai_question_set_chunked(self, context: str, taxonomy_difficulty_counts: List[Dict],
+                                                  subject: str, topic: str = None, seed: Optional[int] = None,
+                                                  max_chunk_tokens: int = OPENAI_CHUNK_TOKENS,
+                                                  max_concurrency: int = OPENAI_CHUNK_CONCURRENCY,
+                                                  dedup_index: Optional[NearDuplicateIndex] = None) -> List[Dict]:
+        """
+        Map-reduce generation for long contexts.
+        
+        The context is split into token-budgeted chunks, the requested counts are
+        allocated across chunks by size, chunks are generated concurrently (at most
+        max_concurrency calls in flight), and the results are merged and deduplicated.
+        
+        Returns:
+            List[Dict]: Merged questions from every chunk
+        """
+        chunks = chunk_text(context, max_chunk_tokens)
+        allocations = allocate_counts(taxonomy_difficulty_counts, [estimate_tokens(chunk) for chunk in chunks])
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def generate_chunk(chunk, chunk_counts):
+            async with semaphore:
+                return await self.agenerate_openai_question_set(
+                    chunk, chunk_counts, subject, topic, seed=seed, dedup_index=dedup_index
+                )
+        
+        # Chunks that were allocated no questions are skipped entirely
+        chunk_results = await asyncio.gather(*[
+            generate_chunk(chunk, chunk_counts)
+            for chunk, chunk_counts in zip(chunks, allocations)
+            if chunk_counts
+        ])
+        
+        return self._merge_question_sets(chunk_results)
+    
+    async def astream_openai_question_set_chunked(self, context: str, taxonomy_difficulty_counts: List[Dict],
+                                                  subject: str, topic: str = None, seed: Optional[int] = None,
+                                                  max_chunk_tokens: int = OPENAI_CHUNK_TOKENS,
+                                                  max_concurrency: int = OPENAI_CHUNK_CONCURRENCY,
+                                                  dedup_index: Optional[NearDuplicateIndex] = None
+                                                  ) -> AsyncIterator[Dict]:
+        """
+        Streaming map-reduce generation for long contexts.
+        
+        Uses the same chunk plan as agenerate_openai_question_set_chunked; chunks are streamed
+        concurrently (at most max_concurrency at once) and each question is yielded as soon as
+        its chunk produces it, unless it duplicates one already yielded from another chunk.
+        """
+        chunks = chunk_text(context, max_chunk_tokens)
+        allocations = allocate_counts(taxonomy_difficulty_counts, [estimate_tokens(chunk) for chunk in chunks])
+        semaphore = asyncio.Semaphore(max_concurrency)
+        queue = asyncio.Queue()
+        chunk_done = object()
+        
+        async def stream_chunk(chunk, chunk_counts):
+            try:
+                async with semaphore:
+                    async for question in self.astream_openai_question_set(
+                        chunk, chunk_counts, subject, topic, seed=seed, dedup_index=dedup_index
+                    ):
+                        queue.put_nowait(question)
+            finally:
+                queue.put_nowait(chunk_done)
+        
+        # Chunks that were allocated no questions are skipped entirely
+        tasks = [
+            asyncio.ensure_future(stream_chunk(chunk, chunk_counts))
+            for chunk, chunk_counts in zip(chunks, allocations)
+            if chunk_counts
+        ]
+        accept = self._cross_chunk_filter()
+        try:
+            streaming = len(tasks)
+            while streaming:
+                question = await queue.get()
+                if question is chunk_done:
+                    streaming -= 1
+                elif accept(question):
+                    yield question
+        finally:
+            # The consumer may stop early; don't leave chunk streams running
+            for task in tasks:
+                task.cancel()
+    
+    def _cross_chunk_filter(self) -> Callable[[Dict], bool]:
+        """Predicate accepting a question unless one accepted earlier (from any chunk) duplicates it."""
+        seen_questions = set()
+        seen_answers = NearDuplicateIndex()
+        
+        def accept(q: Dict) -> bool:
+            if q["question"] in seen_questions:
+                return False
+            answer_signature = seen_answers.hasher.signature(q["answer"])
+            if seen_answers.find(signature=answer_signature) is not None:
+                return False
+            seen_questions.add(q["question"])
+            seen_answers.add(q["answer"], signature=answer_signature)
+            return True
+        
+        return accept
+    
+    def _merge_question_sets(self, question_sets: List[List[Dict]]) -> List[Dict]:
+        """Concatenate per-chunk question lists, dropping duplicates across chunks."""
+        accept = self._cross_chunk_filter()
+        return [q for questions in question_sets for q in questions if accept(q)]
+    
+    def _completion_token_budget(self, num_questions: int) -> int:
+        """max_tokens for a request: room for each question and answer plus the JSON wrapper."""
+        return min(OPENAI_MAX_COMPLETION_TOKENS, 50 + num_questions * OPENAI_TOKENS_PER_QUESTION)
+    
+    def _prepare_question_set_prompt(self, context: str, taxonomy_difficulty_counts: List[Dict],
+                                     exclude_questions: List[str] = None) -> Tuple[str, Dict]:
+        """
+        Build the question set prompt, compressing the context first if it exceeds the token budget.
+        
+        Returns:
+            Tuple[str, Dict]: The prompt and a usage dict with the local token counts,
+            completed by _record_usage once the response arrives
+        """
+        context_tokens = estimate_tokens(context)
+        prompt_context = context
+        if self.context_token_budget and context_tokens > self.context_token_budget:
+            prompt_context = compress_text(context, self.context_token_budget)
+        
+        prompt = self._build_question_set_prompt(prompt_context, taxonomy_difficulty_counts, exclude_questions)
+        questions_requested = sum(spec['count'] for spec in taxonomy_difficulty_counts)
+        usage = {
+            "context_tokens": context_tokens,
+            "prompt_context_tokens": estimate_tokens(prompt_context) if prompt_context is not context else context_tokens,
+            "estimated_prompt_tokens": estimate_tokens(prompt),
+            "max_tokens": self._completion_token_budget(questions_requested),
+            "questions_requested": questions_requested,
+        }
+        return prompt, usage
+    
+    def _record_usage(self, usage: Dict, response_usage, questions_returned: int):
+        """Add the API-reported token counts to a usage dict and hand it to usage_recorder."""
+        if self.usage_recorder is None:
+            return
+        
+        record = {
+            "model": OPENAI_MODEL,
+            **usage,
+            # None when the API did not report usage (e.g. an interrupted stream)
+            "prompt_tokens": getattr(response_usage, "prompt_tokens", None),
+            "completion_tokens": getattr(response_usage, "completion_tokens", None),
+            "questions_returned": questions_returned,
+        }
+        try:
+            self.usage_recorder(record)
+        except Exception as e:
+            print(f"Warning: Could not record token usage: {e}")
+    
+    def _question_set_request_options(self, seed: Optional[int] = None, num_questions: int = None) -> Dict:
+        """Sampling options shared by the sync and async question set requests."""
+        options = {
+            "temperature": 0.9,  # Increased for more diversity
+            # Sized to the request so small sets don't reserve the full completion window
+            "max_tokens": (self._completion_token_budget(num_questions) if num_questions
+                           else OPENAI_MAX_COMPLETION_TOKENS),
+            "presence_penalty": 0.6,  # Encourages model to introduce new concepts
+            "frequency_penalty": 0.6  # Discourages repetition
+        }
+        if seed is not None:
+            options["seed"] = seed
+        return options
+    
+    def _build_question_set_prompt(self, context: str, taxonomy_difficulty_counts: List[Dict],
+                                   exclude_questions: List[str] = None) -> str:
+        """Build the prompt asking for every taxonomy/difficulty combination at once."""
         # Create a detailed prompt for OpenAI to generate all questions at once
         prompt = f"""
         Generate questions based on the following context.
@@ -506,6 +990,16 @@ class QuestionGenerator:
           - Difficulty: {difficulty.value}
             """
         
+        # Top-up requests must not repeat questions that were already accepted
+        if exclude_questions:
+            prompt += """
+        Do not repeat or rephrase any of these existing questions:
+        """
+            for question in exclude_questions:
+                prompt += f"""
+        - {question}"""
+            prompt += "\n"
+        
         prompt += """
         Requirements for all questions:
         - Include both question and detailed answer
@@ -526,101 +1020,148 @@ class QuestionGenerator:
         }
         """
         
+        return prompt
+    
+    def _accept_question_item(self, q: Dict, seen_questions: NearDuplicateIndex, seen_answers: NearDuplicateIndex,
+                              subject: str, topic: str = None) -> Optional[Dict]:
+        """
+        Validate one question object from an OpenAI response.
+        
+        Args:
+            seen_questions (NearDuplicateIndex): Questions accepted so far, layered on any stored questions
+            seen_answers (NearDuplicateIndex): Answers accepted so far in this generation
+        
+        Returns:
+            Optional[Dict]: The question dict, or None if it is malformed, empty or a near-duplicate of one
+            already seen
+        """
+        # One malformed item (not an object, or a null or non-string field) is skipped, not the whole response
+        if not isinstance(q, dict):
+            return None
+        fields = {name: q.get(name) for name in ("question", "answer", "taxonomy_level", "difficulty")}
+        question_text, answer_text, taxonomy_value, difficulty_value = (
+            value.strip() if isinstance(value, str) else "" for value in fields.values()
+        )
+        
+        # Skip empty or duplicate questions/answers
+        if not question_text or not answer_text:
+            return None
+        
+        # Check for near-duplicates of earlier questions, including stored ones
+        question_signature = seen_questions.hasher.signature(question_text)
+        if seen_questions.find(signature=question_signature) is not None:
+            return None
+        
+        # Check if answer is too similar to previous ones
+        answer_signature = seen_answers.hasher.signature(answer_text)
+        if seen_answers.find(signature=answer_signature) is not None:
+            return None
+        
+        # Convert string values to enum if valid
         try:
-            # Use higher temperature for more diversity
-            response = openai.ChatCompletion.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.9,  # Increased for more diversity
-                max_tokens=4000,  # Increased to allow for more questions and detailed answers
-                presence_penalty=0.6,  # Encourages model to introduce new concepts
-                frequency_penalty=0.6  # Discourages repetition
-            )
-            
-            # Parse the response
-            try:
-                result = json.loads(response.choices[0].message.content)
-                questions = []
-                # Track answers to ensure diversity
-                seen_answers = set()
-                seen_questions = set()
-                
-                for q in result.get("questions", []):
-                    question_text = q.get("question", "").strip()
-                    answer_text = q.get("answer", "").strip()
-                    taxonomy_value = q.get("taxonomy_level", "").strip()
-                    difficulty_value = q.get("difficulty", "").strip()
-                    
-                    # Skip empty or duplicate questions/answers
-                    if not question_text or not answer_text:
-                        continue
-                    
-                    # Check for near-duplicates (simplified check)
-                    if question_text in seen_questions:
-                        continue
-                    
-                    # Check if answer is too similar to previous ones
-                    if any(self._text_similarity(answer_text, prev) > 0.8 for prev in seen_answers):
-                        continue
-                    
-                    # Convert string values to enum if valid
-                    try:
-                        taxonomy_enum = TaxonomyLevel(taxonomy_value)
-                    except ValueError:
-                        # Find the closest matching taxonomy level
-                        for level in TaxonomyLevel:
-                            if level.value in taxonomy_value.lower():
-                                taxonomy_enum = level
-                                break
-                        else:
-                            # Default to UNDERSTAND if no match
-                            taxonomy_enum = TaxonomyLevel.UNDERSTAND
-                    
-                    try:
-                        difficulty_enum = DifficultyLevel(difficulty_value)
-                    except ValueError:
-                        # Find the closest matching difficulty level
-                        for level in DifficultyLevel:
-                            if level.value in difficulty_value.lower():
-                                difficulty_enum = level
-                                break
-                        else:
-                            # Default to MEDIUM if no match
-                            difficulty_enum = DifficultyLevel.MEDIUM
-                    
-                    # Add to tracking sets
-                    seen_questions.add(question_text)
-                    seen_answers.add(answer_text)
-                    
-                    questions.append({
-                        "question": question_text,
-                        "answer": answer_text,
-                        "taxonomy_level": taxonomy_enum,
-                        "difficulty": difficulty_enum,
-                        "question_type": self.get_question_type(question_text),
-                        "context_snippet": self.get_relevant_context(context, question_text),
-                        "subject": subject,
-                        "topic": topic
-                    })
-                
-                # If we didn't get enough diverse questions, log a warning
-                total_requested = sum(spec['count'] for spec in taxonomy_difficulty_counts)
-                if len(questions) < total_requested:
-                    print(f"Warning: Only generated {len(questions)} diverse questions out of {total_requested} requested")
-                
-                return questions
-            except json.JSONDecodeError as json_err:
-                print(f"Error parsing OpenAI response: {json_err}")
-                print(f"Raw response: {response.choices[0].message.content}")
-                return []
+            taxonomy_enum = TaxonomyLevel(taxonomy_value)
+        except ValueError:
+            # Find the closest matching taxonomy level
+            for level in TaxonomyLevel:
+                if level.value in taxonomy_value.lower():
+                    taxonomy_enum = level
+                    break
+            else:
+                # Default to UNDERSTAND if no match
+                taxonomy_enum = TaxonomyLevel.UNDERSTAND
         
-        except Exception as e:
-            print(f"OpenAI API error: {e}")
-            return []
+        try:
+            difficulty_enum = DifficultyLevel(difficulty_value)
+        except ValueError:
+            # Find the closest matching difficulty level
+            for level in DifficultyLevel:
+                if level.value in difficulty_value.lower():
+                    difficulty_enum = level
+                    break
+            else:
+                # Default to MEDIUM if no match
+                difficulty_enum = DifficultyLevel.MEDIUM
+        
+        # Add to tracking indexes
+        seen_questions.add(question_text, signature=question_signature)
+        seen_answers.add(answer_text, signature=answer_signature)
+        
+        return {
+            "question": question_text,
+            "answer": answer_text,
+            "taxonomy_level": taxonomy_enum,
+            "difficulty": difficulty_enum,
+            "question_type": self.get_question_type(question_text),
+            "context_snippet": None,  # Filled in by the caller
+            "subject": subject,
+            "topic": topic
+        }
+    
+    def _parse_question_set_response(self, content: str, context: str, taxonomy_difficulty_counts: List[Dict],
+                                     subject: str, topic: str = None, seen_questions: NearDuplicateIndex = None,
+                                     seen_answers: NearDuplicateIndex = None) -> List[Dict]:
+        """
+        Turn an OpenAI question set response into deduplicated question dicts.
+        
+        Fenced, truncated or otherwise malformed responses keep every question object that is complete.
+        
+        Raises:
+            json.JSONDecodeError: If no question objects could be recovered from the response
+        """
+        parsed = parse_question_response(content)
+        if not parsed.complete:
+            print(f"Warning: Malformed OpenAI response, salvaged {parsed.salvaged} question(s)")
+        analysis = self.analyze_context(context, extract_terms=False)
+        questions = []
+        # Track questions and answers to ensure diversity (shared across top-up rounds when passed in)
+        seen_answers = NearDuplicateIndex() if seen_answers is None else seen_answers
+        seen_questions = NearDuplicateIndex() if seen_questions is None else seen_questions
+        
+        for q in parsed.items:
+            question = self._accept_question_item(q, seen_questions, seen_answers, subject, topic)
+            if question:
+                questions.append(question)
+        
+        self._attach_context_snippets(context, questions, analysis)
+        return questions
+    
+    def _question_shortfall(self, taxonomy_difficulty_counts: List[Dict], questions: List[Dict]) -> List[Dict]:
+        """Specs for the (taxonomy, difficulty) buckets that still have fewer questions than requested."""
+        produced = Counter((q["taxonomy_level"], q["difficulty"]) for q in questions)
+        shortfall = []
+        for spec in taxonomy_difficulty_counts:
+            missing = spec['count'] - produced[(spec['taxonomy_level'], spec['difficulty'])]
+            if missing > 0:
+                shortfall.append({**spec, "count": missing})
+        return shortfall
+    
+    def _limit_to_shortfall(self, shortfall: List[Dict], questions: List[Dict]) -> List[Dict]:
+        """
+        Keep only the questions that fill a requested bucket, up to its count.
+        
+        Extra questions and questions the model filed under buckets that weren't requested are
+        dropped, so a set never exceeds the requested counts, per bucket or in total.
+        """
+        remaining = Counter({(spec['taxonomy_level'], spec['difficulty']): spec['count'] for spec in shortfall})
+        kept = []
+        for q in questions:
+            key = (q["taxonomy_level"], q["difficulty"])
+            if remaining[key] > 0:
+                remaining[key] -= 1
+                kept.append(q)
+        return kept
+    
+    def _warn_shortfall(self, taxonomy_difficulty_counts: List[Dict], questions: List[Dict]):
+        # If we didn't get enough diverse questions, log a warning
+        total_requested = sum(spec['count'] for spec in taxonomy_difficulty_counts)
+        if len(questions) < total_requested:
+            print(f"Warning: Only generated {len(questions)} diverse questions out of {total_requested} requested")
     
     def generate_question_set(self, context: str, subject: str, topic: str = None, 
                            taxonomy_levels: List[str] = None, difficulty_levels: List[str] = None, 
-                           num_questions: int = 10) -> List[Dict]:
+                           num_questions: int = 10, seed: Optional[int] = None,
+                           analysis: Optional[ContextAnalysis] = None,
+                           dedup_index: Optional[NearDuplicateIndex] = None) -> List[Dict]:
         """
         Generate a set of questions based on the given parameters.
         
@@ -631,10 +1172,293 @@ class QuestionGenerator:
             taxonomy_levels (List[str]): List of taxonomy levels to include
             difficulty_levels (List[str]): List of difficulty levels to include
             num_questions (int): Number of questions to generate
+            seed (int, optional): Seed for reproducible template choices and OpenAI sampling
+            analysis (ContextAnalysis, optional): Precomputed analysis of the context (e.g. a stored
+                document's), so the template path doesn't parse it again
+            dedup_index (NearDuplicateIndex, optional): Stored questions not to generate near-duplicates of
             
         Returns:
             List[Dict]: List of generated questions with their details
         """
+        rng = random.Random(seed) if seed is not None else None
+        plan = self._plan_question_set(taxonomy_levels, difficulty_levels, num_questions)
+        
+        all_questions = []
+        # If using OpenAI, generate all questions in a single API call
+        if self.use_openai:
+            all_questions = self.generate_openai_question_set(
+                context, plan["taxonomy_difficulty_counts"], subject, topic, seed=seed, dedup_index=dedup_index
+            )
+        
+        # Use template-based generation, or fall back to it if OpenAI generation failed
+        if not all_questions:
+            all_questions = self._generate_questions_with_templates(
+                context, subject, topic, plan["taxonomy_enums"], plan["difficulty_enums"],
+                plan["questions_per_combo"], plan["remaining_questions"], rng=rng, analysis=analysis,
+                dedup_index=dedup_index
+            )
+        
+        return self._format_question_set(all_questions)
+    
+    async def agenerate_question_set(self, context: str, subject: str, topic: str = None, 
+                                  taxonomy_levels: List[str] = None, difficulty_levels: List[str] = None, 
+                                  num_questions: int = 10, seed: Optional[int] = None,
+                                  fallback_to_templates: bool = True, chunked: Optional[bool] = None,
+                                  dedup_index: Optional[NearDuplicateIndex] = None,
+                                  analysis: Optional[ContextAnalysis] = None) -> List[Dict]:
+        """
+        Async version of generate_question_set that awaits the OpenAI call on the shared client.
+        
+        Args:
+            fallback_to_templates (bool): Run the template path on a thread if OpenAI returns nothing;
+                callers with their own worker pool can disable this and handle the empty result
+            chunked (bool, optional): Force map-reduce generation over chunks on or off;
+                by default it is used when the context exceeds OPENAI_CHUNK_TOKENS
+            dedup_index (NearDuplicateIndex, optional): Stored questions to reject near-duplicates of
+            analysis (ContextAnalysis, optional): Precomputed analysis of the context for the template fallback
+            
+        Returns:
+            List[Dict]: List of generated questions with their details (empty if OpenAI failed and fallback is disabled)
+        """
+        plan = self._plan_question_set(taxonomy_levels, difficulty_levels, num_questions)
+        
+        if chunked is None:
+            chunked = estimate_tokens(context) > OPENAI_CHUNK_TOKENS
+        
+        if chunked:
+            all_questions = await self.agenerate_openai_question_set_chunked(
+                context, plan["taxonomy_difficulty_counts"], subject, topic, seed=seed, dedup_index=dedup_index
+            )
+        else:
+            all_questions = await self.agenerate_openai_question_set(
+                context, plan["taxonomy_difficulty_counts"], subject, topic, seed=seed, dedup_index=dedup_index
+            )
+        
+        if not all_questions and fallback_to_templates:
+            rng = random.Random(seed) if seed is not None else None
+            all_questions = await asyncio.to_thread(
+                self._generate_questions_with_templates,
+                context, subject, topic, plan["taxonomy_enums"], plan["difficulty_enums"],
+                plan["questions_per_combo"], plan["remaining_questions"], rng, analysis, dedup_index
+            )
+        
+        return self._format_question_set(all_questions)
+    
+    async def agenerate_question_set_hedged(self, context: str, subject: str, topic: str = None,
+                                            taxonomy_levels: List[str] = None, difficulty_levels: List[str] = None,
+                                            num_questions: int = 10, seed: Optional[int] = None,
+                                            deadline: Optional[float] = None, hedge_after: Optional[float] = None,
+                                            template_fallback: Optional[Callable[[], Awaitable[List[Dict]]]] = None,
+                                            dedup_index: Optional[NearDuplicateIndex] = None,
+                                            analysis: Optional[ContextAnalysis] = None
+                                            ) -> Tuple[List[Dict], str]:
+        """
+        Race OpenAI generation against the template path within a deadline.
+        
+        The OpenAI request starts immediately. If it has produced nothing by hedge_after
+        seconds (or fails before then), the template path starts concurrently; the first
+        path to return questions wins and the other is cancelled. A cancelled OpenAI
+        request is aborted upstream unless another caller shares it (see LLMScheduler),
+        but is still billed for what it had generated.
+        
+        Args:
+            deadline (float, optional): Seconds before giving up (None waits indefinitely)
+            hedge_after (float, optional): Seconds to wait for OpenAI before starting templates too
+                (None starts them only once OpenAI has failed)
+            template_fallback (Callable, optional): Async function running the template path, e.g. in
+                a worker pool; defaults to this generator's templates on a thread
+            dedup_index (NearDuplicateIndex, optional): Stored questions neither path should repeat
+            analysis (ContextAnalysis, optional): Precomputed analysis of the context for the default template path
+            
+        Returns:
+            Tuple[List[Dict], str]: The questions and the winning path ("openai" or "templates";
+            "none" if both produced nothing)
+            
+        Raises:
+            asyncio.TimeoutError: If neither path finished before the deadline
+        """
+        if template_fallback is None:
+            async def template_fallback():
+                plan = self._plan_question_set(taxonomy_levels, difficulty_levels, num_questions)
+                rng = random.Random(seed) if seed is not None else None
+                questions = await asyncio.to_thread(
+                    self._generate_questions_with_templates,
+                    context, subject, topic, plan["taxonomy_enums"], plan["difficulty_enums"],
+                    plan["questions_per_combo"], plan["remaining_questions"], rng, analysis, dedup_index
+                )
+                return self._format_question_set(questions)
+        
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        expires_at = started + deadline if deadline else None
+        hedge_at = started + hedge_after if hedge_after is not None else None
+        
+        openai_task = asyncio.ensure_future(self.agenerate_question_set(
+            context, subject, topic, taxonomy_levels, difficulty_levels, num_questions,
+            seed=seed, fallback_to_templates=False, dedup_index=dedup_index
+        ))
+        tasks = {openai_task: "openai"}
+        template_started = False
+        
+        try:
+            while True:
+                # Start the hedge once OpenAI has failed or the hedge point has passed
+                if not template_started and (not tasks or (hedge_at is not None and loop.time() >= hedge_at)):
+                    template_started = True
+                    if tasks:
+                        self.hedge_stats["hedged"] += 1
+                    tasks[asyncio.ensure_future(template_fallback())] = "templates"
+                
+                if not tasks:
+                    return [], "none"
+                
+                # Wake up for whichever comes first: a result, the hedge point or the deadline
+                wake_times = [t for t in (expires_at, None if template_started else hedge_at) if t is not None]
+                timeout = max(min(wake_times) - loop.time(), 0) if wake_times else None
+                done, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                
+                for task in done:
+                    path = tasks.pop(task)
+                    try:
+                        questions = task.result()
+                    except Exception as e:
+                        # Let a failure propagate only if nothing else can still answer
+                        if tasks or not template_started:
+                            print(f"Warning: {path} generation failed: {e}")
+                            continue
+                        raise
+                    if questions:
+                        self.hedge_stats[f"{path}_wins"] += 1
+                        return questions, path
+                
+                if not done and expires_at is not None and loop.time() >= expires_at:
+                    self.hedge_stats["timeouts"] += 1
+                    raise asyncio.TimeoutError()
+        finally:
+            # Cancel the losing (or timed-out) paths
+            for task in tasks:
+                task.cancel()
+    
+    async def astream_question_set(self, context: str, subject: str, topic: str = None, 
+                                   taxonomy_levels: List[str] = None, difficulty_levels: List[str] = None, 
+                                   num_questions: int = 10, seed: Optional[int] = None,
+                                   dedup_index: Optional[NearDuplicateIndex] = None,
+                                   analysis: Optional[ContextAnalysis] = None,
+                                   template_fallback: Optional[Callable[[], Awaitable[List[Dict]]]] = None,
+                                   chunked: Optional[bool] = None) -> AsyncIterator[Dict]:
+        """
+        Streaming version of generate_question_set: yields each formatted question as soon as it is ready.
+        
+        OpenAI questions are yielded as they are parsed from the streamed response; if that
+        produces nothing, template questions are yielded as each combination is generated.
+        
+        Args:
+            template_fallback (Callable, optional): Async function running the template path, e.g. in
+                a worker pool; its questions are yielded once the whole set is ready. Defaults to this
+                generator's templates on a thread, yielded one at a time
+            chunked (bool, optional): Force map-reduce streaming over chunks on or off; by default it is
+                used when the context exceeds OPENAI_CHUNK_TOKENS, like agenerate_question_set
+        """
+        plan = self._plan_question_set(taxonomy_levels, difficulty_levels, num_questions)
+        
+        produced = 0
+        if self.use_openai:
+            if chunked is None:
+                chunked = estimate_tokens(context) > OPENAI_CHUNK_TOKENS
+            stream = self.astream_openai_question_set_chunked if chunked else self.astream_openai_question_set
+            async for question in stream(
+                context, plan["taxonomy_difficulty_counts"], subject, topic, seed=seed, dedup_index=dedup_index
+            ):
+                produced += 1
+                yield question
+        
+        if produced:
+            return
+        
+        if template_fallback is not None:
+            for question in await template_fallback():
+                yield question
+            return
+        
+        # Template fallback: advance the sync generator on a thread so spaCy work stays off the event loop
+        rng = random.Random(seed) if seed is not None else None
+        iterator = self._iter_questions_with_templates(
+            context, subject, topic, plan["taxonomy_enums"], plan["difficulty_enums"],
+            plan["questions_per_combo"], plan["remaining_questions"], rng, analysis, dedup_index
+        )
+        while True:
+            question = await asyncio.to_thread(next, iterator, None)
+            if question is None:
+                break
+            yield self._format_question_set([question])[0]
+    
+    async def astream_openai_question_set(self, context: str, taxonomy_difficulty_counts: List[Dict],
+                                          subject: str, topic: str = None, seed: Optional[int] = None,
+                                          top_up_rounds: int = OPENAI_TOP_UP_ROUNDS,
+                                          dedup_index: Optional[NearDuplicateIndex] = None) -> AsyncIterator[Dict]:
+        """
+        Stream an OpenAI question set, yielding each formatted question once its JSON object is complete.
+        
+        Like agenerate_openai_question_set, no bucket gets more questions than requested; shortfalls
+        left after the stream are topped up with non-streamed follow-up requests.
+        """
+        if not self.use_openai:
+            return
+        
+        prompt, usage = await asyncio.to_thread(self._prepare_question_set_prompt, context, taxonomy_difficulty_counts)
+        analysis = await asyncio.to_thread(self.analyze_context, context, False)
+        parser = QuestionStreamParser()
+        seen_questions = NearDuplicateIndex(base=dedup_index)
+        seen_answers = NearDuplicateIndex()
+        remaining = Counter({(spec['taxonomy_level'], spec['difficulty']): spec['count']
+                             for spec in taxonomy_difficulty_counts})
+        accepted = []
+        response_usage = None
+        
+        try:
+            # Streams can't be shared, so they take a scheduler slot for their whole duration but never coalesce
+            async with llm_scheduler.limit(usage["estimated_prompt_tokens"] + usage["max_tokens"]):
+                stream = await llm_scheduler.retry(lambda: get_async_client().chat.completions.create(
+                    model=OPENAI_MODEL,
+                    messages=[{"role": "user", "content": prompt}],
+                    stream=True,
+                    # The final chunk then carries the request's token usage
+                    stream_options={"include_usage": True},
+                    **self._question_set_request_options(seed, usage["questions_requested"])
+                ))
+                
+                async for chunk in stream:
+                    if getattr(chunk, "usage", None) is not None:
+                        response_usage = chunk.usage
+                    if not chunk.choices or not chunk.choices[0].delta.content:
+                        continue
+                    for item in parser.feed(chunk.choices[0].delta.content):
+                        question = self._accept_question_item(item, seen_questions, seen_answers, subject, topic)
+                        # Trimmed like _limit_to_shortfall, as each question arrives
+                        if not question or remaining[(question["taxonomy_level"], question["difficulty"])] <= 0:
+                            continue
+                        remaining[(question["taxonomy_level"], question["difficulty"])] -= 1
+                        question["context_snippet"] = self.get_relevant_context(
+                            context, question["question"], analysis=analysis
+                        )
+                        accepted.append(question)
+                        yield self._format_question_set([question])[0]
+            
+            self._record_usage(usage, response_usage, len(accepted))
+        
+        except Exception as e:
+            print(f"OpenAI API error: {e}")
+        
+        async for batch in self._atop_up_question_set(
+            context, taxonomy_difficulty_counts, subject, topic, seed, accepted, seen_questions, seen_answers,
+            top_up_rounds
+        ):
+            for question in self._format_question_set(batch):
+                yield question
+    
+    def _plan_question_set(self, taxonomy_levels: List[str], difficulty_levels: List[str],
+                           num_questions: int) -> Dict:
+        """Resolve the requested levels and distribute the question count across their combinations."""
         # Default values if not provided
         if not taxonomy_levels:
             taxonomy_levels = [level.value for level in TaxonomyLevel]
@@ -650,48 +1474,37 @@ class QuestionGenerator:
         questions_per_combo = max(1, num_questions // (len(taxonomy_enums) * len(difficulty_enums)))
         remaining_questions = num_questions - (questions_per_combo * len(taxonomy_enums) * len(difficulty_enums))
         
-        # If using OpenAI, prepare the specifications for a single API call
-        if self.use_openai:
-            taxonomy_difficulty_counts = []
-            
-            # Create specifications for each combination
-            for taxonomy_level in taxonomy_enums:
-                for difficulty in difficulty_enums:
-                    # Determine how many questions to generate for this combination
-                    count = questions_per_combo
-                    if remaining_questions > 0:
-                        count += 1
-                        remaining_questions -= 1
-                    
-                    # Skip if no questions to generate
-                    if count <= 0:
-                        continue
-                    
-                    taxonomy_difficulty_counts.append({
-                        'taxonomy_level': taxonomy_level,
-                        'difficulty': difficulty,
-                        'count': count
-                    })
-            
-            # Generate all questions in a single API call
-            all_questions = self.generate_openai_question_set(
-                context, taxonomy_difficulty_counts, subject, topic
-            )
-            
-            # If OpenAI generation failed, fall back to template-based generation
-            if not all_questions:
-                all_questions = self._generate_questions_with_templates(
-                    context, subject, topic, taxonomy_enums, difficulty_enums,
-                    questions_per_combo, remaining_questions
-                )
-        else:
-            # Use template-based generation
-            all_questions = self._generate_questions_with_templates(
-                context, subject, topic, taxonomy_enums, difficulty_enums,
-                questions_per_combo, remaining_questions
-            )
+        # Create specifications for each combination (used for the single OpenAI API call)
+        taxonomy_difficulty_counts = []
+        extra_questions = remaining_questions
+        for taxonomy_level in taxonomy_enums:
+            for difficulty in difficulty_enums:
+                # Determine how many questions to generate for this combination
+                count = questions_per_combo
+                if extra_questions > 0:
+                    count += 1
+                    extra_questions -= 1
+                
+                # Skip if no questions to generate
+                if count <= 0:
+                    continue
+                
+                taxonomy_difficulty_counts.append({
+                    'taxonomy_level': taxonomy_level,
+                    'difficulty': difficulty,
+                    'count': count
+                })
         
-        # Format questions for API response
+        return {
+            "taxonomy_enums": taxonomy_enums,
+            "difficulty_enums": difficulty_enums,
+            "questions_per_combo": questions_per_combo,
+            "remaining_questions": remaining_questions,
+            "taxonomy_difficulty_counts": taxonomy_difficulty_counts
+        }
+    
+    def _format_question_set(self, all_questions: List[Dict]) -> List[Dict]:
+        """Format questions for API response."""
         formatted_questions = []
         for q in all_questions:
             formatted_questions.append({
@@ -707,9 +1520,22 @@ class QuestionGenerator:
         return formatted_questions
     
     def _generate_questions_with_templates(self, context, subject, topic, taxonomy_enums, difficulty_enums,
-                                        questions_per_combo, remaining_questions):
+                                        questions_per_combo, remaining_questions, rng=None, analysis=None,
+                                        dedup_index=None):
         """Helper method to generate questions using templates."""
-        all_questions = []
+        return list(self._iter_questions_with_templates(
+            context, subject, topic, taxonomy_enums, difficulty_enums,
+            questions_per_combo, remaining_questions, rng=rng, analysis=analysis, dedup_index=dedup_index
+        ))
+    
+    def _iter_questions_with_templates(self, context, subject, topic, taxonomy_enums, difficulty_enums,
+                                       questions_per_combo, remaining_questions, rng=None,
+                                       analysis=None, dedup_index=None) -> Iterator[Dict]:
+        """Yield template questions as each taxonomy/difficulty combination is generated."""
+        # Parse the context once and share it across every taxonomy/difficulty combination,
+        # unless the caller already has an analysis of this exact context
+        if analysis is None or analysis.context != context:
+            analysis = self.analyze_context(context)
         
         # Generate questions for each combination of taxonomy and difficulty
         for taxonomy_level in taxonomy_enums:
@@ -726,7 +1552,7 @@ class QuestionGenerator:
                 
                 # Generate questions using templates
                 generated_questions = self.generate_template_questions(
-                    context, taxonomy_level, difficulty, count
+                    context, taxonomy_level, difficulty, count, analysis=analysis, rng=rng, dedup_index=dedup_index
                 )
                 
                 # Add subject and topic information
@@ -735,9 +1561,7 @@ class QuestionGenerator:
                     if topic:
                         q["topic"] = topic
                 
-                all_questions.extend(generated_questions)
-        
-        return all_questions
+                yield from generated_questions
     
     def generate_question_paper(self, context: str, specifications: Dict) -> Dict:
         """
@@ -835,6 +1659,9 @@ class QuestionGenerator:
         """Helper method to generate questions for paper using templates."""
         all_questions = []
         
+        # Parse the context once and share it across every specification
+        analysis = self.analyze_context(context)
+        
         # Generate questions for each specification
         for spec in specifications.get("question_specs", []):
             taxonomy_level = TaxonomyLevel(spec["taxonomy_level"])
@@ -844,7 +1671,7 @@ class QuestionGenerator:
             
             # Generate questions using templates
             generated_questions = self.generate_template_questions(
-                context, taxonomy_level, difficulty, count
+                context, taxonomy_level, difficulty, count, analysis=analysis
             )
             
             # Add marks information
@@ -0,0 +1,77 @@
+from typing import List, Tuple
+
+
+class SentenceIndex:
+    """
+    Sparse TF-IDF index over the sentences of one context.
+
+    Questions are scored against every sentence with a single sparse matrix
+    product, instead of re-tokenizing each sentence for each question.
+    """
+
+    def __init__(self, sentences: List[str]):
+        # Imported here so scikit-learn is only loaded when an index is built
+        from sklearn.feature_extraction.text import TfidfVectorizer
+
+        self.sentences = sentences
+        # Keep single-character tokens and stop words: short factual sentences need every term
+        self.vectorizer = TfidfVectorizer(lowercase=True, token_pattern=r"(?u)\b\w+\b")
+        try:
+            self.matrix = self.vectorizer.fit_transform(sentences)
+        except ValueError:
+            # No usable terms (empty context or punctuation only)
+            self.matrix = None
+
+    def top_k(self, queries: List[str], k: int = 2) -> List[List[Tuple[int, float]]]:
+        """
+        Rank sentences for each query.
+
+        Args:
+            queries (List[str]): Question texts to score in one batch
+            k (int): Number of sentences to return per query
+
+        Returns:
+            List[List[Tuple[int, float]]]: (sentence index, score) pairs per query, best first.
+            Ties and unmatched slots are filled in sentence order with a score of 0.0.
+        """
+        k = min(k, len(self.sentences))
+        if self.matrix is None or not queries:
+            return [[(i, 0.0) for i in range(k)] for _ in queries]
+
+        # Rows are L2-normalized, so this is cosine similarity for every (query, sentence) pair
+        scores = (self.vectorizer.transform(queries) @ self.matrix.T).tocsr()
+
+        results = []
+        for row in range(scores.shape[0]):
+            start, end = scores.indptr[row], scores.indptr[row + 1]
+            matched = sorted(
+                zip(scores.indices[start:end].tolist(), scores.data[start:end].tolist()),
+                key=lambda item: (-item[1], item[0])
+            )[:k]
+
+            # Pad with the earliest unmatched sentences, as a stable sort by score would
+            if len(matched) < k:
+                seen = {index for index, _ in matched}
+                for index in range(len(self.sentences)):
+                    if len(matched) >= k:
+                        break
+                    if index not in seen:
+                        matched.append((index, 0.0))
+
+            results.append(matched)
+        return results
+
+    def salience(self) -> List[float]:
+        """
+        Score each sentence by its cosine similarity to the whole context.
+
+        Returns:
+            List[float]: One score per sentence (all 0.0 when the index is empty)
+        """
+        if self.matrix is None:
+            return [0.0] * len(self.sentences)
+
+        # Centroid of the normalized rows stands in for the document as a whole
+        centroid = self.matrix.mean(axis=0)
+        scores = self.matrix @ centroid.T
+        return [float(value) for value in scores.A1]
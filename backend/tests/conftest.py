@@ -0,0 +1,12 @@
+import os
+import sys
+import tempfile
+
+# The backend modules are imported flat (e.g. "import llm_json"), as app.py does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# app reads its configuration at import: use a throwaway database, no cache file and in-process generation
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/test.db"
+os.environ["EDUQGEN_CACHE_DB"] = ""
+os.environ["EDUQGEN_WORKER_PROCESSES"] = "0"
+os.environ["EDUQGEN_WARMUP_MODELS"] = "0"
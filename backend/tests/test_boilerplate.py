@@ -0,0 +1,65 @@
+import json
+
+from boilerplate import BoilerplateFilter, institution_patterns, normalize_line
+
+TOPICS = ["mitosis", "meiosis", "osmosis", "diffusion"]
+
+
+def page(number, topic):
+    return "\n".join([
+        "Biology 101 - Spring Term",
+        f"Cells rely on {topic} to survive.",
+        f"Exam questions often cover {topic}.",
+        f"Page {number} of 4",
+    ])
+
+
+def test_running_headers_and_page_numbers_are_learned_from_the_document():
+    pages = [page(number, topic) for number, topic in enumerate(TOPICS, start=1)]
+    kept, report = BoilerplateFilter().filter_pages(pages)
+
+    assert kept[0] == "Cells rely on mitosis to survive.\nExam questions often cover mitosis."
+    assert report.repeated_lines == ["biology # - spring term", "page # of #"]
+    assert report.removed_chars["repeated"] == 4 * len("Biology 101 - Spring Term") + sum(
+        len(f"Page {number} of 4") for number in range(1, 5)
+    )
+
+
+def test_repeated_lines_away_from_the_page_edges_are_kept():
+    body = ["Key term: homeostasis"] + [f"Line {word} of the chapter body." for word in "abcdefghij"]
+    pages = ["\n".join([f"Chapter {topic}"] + body + [f"Summary of {topic}"]) for topic in TOPICS]
+    kept, report = BoilerplateFilter(edge_lines=1).filter_pages(pages)
+    assert "Key term: homeostasis" in kept[0]
+    assert report.repeated_lines == []
+
+
+def test_short_documents_skip_header_detection():
+    pages = [page(1, "mitosis"), page(2, "meiosis")]
+    kept, report = BoilerplateFilter(min_pages=3).filter_pages(pages)
+    assert all(text.startswith("Biology 101") for text in kept)
+    assert report.total_removed == 0
+
+
+def test_lines_without_letters_are_dropped():
+    kept, report = BoilerplateFilter().filter_pages(["Osmosis moves water.\n12\n-----\nΦωτοσύνθεση"])
+    assert kept == ["Osmosis moves water.\nΦωτοσύνθεση"]
+    assert report.removed_chars["no_text"] == len("12") + len("-----")
+
+
+def test_normalization_ignores_case_spacing_and_numbers():
+    assert normalize_line("  Page 3   of 40 ") == normalize_line("page 12 of 40") == "page # of #"
+
+
+def test_institution_patterns_extend_the_defaults(tmp_path):
+    config = tmp_path / "patterns.json"
+    config.write_text(json.dumps({"*": [r"^confidential"], "Example College": [r"^dept\. of", "("]}))
+    patterns = institution_patterns.__wrapped__(str(config))
+
+    # The invalid "(" pattern is skipped, and the built-in institutions are still configured
+    assert [pattern.pattern for pattern in patterns["example college"]] == [r"^dept\. of"]
+    assert "savitribai phule pune university" in patterns
+
+    text = "Confidential draft\nDept. of Biology\nEnzymes speed up reactions."
+    kept, report = BoilerplateFilter(patterns["*"] + patterns["example college"]).filter_pages([text])
+    assert kept == ["Enzymes speed up reactions."]
+    assert report.removed_chars["pattern"] == len("Confidential draft") + len("Dept. of Biology")
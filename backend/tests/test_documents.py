@@ -0,0 +1,104 @@
+import io
+
+import pytest
+from fastapi.testclient import TestClient
+from reportlab.pdfgen import canvas
+
+import app as app_module
+from question_generator import ContextAnalysis
+
+PAGE_TEXT = [
+    "Enzymes are proteins that speed up chemical reactions in living cells.",
+    "Each enzyme binds a specific substrate at its active site.",
+    "Temperature and pH change how quickly an enzyme works.",
+]
+
+
+def make_pdf(lines) -> bytes:
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer)
+    for line in lines:
+        pdf.drawString(50, 800, line)
+        pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def client(monkeypatch):
+    analyzed = []
+
+    def fake_analyze_context(context, extract_terms=True):
+        # Stands in for spaCy, and records how often documents are analyzed
+        analyzed.append(context)
+        return ContextAnalysis(context, context.split("\n"), ["Enzymes"], ["substrate", "active site"])
+
+    monkeypatch.setattr(app_module.nltk_generator, "analyze_context", fake_analyze_context)
+    with TestClient(app_module.app) as test_client:
+        test_client.analyzed = analyzed
+        yield test_client
+
+
+def auth_headers(client, username, **fields):
+    client.post("/users/", json={"username": username, "email": f"{username}@example.com", "password": "secret",
+                                 **fields})
+    token = client.post("/token", data={"username": username, "password": "secret"}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def upload(client, headers, pdf: bytes, filename="notes.pdf"):
+    response = client.post("/documents/", files={"file": (filename, pdf, "application/pdf")}, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_repeat_upload_reuses_the_document(client):
+    headers = auth_headers(client, "doc_owner1")
+    pdf = make_pdf(PAGE_TEXT + ["Repeat upload marker."])
+
+    first = upload(client, headers, pdf)
+    second = upload(client, headers, pdf, filename="renamed.pdf")
+
+    assert second["id"] == first["id"]
+    assert first["page_count"] == 4 and first["has_analysis"]
+    assert len(client.analyzed) == 1
+
+
+def test_documents_are_private_to_their_owner(client):
+    owner = auth_headers(client, "doc_owner2")
+    other = auth_headers(client, "doc_other2")
+    document = upload(client, owner, make_pdf(PAGE_TEXT + ["Privacy marker."]))
+
+    assert client.get(f"/documents/{document['id']}", headers=owner).status_code == 200
+    assert client.get(f"/documents/{document['id']}", headers=other).status_code == 403
+    assert document["id"] not in [d["id"] for d in client.get("/documents/", headers=other).json()]
+
+    subject_id = client.post("/subjects/", json={"name": "Enzymes"}, headers=other).json()["id"]
+    response = client.post("/questions/generate-from-document", json={
+        "document_id": document["id"], "subject_id": subject_id,
+        "taxonomy_levels": ["remember"], "difficulty_levels": ["easy"], "use_openai": False,
+    }, headers=other)
+    assert response.status_code == 403
+
+
+def test_same_pdf_from_another_user_gets_its_own_copy(client):
+    owner = auth_headers(client, "doc_owner3", institution="Acme College")
+    colleague = auth_headers(client, "doc_colleague3", institution="Acme College")
+    pdf = make_pdf(PAGE_TEXT + ["Copy marker."])
+
+    original = upload(client, owner, pdf)
+    copy = upload(client, colleague, pdf)
+
+    assert copy["id"] != original["id"] and copy["sha256"] == original["sha256"]
+    # The colleague's copy reuses the extraction and analysis instead of redoing them
+    assert len(client.analyzed) == 1
+    assert client.get(f"/documents/{copy['id']}", headers=colleague).status_code == 200
+
+
+def test_admin_can_read_any_document(client):
+    owner = auth_headers(client, "doc_owner4")
+    admin = auth_headers(client, "doc_admin4", role="admin")
+    document = upload(client, owner, make_pdf(PAGE_TEXT + ["Admin marker."]))
+
+    assert client.get(f"/documents/{document['id']}", headers=admin).status_code == 200
+    assert document["id"] in [d["id"] for d in client.get("/documents/", headers=admin).json()]
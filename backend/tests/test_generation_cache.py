@@ -0,0 +1,63 @@
+import sqlite3
+
+import generation_cache
+from generation_cache import GenerationCache
+
+QUESTIONS = [{"question": "What is erosion?", "answer": "The wearing away of rock and soil."}]
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+
+def test_memory_hits_expire(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(generation_cache.time, "time", clock.time)
+    cache = GenerationCache(ttl_seconds=60)
+    cache.set("k", QUESTIONS)
+
+    clock.now += 59
+    assert cache.get("k") == QUESTIONS
+    clock.now += 2
+    assert cache.get("k") is None
+    assert cache.stats()["memory_entries"] == 0
+
+
+def test_promoted_disk_entries_keep_their_age(monkeypatch, tmp_path):
+    clock = Clock()
+    monkeypatch.setattr(generation_cache.time, "time", clock.time)
+    db_path = str(tmp_path / "cache.db")
+    GenerationCache(db_path=db_path, ttl_seconds=60).set("k", QUESTIONS)
+
+    cache = GenerationCache(db_path=db_path, ttl_seconds=60)
+    clock.now += 30
+    assert cache.get("k") == QUESTIONS
+    clock.now += 31
+    assert cache.get("k") is None
+
+
+def test_expired_rows_are_pruned_on_write(monkeypatch, tmp_path):
+    clock = Clock()
+    monkeypatch.setattr(generation_cache.time, "time", clock.time)
+    db_path = str(tmp_path / "cache.db")
+    cache = GenerationCache(db_path=db_path, ttl_seconds=60)
+    cache.set("old", QUESTIONS)
+    clock.now += 61
+    cache.set("new", QUESTIONS)
+
+    keys = [row[0] for row in sqlite3.connect(db_path).execute("SELECT key FROM generation_cache")]
+    assert keys == ["new"]
+
+
+def test_rejected_lookups_count_as_misses():
+    cache = GenerationCache()
+    cache.set("k", QUESTIONS)
+
+    assert cache.get("k", select=lambda questions: None) is None
+    assert cache.get("k", select=lambda questions: questions[:1]) == QUESTIONS
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["rejected"]) == (1, 1, 1)
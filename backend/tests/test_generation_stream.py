@@ -0,0 +1,73 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app as app_module
+from generation_cache import GenerationCache
+from question_generator import ContextAnalysis
+
+CONTEXT = (
+    "Mitochondria produce most of the cell's ATP through cellular respiration. "
+    "Glycolysis splits glucose into pyruvate in the cytoplasm. "
+    "The electron transport chain pumps protons across the inner membrane."
+)
+SENTENCES = [
+    "Mitochondria produce most of the cell's ATP through cellular respiration.",
+    "Glycolysis splits glucose into pyruvate in the cytoplasm.",
+    "The electron transport chain pumps protons across the inner membrane.",
+]
+
+
+def fake_analyze_context(context, extract_terms=True):
+    # Stands in for spaCy, which the template path otherwise loads to analyze the context
+    return ContextAnalysis(context, SENTENCES, ["ATP"], ["mitochondria", "glycolysis", "pyruvate", "protons"])
+
+
+async def no_openai_questions(*args, **kwargs):
+    # An OpenAI stream that produced nothing usable
+    return
+    yield
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(app_module.nltk_generator, "analyze_context", fake_analyze_context)
+    monkeypatch.setattr(app_module.openai_generator, "use_openai", True)
+    monkeypatch.setattr(app_module.openai_generator, "astream_openai_question_set", no_openai_questions)
+    with TestClient(app_module.app) as test_client:
+        yield test_client
+
+
+def test_stream_fallback_runs_in_pool_and_is_cached_as_templates(client, monkeypatch):
+    pool_calls = []
+    pool_generate = app_module.generation_pool.generate_question_set
+
+    async def spy_generate(**kwargs):
+        pool_calls.append(kwargs["num_questions"])
+        return await pool_generate(**kwargs)
+
+    monkeypatch.setattr(app_module.generation_pool, "generate_question_set", spy_generate)
+
+    client.post("/users/", json={"username": "streamer", "email": "streamer@example.com", "password": "secret"})
+    token = client.post("/token", data={"username": "streamer", "password": "secret"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    subject_id = client.post("/subjects/", json={"name": "Cell biology"}, headers=headers).json()["id"]
+
+    body = {
+        "subject_id": subject_id, "context": CONTEXT, "taxonomy_levels": ["remember"],
+        "difficulty_levels": ["easy"], "num_questions": 3, "use_openai": True, "seed": 3,
+    }
+    response = client.post("/questions/generate-stream", json=body, headers=headers)
+    lines = [json.loads(line) for line in response.text.splitlines()]
+
+    assert lines[-1] == {"type": "done", "count": 3}
+    assert pool_calls == [3]
+
+    def cached(backend):
+        return app_module.generation_cache.get(
+            GenerationCache.make_key(CONTEXT, ["remember"], ["easy"], 3, backend, 3)
+        )
+
+    assert cached("openai") is None
+    assert len(cached(f"template:{app_module.QG_BACKEND}")) == 3
@@ -0,0 +1,80 @@
+import json
+
+import pytest
+
+from llm_json import QuestionStreamParser, parse_question_response
+
+QUESTIONS = [
+    {"question": "What does print do?", "answer": "It writes text.", "taxonomy_level": "remember", "difficulty": "easy"},
+    {"question": "Show a loop.", "answer": "Use:\n```python\nfor i in range(3):\n    print(i)\n```\nIt prints 0-2.",
+     "taxonomy_level": "apply", "difficulty": "medium"},
+]
+DOCUMENT = json.dumps({"questions": QUESTIONS}, indent=2)
+
+
+def test_plain_document():
+    parsed = parse_question_response(DOCUMENT)
+    assert parsed.items == QUESTIONS
+    assert parsed.complete and parsed.salvaged == 0
+
+
+def test_fenced_document():
+    parsed = parse_question_response(f"```json\n{DOCUMENT}\n```")
+    assert parsed.items == QUESTIONS
+    assert parsed.complete
+
+
+def test_fence_inside_answer_string():
+    # The answer's code block must not be mistaken for the end of a fence
+    parsed = parse_question_response(DOCUMENT)
+    assert parsed.items[1]["answer"] == QUESTIONS[1]["answer"]
+    assert parsed.complete
+
+
+def test_fenced_document_with_fence_inside_answer():
+    parsed = parse_question_response(f"```json\n{DOCUMENT}\n```")
+    assert parsed.items == QUESTIONS
+
+
+def test_prose_wrapped_document():
+    parsed = parse_question_response(f"Here are your questions:\n\n{DOCUMENT}\n\nLet me know if you need more.")
+    assert parsed.items == QUESTIONS
+    assert parsed.complete
+
+
+def test_prose_with_braces_before_fence():
+    parsed = parse_question_response(f"Format {{question, answer}} as requested:\n```json\n{DOCUMENT}\n```")
+    assert parsed.items == QUESTIONS
+    assert parsed.complete
+
+
+def test_truncated_document_salvages_complete_objects():
+    # Cut inside the second question's code block
+    truncated = DOCUMENT[:DOCUMENT.index("range(3)")]
+    parsed = parse_question_response(truncated)
+    assert parsed.items == QUESTIONS[:1]
+    assert not parsed.complete and parsed.salvaged == 1
+
+
+def test_truncated_fenced_document():
+    parsed = parse_question_response(f"```json\n{DOCUMENT[:DOCUMENT.index('Show a loop')]}")
+    assert parsed.items == QUESTIONS[:1]
+    assert not parsed.complete
+
+
+def test_bare_array():
+    parsed = parse_question_response(json.dumps(QUESTIONS))
+    assert parsed.items == QUESTIONS
+
+
+def test_nothing_recoverable_raises():
+    with pytest.raises(json.JSONDecodeError):
+        parse_question_response('{"questions": [{"question": "cut off')
+
+
+def test_stream_parser_yields_objects_as_they_complete():
+    parser = QuestionStreamParser()
+    completed = []
+    for start in range(0, len(DOCUMENT), 7):
+        completed.extend(parser.feed(DOCUMENT[start:start + 7]))
+    assert completed == QUESTIONS
@@ -0,0 +1,87 @@
+import asyncio
+import threading
+
+from llm_scheduler import LLMScheduler
+
+
+def make_call(events):
+    async def call():
+        events.append("started")
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            events.append("cancelled")
+            raise
+        return "done"
+    return call
+
+
+def test_abandoned_call_is_cancelled_upstream():
+    async def scenario():
+        scheduler = LLMScheduler(tokens_per_minute=0)
+        events = []
+        caller = asyncio.ensure_future(scheduler.submit(make_call(events), key="k"))
+        await asyncio.sleep(0.01)
+        caller.cancel()
+        await asyncio.sleep(0.01)
+        return events, scheduler.stats()
+
+    events, stats = asyncio.run(scenario())
+    assert events == ["started", "cancelled"]
+    assert stats["abandoned"] == 1 and stats["in_flight"] == 0
+
+
+def test_shared_call_survives_one_caller_being_cancelled():
+    async def scenario():
+        scheduler = LLMScheduler(tokens_per_minute=0)
+        events = []
+        results = []
+
+        async def quick():
+            events.append("started")
+            await asyncio.sleep(0.05)
+            return "done"
+
+        first = asyncio.ensure_future(scheduler.submit(quick, key="k"))
+        second = asyncio.ensure_future(scheduler.submit(make_call(events), key="k"))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        results.append(await second)
+        return events, results, scheduler.stats()
+
+    events, results, stats = asyncio.run(scenario())
+    assert events == ["started"] and results == ["done"]
+    assert stats["coalesced"] == 1 and stats["abandoned"] == 0
+
+
+def test_limits_and_coalescing_hold_across_event_loops():
+    scheduler = LLMScheduler(max_concurrency=1, tokens_per_minute=0)
+    lock = threading.Lock()
+    running = []
+    peak = []
+    calls = []
+
+    async def call():
+        with lock:
+            calls.append(1)
+            running.append(1)
+            peak.append(len(running))
+        await asyncio.sleep(0.05)
+        with lock:
+            running.pop()
+        return "done"
+
+    def caller(key):
+        # Each thread runs its own event loop, as the synchronous wrappers do
+        results.append(asyncio.run(scheduler.submit(call, key=key)))
+
+    results = []
+    threads = [threading.Thread(target=caller, args=(key,)) for key in ("a", "a", "b", "c")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == ["done"] * 4
+    assert max(peak) == 1
+    assert len(calls) == 3 and scheduler.stats()["coalesced"] == 1
@@ -0,0 +1,53 @@
+import pytest
+
+from minhash import MinHasher, NearDuplicateIndex, estimated_similarity, minhash_signature
+
+BASE = "what role does the mitochondria play in producing energy for the cell during respiration"
+
+
+def jaccard(text1, text2):
+    words1, words2 = set(text1.lower().split()), set(text2.lower().split())
+    return len(words1 & words2) / len(words1 | words2)
+
+
+def test_signatures_estimate_word_set_jaccard():
+    hasher = MinHasher(num_perm=512)
+    variants = [
+        BASE,
+        BASE + " cycle",
+        BASE.replace("energy", "atp").replace("cell", "organism"),
+        "how do plants absorb water through their roots",
+    ]
+    for text in variants:
+        estimate = estimated_similarity(hasher.signature(BASE), hasher.signature(text))
+        assert estimate == pytest.approx(jaccard(BASE, text), abs=0.1)
+    # Case and repeated words don't change the word set
+    assert minhash_signature(BASE.upper() + " the") == minhash_signature(BASE)
+
+
+def test_index_finds_near_duplicates_only():
+    index = NearDuplicateIndex()
+    index.add("q1", BASE)
+    index.add("q2", "how do plants absorb water through their roots")
+
+    assert index.find(BASE + " cycle") == "q1"
+    assert index.find("which minerals do plants absorb through their roots") is None
+    assert index.find("describe the structure of a plant cell wall") is None
+    assert len(index) == 2
+
+
+def test_layered_index_searches_its_base_but_adds_to_itself():
+    bank = NearDuplicateIndex()
+    bank.add(1, BASE)
+    layer = NearDuplicateIndex(base=bank)
+    layer.add("new", "how do plants absorb water through their roots")
+
+    assert layer.find(BASE) == 1
+    assert layer.find("how do plants absorb water through their roots") == "new"
+    assert bank.find("how do plants absorb water through their roots") is None
+    assert (len(bank), len(layer)) == (1, 1)
+
+
+def test_num_bands_must_divide_num_perm():
+    with pytest.raises(ValueError):
+        NearDuplicateIndex(num_bands=5)
@@ -0,0 +1,66 @@
+import threading
+import time
+
+import pytest
+
+from model_registry import ModelRegistry
+
+
+class CountingLoader:
+    """Loader that records how many times it built its model."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.loads = 0
+
+    def __call__(self):
+        self.loads += 1
+        time.sleep(self.delay)
+        return object()
+
+
+def test_model_is_shared_and_unloaded_after_the_last_release():
+    registry = ModelRegistry()
+    loader = CountingLoader()
+    registry.register("nlp", loader)
+
+    first, second = registry.acquire("nlp"), registry.acquire("nlp")
+    assert first is second
+    assert (loader.loads, registry.refcount("nlp")) == (1, 2)
+
+    registry.release("nlp")
+    assert registry.is_loaded("nlp")
+    registry.release("nlp")
+    assert not registry.is_loaded("nlp")
+    assert registry.refcount("nlp") == 0
+
+    # The next borrower loads it again
+    assert registry.acquire("nlp") is not first
+    assert loader.loads == 2
+
+
+def test_concurrent_first_borrowers_load_once():
+    registry = ModelRegistry()
+    loader = CountingLoader(delay=0.05)
+    registry.register("qg", loader)
+    models = []
+
+    threads = [threading.Thread(target=lambda: models.append(registry.acquire("qg"))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert loader.loads == 1
+    assert len({id(model) for model in models}) == 1
+    assert registry.refcount("qg") == 8
+
+
+def test_first_loader_wins_and_unknown_models_raise():
+    registry = ModelRegistry()
+    registry.register("nlp", lambda: "first")
+    registry.register("nlp", lambda: "second")
+    assert registry.acquire("nlp") == "first"
+
+    with pytest.raises(KeyError):
+        registry.acquire("missing")
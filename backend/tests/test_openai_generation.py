@@ -0,0 +1,187 @@
+import asyncio
+import json
+import random
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+import openai_client
+from llm_scheduler import llm_scheduler
+import question_generator as question_generator_module
+from minhash import NearDuplicateIndex
+from openai_stub import StubConfig, _build_questions, create_stub_app
+from question_generator import ContextAnalysis, DifficultyLevel, QuestionGenerator, TaxonomyLevel
+
+CONTEXT = (
+    "Plate tectonics describes the movement of large plates of the lithosphere. "
+    "Earthquakes are common where plates meet. "
+    "Mid-ocean ridges form where plates move apart."
+)
+REMEMBER_EASY = {"taxonomy_level": TaxonomyLevel.REMEMBER, "difficulty": DifficultyLevel.EASY}
+ANALYZE_HARD = {"taxonomy_level": TaxonomyLevel.ANALYZE, "difficulty": DifficultyLevel.HARD}
+# Distinct enough to survive near-duplicate filtering
+QUESTIONS = [
+    ("What is the lithosphere made of?", "The crust and the uppermost part of the mantle."),
+    ("Why do earthquakes cluster near plate boundaries?", "Stress builds where plates interact and is released suddenly."),
+    ("Where do mid-ocean ridges form?", "Along divergent boundaries, where two oceanic plates separate."),
+    ("How do convergent and divergent boundaries differ?", "Colliding plates destroy crust; separating plates create it."),
+    ("Which process drives mantle convection?", "Heat escaping from the core keeps the mantle circulating slowly."),
+    ("What happens when two continents collide?", "Neither subducts easily, so ranges like the Himalayas rise."),
+]
+
+
+def item(index, taxonomy_level, difficulty):
+    question, answer = QUESTIONS[index]
+    return {"question": question, "answer": answer, "taxonomy_level": taxonomy_level, "difficulty": difficulty}
+
+
+class ScriptedClient:
+    """Stands in for AsyncOpenAI, answering each request with the next scripted list of question objects."""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, **request):
+        self.requests.append(request)
+        content = json.dumps({"questions": self.responses.pop(0)})
+        if request.get("stream"):
+            return self.stream(content)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=None)
+
+    async def stream(self, content):
+        for start in range(0, len(content), 40):
+            delta = SimpleNamespace(content=content[start:start + 40])
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)], usage=None)
+
+
+@pytest.fixture
+def generator(monkeypatch):
+    generator = QuestionGenerator(use_openai=True, openai_api_key="stub", lazy_models=True)
+    monkeypatch.setattr(generator, "analyze_context", lambda context, extract_terms=True: ContextAnalysis(
+        context, CONTEXT.split(". "), [], ["plate tectonics", "earthquakes"]
+    ))
+    return generator
+
+
+def use_client(monkeypatch, client):
+    monkeypatch.setattr(question_generator_module, "get_async_client", lambda: client)
+    return client
+
+
+def buckets(questions):
+    return sorted((q["taxonomy_level"].value, q["difficulty"].value) for q in questions)
+
+
+def test_sync_question_set_uses_the_async_client(generator, monkeypatch):
+    # The real OpenAI client, talking to the local stub over an in-process transport
+    stub = create_stub_app(StubConfig(latency_ms=0, jitter_ms=0, distribution="fixed", seed=1))
+
+    class StubTransportClient(httpx.AsyncClient):
+        def __init__(self, **kwargs):
+            super().__init__(transport=httpx.ASGITransport(stub), **kwargs)
+
+    monkeypatch.setattr(httpx, "AsyncClient", StubTransportClient)
+    asyncio.run(llm_scheduler.run(openai_client.close_async_client))
+    # More questions than the context has sentences, none of them lost to near-duplicate filtering
+    counts = [{**REMEMBER_EASY, "count": 2}, {**ANALYZE_HARD, "count": 2}]
+    # Two calls from two event loops: both requests go out on the scheduler loop's client
+    for _ in range(2):
+        questions = generator.generate_openai_question_set(CONTEXT, counts, "Geology", top_up_rounds=0)
+        assert buckets(questions) == [("analyze", "hard")] * 2 + [("remember", "easy")] * 2
+        assert len(openai_client._async_clients) == 1
+    asyncio.run(llm_scheduler.run(openai_client.close_async_client))
+    assert not openai_client._async_clients
+
+
+def test_first_round_is_trimmed_to_the_request(generator, monkeypatch):
+    client = use_client(monkeypatch, ScriptedClient([item(i, "remember", "easy") for i in range(4)]))
+    questions = asyncio.run(generator.agenerate_openai_question_set(
+        CONTEXT, [{**REMEMBER_EASY, "count": 2}], "Geology"
+    ))
+    assert buckets(questions) == [("remember", "easy")] * 2
+    assert len(client.requests) == 1
+
+
+def test_mislabeled_questions_do_not_inflate_the_set(generator, monkeypatch):
+    client = use_client(monkeypatch, ScriptedClient(
+        [item(0, "remember", "easy"), item(1, "remember", "easy"), item(2, "create", "medium")],
+        [item(3, "analyze", "hard"), item(4, "analyze", "hard")],
+    ))
+    questions = asyncio.run(generator.agenerate_openai_question_set(
+        CONTEXT, [{**REMEMBER_EASY, "count": 2}, {**ANALYZE_HARD, "count": 1}], "Geology"
+    ))
+    assert buckets(questions) == [("analyze", "hard"), ("remember", "easy"), ("remember", "easy")]
+    assert len(client.requests) == 2
+
+
+def test_stream_is_trimmed_and_topped_up_like_the_set(generator, monkeypatch):
+    use_client(monkeypatch, ScriptedClient(
+        [item(0, "remember", "easy"), item(1, "remember", "easy"), item(2, "remember", "easy")],
+        [item(3, "analyze", "hard")],
+    ))
+
+    async def collect():
+        return [q async for q in generator.astream_openai_question_set(
+            CONTEXT, [{**REMEMBER_EASY, "count": 2}, {**ANALYZE_HARD, "count": 1}], "Geology"
+        )]
+
+    questions = asyncio.run(collect())
+    assert sorted((q["taxonomy_level"], q["difficulty"]) for q in questions) == [
+        ("analyze", "hard"), ("remember", "easy"), ("remember", "easy")
+    ]
+
+
+def test_malformed_items_are_skipped_not_the_response(generator, monkeypatch):
+    use_client(monkeypatch, ScriptedClient([
+        {**item(0, "remember", "easy"), "question": None},
+        {**item(1, "remember", "easy"), "answer": 42},
+        "not an object",
+        item(2, "remember", "easy"),
+        item(3, "remember", "easy"),
+    ]))
+    questions = asyncio.run(generator.agenerate_openai_question_set(
+        CONTEXT, [{**REMEMBER_EASY, "count": 2}], "Geology", top_up_rounds=0
+    ))
+    assert [q["question"] for q in questions] == [QUESTIONS[2][0], QUESTIONS[3][0]]
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_stub_questions_are_not_near_duplicates(seed):
+    prompt = (
+        f"Context: {CONTEXT} Generate questions with:\n"
+        "- 4 questions with:\n - Taxonomy Level: remember\n - Difficulty: easy\n"
+        "- 2 questions with:\n - Taxonomy Level: analyze\n - Difficulty: hard\n"
+    )
+    questions = _build_questions(prompt, random.Random(seed))["questions"]
+    assert len(questions) == 6
+    for field in ("question", "answer"):
+        index = NearDuplicateIndex()
+        for position, q in enumerate(questions):
+            assert index.find(q[field]) is None
+            index.add(position, q[field])
+
+
+def test_long_context_stream_uses_the_chunk_plan(generator, monkeypatch):
+    chunks = CONTEXT.split(". ")[:2]
+    monkeypatch.setattr(question_generator_module, "chunk_text", lambda context, max_tokens: chunks)
+    client = use_client(monkeypatch, ScriptedClient(
+        [item(0, "remember", "easy"), item(1, "remember", "easy")],
+        [item(0, "remember", "easy"), item(2, "remember", "easy")],
+    ))
+
+    async def collect():
+        return [q async for q in generator.astream_question_set(
+            CONTEXT, "Geology", taxonomy_levels=["remember"], difficulty_levels=["easy"], num_questions=2,
+            chunked=True
+        )]
+
+    questions = asyncio.run(collect())
+    # One request per chunk, each for its share of the questions and only its own text
+    assert len(client.requests) == 2
+    prompts = [request["messages"][0]["content"] for request in client.requests]
+    assert sorted(chunks[0] in prompt for prompt in prompts) == [False, True]
+    # The question both chunks produced is yielded once
+    assert [q["question"] for q in questions] == [QUESTIONS[0][0]]
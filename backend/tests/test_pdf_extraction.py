@@ -0,0 +1,77 @@
+import io
+
+import pytest
+from reportlab.pdfgen import canvas
+
+from pdf_extraction import _source_for_workers, extract_pdf_text, shutdown_extraction_pool
+
+
+def make_pdf(pages) -> bytes:
+    """PDF with one page per list of lines, drawn top to bottom."""
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer)
+    for lines in pages:
+        for position, line in enumerate(lines):
+            pdf.drawString(50, 800 - 20 * position, line)
+        pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+
+TOPICS = ["mitosis", "meiosis", "osmosis", "diffusion", "respiration", "photosynthesis"]
+PAGES = [[f"Cells rely on {topic} to survive."] for topic in TOPICS]
+
+
+@pytest.fixture
+def pdf_path(tmp_path):
+    path = tmp_path / "notes.pdf"
+    path.write_bytes(make_pdf(PAGES))
+    return str(path)
+
+
+def test_pages_are_extracted_in_order_with_stats(pdf_path):
+    result = extract_pdf_text(pdf_path, processes=1)
+
+    assert result.pages == [lines[0] for lines in PAGES]
+    assert result.text == "\n".join(result.pages)
+    assert [stats.page_number for stats in result.page_stats] == list(range(1, 7))
+    assert result.kept_chars == sum(len(lines[0]) for lines in PAGES)
+    # Raw counts include the whitespace PyPDF2 returns around each page
+    assert result.raw_chars >= result.kept_chars
+    assert "Extracted 6 pages" in result.summary()
+
+
+def test_paths_bytes_and_file_objects_extract_the_same(pdf_path):
+    with open(pdf_path, "rb") as f:
+        pdf = f.read()
+        from_file = extract_pdf_text(f, processes=1).text
+    assert extract_pdf_text(pdf, processes=1).text == from_file == extract_pdf_text(pdf_path, processes=1).text
+
+
+def test_workers_open_files_by_path_and_streams_by_bytes(pdf_path):
+    with open(pdf_path, "rb") as f:
+        assert _source_for_workers(f) == pdf_path
+        stream = io.BytesIO(f.read())
+    stream.read(10)
+    # In-memory streams are sent whole, whatever their position
+    assert _source_for_workers(stream) == stream.getvalue()
+
+
+def test_pages_without_text_are_left_out_of_the_joined_text():
+    result = extract_pdf_text(make_pdf([["Photosynthesis happens in chloroplasts."], ["- 2 -"], []]), processes=1)
+    assert result.pages == ["Photosynthesis happens in chloroplasts.", "", ""]
+    assert result.text == "Photosynthesis happens in chloroplasts."
+    assert result.boilerplate.removed_chars["no_text"] == len("- 2 -")
+
+
+def test_parallel_extraction_matches_a_single_process(pdf_path):
+    serial = extract_pdf_text(pdf_path, processes=1)
+    try:
+        # Uneven page ranges (6 pages over 4 workers), reassembled in document order
+        parallel = extract_pdf_text(pdf_path, processes=4, min_parallel_pages=2)
+        from_bytes = extract_pdf_text(make_pdf(PAGES), processes=4, min_parallel_pages=2)
+    finally:
+        shutdown_extraction_pool()
+
+    assert parallel.pages == from_bytes.pages == serial.pages
+    assert [stats.page_number for stats in parallel.page_stats] == list(range(1, 7))
@@ -0,0 +1,61 @@
+import pytest
+
+import question_generator as question_generator_module
+from model_registry import ModelRegistry
+from qg_backends import QG_BACKENDS, QG_MODEL_NAME, artifact_path, load_qg_model, qg_model_key
+from question_generator import MLGenerationResult, QuestionGenerator
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    # Fake pipelines: the quantized backend can't be built, the others can
+    registry = ModelRegistry()
+    registry.register(qg_model_key("pytorch"), lambda: "fp32 pipeline")
+    registry.register(qg_model_key("quantized"), lambda: None)
+    registry.register(qg_model_key("onnx"), lambda: "onnx pipeline")
+    monkeypatch.setattr(question_generator_module, "model_registry", registry)
+    return registry
+
+
+def test_each_backend_has_its_own_registry_key_and_artifact():
+    keys = {qg_model_key(backend) for backend in QG_BACKENDS}
+    assert len(keys) == len(QG_BACKENDS)
+    # The fp32 pipeline keeps the key it had before backends existed
+    assert qg_model_key("pytorch") == f"transformers:{QG_MODEL_NAME}"
+    assert artifact_path("quantized") != artifact_path("onnx")
+
+
+def test_load_failures_return_none_instead_of_raising():
+    assert load_qg_model("tensorrt") is None
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        QuestionGenerator(lazy_models=True, qg_backend="tensorrt")
+
+
+def test_unavailable_backend_falls_back_to_fp32(registry):
+    generator = QuestionGenerator(lazy_models=True, qg_backend="quantized")
+    assert generator.qg_model == "fp32 pipeline"
+    # Both borrows are returned on close
+    generator.close()
+    assert not registry.is_loaded(qg_model_key("pytorch"))
+
+    assert QuestionGenerator(lazy_models=True, qg_backend="onnx").qg_model == "onnx pipeline"
+
+
+def test_parity_report_compares_against_fp32(registry, monkeypatch):
+    outputs = {
+        "fp32 pipeline": [["What is photosynthesis?"], ["When did the revolution begin?"]],
+        "onnx pipeline": [["What is photosynthesis?"], ["When did the French revolution begin?"]],
+    }
+    monkeypatch.setattr(QuestionGenerator, "generate_ml_questions_batch",
+                        lambda self, passages: MLGenerationResult(outputs[self.qg_model], []))
+
+    report = QuestionGenerator(lazy_models=True, qg_backend="onnx").check_backend_parity(["a", "b"])
+    assert report["backend"] == "onnx"
+    assert report["exact_match_rate"] == 0.5
+    assert report["mismatches"] == [{
+        "baseline": "When did the revolution begin?", "candidate": "When did the French revolution begin?"
+    }]
+    assert 0.5 < report["mean_similarity"] < 1
@@ -0,0 +1,152 @@
+import pickle
+import random
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app as app_module
+from minhash import NearDuplicateIndex
+from question_generator import ContextAnalysis, DifficultyLevel, QuestionGenerator, TaxonomyLevel
+
+CONTEXT = (
+    "Photosynthesis converts light energy into chemical energy in plants. "
+    "Chlorophyll in the chloroplasts absorbs mostly red and blue light. "
+    "The Calvin cycle fixes carbon dioxide into sugars using ATP and NADPH. "
+    "Oxygen is released as a by-product when water molecules are split."
+)
+ANALYSIS = ContextAnalysis(
+    context=CONTEXT,
+    sentences=[
+        "Photosynthesis converts light energy into chemical energy in plants.",
+        "Chlorophyll in the chloroplasts absorbs mostly red and blue light.",
+        "The Calvin cycle fixes carbon dioxide into sugars using ATP and NADPH.",
+        "Oxygen is released as a by-product when water molecules are split.",
+    ],
+    entities=["Calvin", "ATP", "NADPH"],
+    concepts=["photosynthesis", "chlorophyll", "carbon dioxide", "light energy", "oxygen", "sugars"],
+)
+ALL_LEVELS = [level.value for level in TaxonomyLevel]
+ALL_DIFFICULTIES = [level.value for level in DifficultyLevel]
+
+
+def fake_analyze_context(context, extract_terms=True):
+    # Stands in for spaCy, which the template path otherwise loads to analyze the context
+    return ContextAnalysis(context, ANALYSIS.sentences, ANALYSIS.entities, ANALYSIS.concepts)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(app_module.nltk_generator, "analyze_context", fake_analyze_context)
+    app_module.question_bank_indexes.clear()
+    with TestClient(app_module.app) as test_client:
+        yield test_client
+
+
+def auth_headers(client, username):
+    client.post("/users/", json={"username": username, "email": f"{username}@example.com", "password": "secret"})
+    token = client.post("/token", data={"username": username, "password": "secret"}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def generate(client, headers, subject_id, **overrides):
+    body = {
+        "subject_id": subject_id,
+        "context": CONTEXT,
+        "taxonomy_levels": ALL_LEVELS,
+        "difficulty_levels": ALL_DIFFICULTIES,
+        "num_questions": 18,
+        "use_openai": False,
+        "seed": 7,
+        "hedge_after_seconds": -1,
+        **overrides,
+    }
+    response = client.post("/questions/generate", json=body, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_index_survives_pickling():
+    index = NearDuplicateIndex()
+    index.add(1, "What is the role of chlorophyll in photosynthesis?")
+    restored = pickle.loads(pickle.dumps(index))
+    assert restored.find("What is the role of chlorophyll in photosynthesis?") == 1
+    restored.add(2, "Explain the Calvin cycle.")
+    assert restored.find("Explain the Calvin cycle.") == 2
+
+
+def test_template_questions_skip_stored_questions():
+    generator = QuestionGenerator(use_openai=False, lazy_models=True)
+    first = generator.generate_template_questions(
+        CONTEXT, TaxonomyLevel.REMEMBER, DifficultyLevel.EASY, 3, analysis=ANALYSIS, rng=random.Random(1)
+    )
+    bank = NearDuplicateIndex()
+    for number, question in enumerate(first):
+        bank.add(number, question["question"])
+
+    second = generator.generate_template_questions(
+        CONTEXT, TaxonomyLevel.REMEMBER, DifficultyLevel.EASY, 3, analysis=ANALYSIS,
+        rng=random.Random(1), dedup_index=bank
+    )
+    assert all(bank.find(question["question"]) is None for question in second)
+
+
+def test_template_set_with_shared_answers_is_saved_in_full(client):
+    headers = auth_headers(client, "teacher1")
+    subject_id = client.post("/subjects/", json={"name": "Biology 1"}, headers=headers).json()["id"]
+
+    questions = generate(client, headers, subject_id)
+
+    # Template answers repeat per taxonomy level; distinct questions must still be distinct rows
+    assert len(questions) == 18
+    assert len({question["id"] for question in questions}) == 18
+
+
+def test_repeat_generation_does_not_return_stored_rows(client):
+    headers = auth_headers(client, "teacher2")
+    subject_id = client.post("/subjects/", json={"name": "Biology 2"}, headers=headers).json()["id"]
+    first = generate(client, headers, subject_id)
+
+    # Same request again: the cached set is now in the bank, so it is served from the extras or regenerated
+    second = generate(client, headers, subject_id)
+
+    first_ids = {question["id"] for question in first}
+    assert not first_ids & {question["id"] for question in second}
+    bank = NearDuplicateIndex()
+    for question in first:
+        bank.add(question["id"], question["content"])
+    assert all(bank.find(question["content"]) is None for question in second)
+
+
+def test_other_users_questions_are_not_returned(client):
+    owner = auth_headers(client, "teacher3")
+    subject_id = client.post("/subjects/", json={"name": "Biology 3"}, headers=owner).json()["id"]
+    owner_ids = {question["id"] for question in generate(client, owner, subject_id)}
+
+    other = auth_headers(client, "teacher4")
+    other_id = client.get("/users/me", headers=other).json()["id"]
+    other_questions = generate(client, other, subject_id, seed=8)
+    assert other_questions
+    assert all(question["id"] not in owner_ids for question in other_questions)
+    assert all(question["created_by"] == other_id for question in other_questions)
+
+
+def test_cached_extras_serve_one_repeat_then_miss(client):
+    headers = auth_headers(client, "teacher5")
+    subject_id = client.post("/subjects/", json={"name": "Biology 5"}, headers=headers).json()["id"]
+    request = dict(taxonomy_levels=["remember", "understand", "apply"], difficulty_levels=["easy"], num_questions=3)
+    first = generate(client, headers, subject_id, **request)
+    before = app_module.generation_cache.stats()
+
+    # The first generation cached twice the questions it returned, so the repeat is a hit on the rest
+    second = generate(client, headers, subject_id, **request)
+    after_second = app_module.generation_cache.stats()
+    assert len(second) == 3
+    assert not {q["content"] for q in first} & {q["content"] for q in second}
+    assert after_second["hits"] == before["hits"] + 1
+
+    # Every cached question is now stored: the lookup is a miss, not a hit, and the set is generated afresh
+    third = generate(client, headers, subject_id, **request)
+    after_third = app_module.generation_cache.stats()
+    assert third
+    assert after_third["hits"] == after_second["hits"]
+    assert after_third["rejected"] == after_second["rejected"] + 1
@@ -0,0 +1,42 @@
+from sentence_index import SentenceIndex
+
+SENTENCES = [
+    "The heart pumps blood through the body.",
+    "Red blood cells carry oxygen from the lungs.",
+    "The lungs exchange oxygen and carbon dioxide.",
+    "Bones support the body and protect organs.",
+]
+
+
+def test_top_k_ranks_the_matching_sentences_first():
+    index = SentenceIndex(SENTENCES)
+    lungs, bones = index.top_k(["How do the lungs exchange carbon dioxide?", "What do bones protect?"], k=2)
+
+    assert [position for position, _ in lungs] == [2, 1]
+    assert lungs[0][1] > lungs[1][1] > 0
+    assert bones[0][0] == 3
+
+
+def test_unmatched_slots_are_padded_in_sentence_order():
+    index = SentenceIndex(SENTENCES)
+    (ranked,) = index.top_k(["What do bones protect?"], k=3)
+    assert ranked[0][0] == 3
+    # Only one sentence shares a term with the query; the rest are filled from the start, unscored
+    assert ranked[1:] == [(0, 0.0), (1, 0.0)]
+
+    # k never exceeds the number of sentences
+    assert len(index.top_k(["oxygen"], k=10)[0]) == len(SENTENCES)
+
+
+def test_empty_index_returns_unscored_sentences():
+    index = SentenceIndex(["...", "!"])
+    assert index.top_k(["anything"], k=1) == [[(0, 0.0)]]
+    assert index.salience() == [0.0, 0.0]
+
+
+def test_salience_favours_sentences_central_to_the_context():
+    scores = SentenceIndex(SENTENCES + ["Blood carries oxygen through the body."]).salience()
+    assert len(scores) == 5
+    # The sentence overlapping most with the others beats the unrelated bones sentence
+    assert scores[4] > scores[3]
+    assert min(scores) >= 0
@@ -0,0 +1,27 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import app as app_module
+
+
+@pytest.fixture
+def client():
+    with TestClient(app_module.app) as test_client:
+        yield test_client
+
+
+def auth_headers(client, username, role):
+    client.post("/users/", json={"username": username, "email": f"{username}@example.com", "password": "secret",
+                                 "role": role})
+    token = client.post("/token", data={"username": username, "password": "secret"}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.mark.parametrize("path, field", [("/cache/stats", "hit_rate"), ("/usage/stats", "scheduler")])
+def test_stats_are_for_admins_only(client, path, field):
+    assert client.get(path).status_code == 401
+    assert client.get(path, headers=auth_headers(client, "stats-educator", "educator")).status_code == 403
+
+    response = client.get(path, headers=auth_headers(client, "stats-admin", "admin"))
+    assert response.status_code == 200
+    assert field in response.json()
@@ -0,0 +1,68 @@
+import nltk
+import pytest
+
+from text_chunking import allocate_counts, chunk_text, compress_text, estimate_tokens
+
+try:
+    nltk.data.find("tokenizers/punkt_tab")
+    HAS_PUNKT = True
+except LookupError:
+    HAS_PUNKT = False
+
+needs_punkt = pytest.mark.skipif(not HAS_PUNKT, reason="NLTK punkt data not prepared (nlp_resources.py)")
+
+SPECS = [
+    {"taxonomy_level": "remember", "difficulty": "easy", "count": 6},
+    {"taxonomy_level": "apply", "difficulty": "hard", "count": 4},
+]
+
+
+def total(allocations):
+    return sum(spec["count"] for chunk in allocations for spec in chunk)
+
+
+def test_counts_follow_chunk_sizes():
+    allocations = allocate_counts(SPECS, [3000, 1000])
+    assert [sum(spec["count"] for spec in chunk) for chunk in allocations] == [7, 3]
+    for spec in SPECS:
+        assert sum(s["count"] for chunk in allocations for s in chunk
+                   if s["taxonomy_level"] == spec["taxonomy_level"]) == spec["count"]
+
+
+def test_questions_are_spread_over_a_long_document():
+    # 10 questions over 100 nearly equal chunks: one per tenth of the book, not all from the front
+    allocations = allocate_counts(SPECS, [1000 + i % 3 for i in range(100)])
+    used = [index for index, chunk in enumerate(allocations) if chunk]
+    assert total(allocations) == 10
+    assert len(used) == 10
+    assert [index // 10 for index in used] == list(range(10))
+
+
+def test_empty_chunks_get_nothing():
+    allocations = allocate_counts(SPECS, [0, 500, 0])
+    assert allocations[0] == [] and allocations[2] == []
+    assert total(allocations) == 10
+    assert allocate_counts(SPECS, []) == []
+
+
+def test_estimate_tokens_is_positive_for_text():
+    assert estimate_tokens("") == 0
+    assert 0 < estimate_tokens("Photosynthesis converts light energy.") < 20
+
+
+@needs_punkt
+def test_chunks_respect_the_budget_and_keep_every_word():
+    text = " ".join(f"Sentence number {i} describes one more fact about the topic." for i in range(50))
+    chunks = chunk_text(text, 40)
+    assert len(chunks) > 1
+    assert all(estimate_tokens(chunk) <= 40 for chunk in chunks)
+    assert " ".join(chunks).split() == text.split()
+
+
+@needs_punkt
+def test_compression_fits_the_budget_and_keeps_sentence_order():
+    sentences = [f"Fact {i} about enzymes and substrates in cells." for i in range(30)]
+    compressed = compress_text(" ".join(sentences), 60)
+    assert estimate_tokens(compressed) <= 60
+    kept = [sentence for sentence in sentences if sentence in compressed]
+    assert kept and compressed == " ".join(kept)
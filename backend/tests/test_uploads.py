@@ -0,0 +1,90 @@
+import asyncio
+import hashlib
+import io
+import os
+
+import pytest
+from fastapi import FastAPI, File, HTTPException, UploadFile
+from fastapi.testclient import TestClient
+
+from uploads import SpooledUpload, UploadSizeLimitMiddleware, spool_upload
+
+LIMIT = 1000
+
+
+def test_small_uploads_stay_in_memory():
+    with SpooledUpload(spool_bytes=100) as spooled:
+        spooled.write(b"%PDF-1.4 small")
+        assert spooled.path is None
+        assert spooled.open().read() == b"%PDF-1.4 small"
+
+
+def test_large_uploads_roll_over_to_a_mapped_temporary_file():
+    data = os.urandom(250)
+    spooled = SpooledUpload(spool_bytes=100)
+    for start in range(0, len(data), 60):
+        spooled.write(data[start:start + 60])
+
+    assert spooled.open().read() == data
+    # Once opened, the file is complete on disk for workers that open it by path
+    path = spooled.path
+    assert path is not None and os.path.getsize(path) == len(data)
+    # Reopening rewinds
+    assert spooled.open().read(4) == data[:4]
+    assert (spooled.size, spooled.sha256) == (len(data), hashlib.sha256(data).hexdigest())
+
+    spooled.close()
+    assert not os.path.exists(path)
+
+
+def test_spool_upload_enforces_the_limit_without_a_declared_size():
+    accepted = asyncio.run(spool_upload(UploadFile(io.BytesIO(b"x" * LIMIT)), max_bytes=LIMIT, spool_bytes=10))
+    with accepted:
+        assert accepted.size == LIMIT
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(spool_upload(UploadFile(io.BytesIO(b"x" * (LIMIT + 1))), max_bytes=LIMIT))
+    assert error.value.status_code == 413
+
+    # A declared size over the limit is rejected before anything is read
+    declared = UploadFile(io.BytesIO(b""), size=LIMIT + 1)
+    with pytest.raises(HTTPException):
+        asyncio.run(spool_upload(declared, max_bytes=LIMIT))
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.add_middleware(UploadSizeLimitMiddleware, max_bytes=LIMIT)
+
+    @app.post("/upload")
+    async def upload(file: UploadFile = File(...)):
+        return {"size": len(await file.read())}
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+def test_middleware_rejects_declared_oversized_uploads(client):
+    small = client.post("/upload", files={"file": ("notes.pdf", b"x" * 100, "application/pdf")})
+    assert small.json() == {"size": 100}
+
+    large = client.post("/upload", files={"file": ("notes.pdf", b"x" * LIMIT, "application/pdf")})
+    assert large.status_code == 413
+
+
+def test_middleware_counts_bodies_without_a_content_length(client):
+    boundary = "eduqgen"
+    head = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"notes.pdf\"\r\n"
+            "Content-Type: application/pdf\r\n\r\n").encode()
+    tail = f"\r\n--{boundary}--\r\n".encode()
+
+    def body(size):
+        yield head
+        for _ in range(size // 100):
+            yield b"x" * 100
+        yield tail
+
+    headers = {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+    assert client.post("/upload", content=body(500), headers=headers).json() == {"size": 500}
+    assert client.post("/upload", content=body(2 * LIMIT), headers=headers).status_code == 413
@@ -0,0 +1,39 @@
+import asyncio
+
+from worker_pool import GenerationWorkerPool
+
+
+class FlakyGenerator:
+    """Stands in for the template QuestionGenerator; init_models fails the first `failures` times."""
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.attempts = 0
+
+    def init_models(self):
+        self.attempts += 1
+        if self.attempts <= self.failures:
+            raise OSError("model files not found")
+
+
+def warm_up(generator, attempts=3):
+    pool = GenerationWorkerPool(max_workers=0, warmup_attempts=attempts, warmup_retry_delay=0,
+                                local_generator=generator)
+    asyncio.run(pool.warm_up())
+    return pool
+
+
+def test_failed_warm_up_is_retried():
+    generator = FlakyGenerator(failures=2)
+    pool = warm_up(generator)
+    assert pool.ready
+    assert pool.warmup_error is None
+    assert generator.attempts == 3
+
+
+def test_warm_up_failure_is_reported_once_attempts_run_out():
+    generator = FlakyGenerator(failures=5)
+    pool = warm_up(generator, attempts=2)
+    assert not pool.ready
+    assert pool.warmup_error == "OSError: model files not found"
+    assert generator.attempts == 2
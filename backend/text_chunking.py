@@ -0,0 +1,155 @@
+from bisect import bisect_right
+from functools import lru_cache
+from itertools import accumulate
+from typing import Dict, List
+
+from nltk.tokenize import sent_tokenize
+
+from openai_client import OPENAI_MODEL
+from sentence_index import SentenceIndex
+
+
+@lru_cache(maxsize=None)
+def _get_encoding(model: str):
+    """tiktoken encoding for a model, or None if tiktoken (an optional dependency) is unavailable."""
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def estimate_tokens(text: str, model: str = OPENAI_MODEL) -> int:
+    """
+    Count tokens locally before a request is sent.
+
+    Uses the model's tiktoken encoding when available, otherwise about four
+    characters per token for English text.
+    """
+    encoding = _get_encoding(model)
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def chunk_text(text: str, max_tokens: int) -> List[str]:
+    """
+    Split text into passages of at most max_tokens, breaking on sentence boundaries.
+
+    Sentences longer than the budget are split on whitespace.
+    """
+    chunks = []
+    current = []
+    current_tokens = 0
+
+    def flush():
+        nonlocal current, current_tokens
+        if current:
+            chunks.append(" ".join(current))
+        current = []
+        current_tokens = 0
+
+    for sentence in sent_tokenize(text):
+        sentence_tokens = estimate_tokens(sentence)
+
+        # Oversized sentence: emit it in word-bounded pieces
+        if sentence_tokens > max_tokens:
+            flush()
+            piece = []
+            for word in sentence.split():
+                if piece and estimate_tokens(" ".join(piece + [word])) > max_tokens:
+                    chunks.append(" ".join(piece))
+                    piece = []
+                piece.append(word)
+            if piece:
+                current = [" ".join(piece)]
+                current_tokens = estimate_tokens(current[0])
+            continue
+
+        # +1 for the joining space
+        if current and current_tokens + sentence_tokens + 1 > max_tokens:
+            flush()
+        current.append(sentence)
+        current_tokens += sentence_tokens + (1 if len(current) > 1 else 0)
+
+    flush()
+    return chunks
+
+
+def compress_text(text: str, max_tokens: int) -> str:
+    """
+    Extractively shorten text to at most max_tokens.
+
+    Sentences are kept in order of TF-IDF salience (similarity to the whole
+    text) while they fit the budget, then re-joined in their original order.
+    Text already within budget is returned unchanged.
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+
+    sentences = sent_tokenize(text)
+    scores = SentenceIndex(sentences).salience()
+
+    kept = []
+    used = 0
+    for index in sorted(range(len(sentences)), key=lambda i: (-scores[i], i)):
+        # +1 for the joining space
+        cost = estimate_tokens(sentences[index]) + 1
+        if used + cost > max_tokens:
+            continue
+        kept.append(index)
+        used += cost
+
+    return " ".join(sentences[index] for index in sorted(kept))
+
+
+def allocate_counts(taxonomy_difficulty_counts: List[Dict], chunk_sizes: List[int]) -> List[List[Dict]]:
+    """
+    Spread the requested (taxonomy, difficulty) counts across chunks in proportion to chunk size.
+
+    Args:
+        taxonomy_difficulty_counts (List[Dict]): Specs with taxonomy_level, difficulty and count
+        chunk_sizes (List[int]): Token size of each chunk
+
+    Returns:
+        List[List[Dict]]: Specs per chunk (empty for chunks that get no questions); totals are preserved
+    """
+    if not chunk_sizes:
+        return []
+
+    # Interleave the specs so consecutive slots mix taxonomy/difficulty combinations
+    remaining = [spec["count"] for spec in taxonomy_difficulty_counts]
+    slots = []
+    while any(count > 0 for count in remaining):
+        for index, count in enumerate(remaining):
+            if count > 0:
+                slots.append(index)
+                remaining[index] -= 1
+
+    # Systematic apportionment: slot k sits at the midpoint of the k-th of len(slots) equal stretches of
+    # the document and goes to the chunk covering that point. Each chunk gets its proportional share
+    # rounded up or down, and with more chunks than slots the questions are spread evenly across the
+    # document instead of all going to the first chunks.
+    sizes = chunk_sizes if sum(chunk_sizes) else [1] * len(chunk_sizes)
+    boundaries = list(accumulate(sizes))
+    step = boundaries[-1] / len(slots) if slots else 0
+    quotas = [0] * len(sizes)
+    for k in range(len(slots)):
+        quotas[min(bisect_right(boundaries, (k + 0.5) * step), len(sizes) - 1)] += 1
+
+    allocations = []
+    position = 0
+    for quota in quotas:
+        chunk_counts = {}
+        for spec_index in slots[position:position + quota]:
+            chunk_counts[spec_index] = chunk_counts.get(spec_index, 0) + 1
+        position += quota
+
+        allocations.append([
+            {**taxonomy_difficulty_counts[spec_index], "count": count}
+            for spec_index, count in sorted(chunk_counts.items())
+        ])
+    return allocations
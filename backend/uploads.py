@@ -0,0 +1,170 @@
+import hashlib
+import io
+import mmap
+import os
+import tempfile
+from typing import BinaryIO, Optional
+
+from fastapi import HTTPException, status
+
+# Largest accepted upload, and how much of one is held in memory before it moves to a temporary file
+MAX_UPLOAD_BYTES = int(os.getenv("EDUQGEN_MAX_UPLOAD_BYTES", str(50 * 1024 * 1024)))
+UPLOAD_SPOOL_BYTES = int(os.getenv("EDUQGEN_UPLOAD_SPOOL_BYTES", str(1024 * 1024)))
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+
+
+def upload_too_large(max_bytes: int = MAX_UPLOAD_BYTES) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"Upload exceeds the maximum size of {max_bytes / (1024 * 1024):.3g} MB"
+    )
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Reject multipart uploads larger than max_bytes before their body is parsed.
+
+    Requests declaring a larger Content-Length get a 413 without reading the
+    body; bodies without one are counted as they stream in and abandoned with
+    a 413 as soon as they pass the limit.
+    """
+
+    def __init__(self, app, max_bytes: int = MAX_UPLOAD_BYTES):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope["headers"])
+        if not headers.get(b"content-type", b"").startswith(b"multipart/form-data"):
+            return await self.app(scope, receive, send)
+
+        content_length = headers.get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > self.max_bytes:
+            await self._reject(send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # Raised inside form parsing, which FastAPI re-raises as this response
+                    raise upload_too_large(self.max_bytes)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+    async def _reject(self, send):
+        body = ('{"detail": "%s"}' % upload_too_large(self.max_bytes).detail).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+class SpooledUpload:
+    """
+    An uploaded file held in memory up to spool_bytes, and in a named temporary file beyond that.
+
+    Unlike tempfile.SpooledTemporaryFile, a rolled-over upload has a path, so worker
+    processes can open it themselves, and it can be memory-mapped for reading.
+    The SHA-256 of the content is computed as it is written.
+    """
+
+    def __init__(self, spool_bytes: int = UPLOAD_SPOOL_BYTES):
+        self.spool_bytes = spool_bytes
+        self.size = 0
+        self._sha256 = hashlib.sha256()
+        self._buffer = io.BytesIO()
+        self._file = None
+        self._mmap = None
+
+    @property
+    def path(self) -> Optional[str]:
+        """Path of the temporary file, or None while the upload is still in memory."""
+        return self._file.name if self._file is not None else None
+
+    @property
+    def sha256(self) -> str:
+        """Hex SHA-256 digest of everything written so far."""
+        return self._sha256.hexdigest()
+
+    def write(self, chunk: bytes):
+        self.size += len(chunk)
+        self._sha256.update(chunk)
+        if self._file is None and self.size > self.spool_bytes:
+            self._file = tempfile.NamedTemporaryFile(prefix="eduqgen-upload-", suffix=".pdf")
+            self._file.write(self._buffer.getbuffer())
+            self._buffer = None
+        (self._file or self._buffer).write(chunk)
+
+    def open(self) -> BinaryIO:
+        """
+        A readable, seekable view of the upload: the in-memory buffer, or a
+        read-only memory map of the temporary file (a plain file object if it can't be mapped).
+        """
+        if self._file is None:
+            self._buffer.seek(0)
+            return self._buffer
+        self._file.flush()
+        if self._mmap is None and self.size:
+            try:
+                self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError):
+                self._file.seek(0)
+                return self._file
+        if self._mmap is None:
+            self._file.seek(0)
+            return self._file
+        self._mmap.seek(0)
+        return self._mmap
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file is not None:
+            # Deletes the temporary file
+            self._file.close()
+            self._file = None
+        self._buffer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+async def spool_upload(upload, max_bytes: int = MAX_UPLOAD_BYTES,
+                       spool_bytes: int = UPLOAD_SPOOL_BYTES) -> SpooledUpload:
+    """
+    Copy an UploadFile into a SpooledUpload chunk by chunk, enforcing max_bytes.
+
+    Raises:
+        HTTPException: 413 as soon as the upload is known to exceed max_bytes
+    """
+    if upload.size is not None and upload.size > max_bytes:
+        raise upload_too_large(max_bytes)
+
+    spooled = SpooledUpload(spool_bytes)
+    try:
+        while True:
+            chunk = await upload.read(UPLOAD_CHUNK_BYTES)
+            if not chunk:
+                break
+            if spooled.size + len(chunk) > max_bytes:
+                raise upload_too_large(max_bytes)
+            spooled.write(chunk)
+    except BaseException:
+        spooled.close()
+        raise
+    return spooled
@@ -0,0 +1,184 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+# Template generator owned by the current worker process (OpenAI calls are awaited in the web process)
+_worker_generator = None
+# Shared by the pool's workers so each warm-up task lands on a different worker
+_warmup_barrier = None
+
+
+def _init_worker(warmup_barrier):
+    """Build the generator once per worker process; its models load on first use, not per task."""
+    global _worker_generator, _warmup_barrier
+    from question_generator import QuestionGenerator
+
+    _worker_generator = QuestionGenerator(
+        use_openai=False, lazy_models=True, qg_backend=os.getenv("EDUQGEN_QG_BACKEND", "pytorch")
+    )
+    _warmup_barrier = warmup_barrier
+
+
+def _run_generation(kwargs: Dict) -> List[Dict]:
+    """Task body executed inside a worker process."""
+    return _worker_generator.generate_question_set(**kwargs)
+
+
+def _run_analysis(context: str):
+    """Task body executed inside a worker process: one full NLP analysis of a context."""
+    return _worker_generator.analyze_context(context)
+
+
+def _warm_up_worker(timeout: Optional[float]):
+    """Load this worker's spaCy model, then wait until every other worker has loaded its own."""
+    _ = _worker_generator.nlp
+    # Holding the worker here keeps it from taking a second warm-up task
+    _warmup_barrier.wait(timeout)
+
+
+class GenerationWorkerPool:
+    """
+    Runs template QuestionGenerator work outside the event loop.
+
+    With max_workers > 0 generation runs in a process pool whose workers each
+    load the models once; with max_workers == 0 it runs on the default thread
+    executor using the in-process generator. OpenAI generation never comes
+    here: it is I/O-bound and is awaited on the web process's shared client.
+
+    Workers load spaCy during warm-up (every document upload needs it) and T5
+    on their first template generation. A task that times out is not stopped:
+    the caller gets asyncio.TimeoutError while the task keeps its worker (or
+    thread) busy until it finishes, so task_timeout bounds request latency, not
+    the work done.
+    """
+
+    def __init__(self, max_workers: int = 2, max_tasks_per_child: Optional[int] = 100,
+                 task_timeout: Optional[float] = 300, warmup_attempts: int = 3,
+                 warmup_retry_delay: float = 5.0, local_generator=None):
+        """
+        Args:
+            max_workers (int): Number of worker processes (0 runs in-process on threads)
+            max_tasks_per_child (int): Recycle a worker after this many tasks (None disables)
+            task_timeout (float): Seconds to wait for a single generation task (None disables)
+            warmup_attempts (int): Warm-up attempts before the pool is reported as failed
+            warmup_retry_delay (float): Delay before the first warm-up retry, doubled for each further retry
+            local_generator (QuestionGenerator): In-process template generator, used when max_workers == 0
+        """
+        self.max_workers = max_workers
+        self.max_tasks_per_child = max_tasks_per_child
+        self.task_timeout = task_timeout
+        self.warmup_attempts = max(1, warmup_attempts)
+        self.warmup_retry_delay = warmup_retry_delay
+        self.local_generator = local_generator
+        self.ready = False
+        # Last warm-up failure, once every attempt has failed
+        self.warmup_error = None
+        self._executor = None
+
+    @classmethod
+    def from_env(cls, local_generator=None):
+        """Create a pool configured from EDUQGEN_WORKER_* environment variables."""
+        max_tasks = int(os.getenv("EDUQGEN_WORKER_MAX_TASKS", "100"))
+        timeout = float(os.getenv("EDUQGEN_WORKER_TIMEOUT", "300"))
+        return cls(
+            max_workers=int(os.getenv("EDUQGEN_WORKER_PROCESSES", "2")),
+            max_tasks_per_child=max_tasks if max_tasks > 0 else None,
+            task_timeout=timeout if timeout > 0 else None,
+            warmup_attempts=int(os.getenv("EDUQGEN_WARMUP_ATTEMPTS", "3")),
+            local_generator=local_generator,
+        )
+
+    @property
+    def uses_processes(self) -> bool:
+        return self.max_workers > 0
+
+    def start(self):
+        """Create the process pool (no-op in thread mode)."""
+        if self.uses_processes and self._executor is None:
+            # max_tasks_per_child requires the spawn start method; the barrier must come from the same context
+            context = multiprocessing.get_context("spawn")
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(context.Barrier(self.max_workers),),
+                max_tasks_per_child=self.max_tasks_per_child,
+            )
+
+    async def warm_up(self):
+        """
+        Load the models in every worker (or in-process), then mark the pool ready.
+
+        Failed attempts are retried with exponential backoff, on a fresh process pool; if every
+        attempt fails, the pool stays not ready and warmup_error holds the last failure.
+        """
+        loop = asyncio.get_running_loop()
+        for attempt in range(1, self.warmup_attempts + 1):
+            try:
+                if self.uses_processes:
+                    # One task per worker: each blocks on the barrier until all of them have loaded spaCy
+                    await asyncio.gather(*(
+                        loop.run_in_executor(self._executor, _warm_up_worker, self.task_timeout)
+                        for _ in range(self.max_workers)
+                    ))
+                else:
+                    await loop.run_in_executor(None, self.local_generator.init_models)
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                print(f"Warning: model warm-up failed (attempt {attempt}/{self.warmup_attempts}): {error}")
+                if attempt == self.warmup_attempts:
+                    self.warmup_error = error
+                    return
+                if self.uses_processes:
+                    self._restart()
+                await asyncio.sleep(self.warmup_retry_delay * 2 ** (attempt - 1))
+            else:
+                self.ready = True
+                return
+
+    def _restart(self):
+        """Replace the process pool, e.g. after a worker died or a warm-up barrier broke."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+        self.start()
+
+    async def generate_question_set(self, **kwargs) -> List[Dict]:
+        """
+        Run the template QuestionGenerator.generate_question_set off the event loop.
+
+        Raises:
+            asyncio.TimeoutError: If the task exceeds task_timeout (the task itself runs to completion)
+        """
+        loop = asyncio.get_running_loop()
+        if self.uses_processes:
+            future = loop.run_in_executor(self._executor, _run_generation, kwargs)
+        else:
+            future = loop.run_in_executor(None, lambda: self.local_generator.generate_question_set(**kwargs))
+        return await asyncio.wait_for(future, timeout=self.task_timeout)
+
+    async def analyze_context(self, context: str):
+        """
+        Run QuestionGenerator.analyze_context off the event loop, on the models the pool already holds.
+
+        Returns:
+            ContextAnalysis: Sentences, entities and concepts of the context
+
+        Raises:
+            asyncio.TimeoutError: If the task exceeds task_timeout
+        """
+        loop = asyncio.get_running_loop()
+        if self.uses_processes:
+            future = loop.run_in_executor(self._executor, _run_analysis, context)
+        else:
+            future = loop.run_in_executor(None, self.local_generator.analyze_context, context)
+        return await asyncio.wait_for(future, timeout=self.task_timeout)
+
+    def shutdown(self):
+        """Stop the worker processes."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self.ready = False
+        self.warmup_error = None